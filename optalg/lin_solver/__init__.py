@@ -6,9 +6,10 @@
 # OPTALG is released under the BSD 2-clause license. #
 #****************************************************#
 
-from .lin_solver import LinSolver
+from .lin_solver import LinSolver, LinSolverCache
 from .mumps import LinSolverMUMPS
 from .superlu import LinSolverSUPERLU
+from .gmres import LinSolverGMRES
 
 def new_linsolver(name,prop):
     """
@@ -28,6 +29,8 @@ def new_linsolver(name,prop):
         return LinSolverMUMPS(prop)
     elif name == 'superlu':
         return LinSolverSUPERLU(prop)
+    elif name == 'gmres':
+        return LinSolverGMRES(prop)
     elif name == 'default':
         try:
             return new_linsolver('mumps',prop)
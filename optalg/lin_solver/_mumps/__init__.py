@@ -168,9 +168,21 @@ class _MumpsBaseContext(object):
     ####################################################################
 
     def set_rhs(self, rhs):
-        """Set the right hand side. This matrix will be modified in place."""
-        assert rhs.size == self.id.n
+        """Set the right hand side. This matrix will be modified in place.
+
+        Multiple right hand sides are given as a 2-d array of shape
+        (n, nrhs) in Fortran (column-major) order.
+        """
+        assert rhs.shape[0] == self.id.n
+        if rhs.ndim == 2:
+            assert rhs.flags.f_contiguous
+            nrhs = rhs.shape[1]
+        else:
+            assert rhs.ndim == 1
+            nrhs = 1
         self._refs.update(rhs=rhs)
+        self.id.nrhs = nrhs
+        self.id.lrhs = self.id.n
         self.id.rhs = self.cast_array(rhs)
 
     def set_icntl(self, idx, val):
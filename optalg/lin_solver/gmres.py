@@ -0,0 +1,163 @@
+#****************************************************#
+# This file is part of OPTALG.                       #
+#                                                    #
+# Copyright (c) 2015-2017, Tomas Tinoco De Rubira.   #
+#                                                    #
+# OPTALG is released under the BSD 2-clause license. #
+#****************************************************#
+
+import numpy as np
+from .lin_solver import LinSolver
+from scipy.sparse.linalg import gmres,spilu,splu,LinearOperator,aslinearoperator
+from scipy.sparse import csc_matrix,coo_matrix
+
+class LinSolverGMRES(LinSolver):
+    """
+    Iterative linear solver based on restarted GMRES.
+    """
+
+    def __init__(self,prop='unsymmetric',preconditioner='ilu',tol=1e-6,restart=30,maxiter=None,
+                 drop_tol=1e-4,fill_factor=10.,block_size=100):
+        """
+        Iterative linear solver based on restarted GMRES.
+
+        The matrix passed to :func:`factorize` is used for computing the
+        preconditioner and for products. The operator used for products
+        can be replaced with :func:`set_operator` while keeping the preconditioner,
+        so that a preconditioner can be reused for several systems.
+
+        Parameters
+        ----------
+        prop : {``symmetric``, ``unsymmetric``}
+        preconditioner : {``'ilu'``, ``'block_jacobi'``, ``None``}
+        tol : relative residual tolerance (float)
+        restart : number of iterations between restarts (int)
+        maxiter : max number of iterations (int, default is 10 times the size of the system)
+        drop_tol : drop tolerance of incomplete LU factorization (float)
+        fill_factor : fill ratio upper bound of incomplete LU factorization (float)
+        block_size : block size of block Jacobi preconditioner (int)
+        """
+
+        # Parent
+        LinSolver.__init__(self,prop)
+
+        # Check
+        if preconditioner not in ['ilu','block_jacobi',None]:
+            raise ValueError('invalid preconditioner')
+
+        # Name
+        self.name = 'gmres'
+
+        # Parameters
+        self.preconditioner = preconditioner
+        self.tol = tol
+        self.restart = restart
+        self.maxiter = maxiter
+        self.drop_tol = drop_tol
+        self.fill_factor = fill_factor
+        self.block_size = block_size
+
+        # Data
+        self.operator = None
+        self.M = None
+
+        #: Number of iterations of last solve (int).
+        self.num_iterations = 0
+
+        #: Flag that specifies whether the last solve reached the tolerance.
+        self.converged = False
+
+    def factorize(self,A):
+        """
+        Computes preconditioner of A and sets A as operator.
+
+        Parameters
+        ----------
+        A : matrix
+           For symmetric systems, should contain only lower diagonal part.
+        """
+
+        A = self.get_full_matrix(A)
+        self.operator = aslinearoperator(A)
+        self.analyzed = True
+
+        # No preconditioner
+        if self.preconditioner is None:
+            self.M = None
+            return
+
+        # Incomplete LU
+        if self.preconditioner == 'ilu':
+            lu = spilu(A,drop_tol=self.drop_tol,fill_factor=self.fill_factor)
+
+        # Block Jacobi
+        else:
+            A = coo_matrix(A)
+            mask = A.row//self.block_size == A.col//self.block_size
+            lu = splu(csc_matrix((A.data[mask],(A.row[mask],A.col[mask])),shape=A.shape))
+
+        self.M = LinearOperator(A.shape,lu.solve)
+
+    def set_operator(self,A):
+        """
+        Sets operator of the linear system and keeps the preconditioner.
+
+        Parameters
+        ----------
+        A : matrix or LinearOperator
+           For symmetric systems, matrices should contain only lower diagonal part.
+        """
+
+        if not isinstance(A,LinearOperator):
+            A = self.get_full_matrix(A)
+        self.operator = aslinearoperator(A)
+
+    def solve(self,b,x0=None):
+        """
+        Solves system Ax=b.
+
+        Parameters
+        ----------
+        b : ndarray
+           Vector or matrix whose columns are right-hand sides.
+        x0 : initial guess (ndarray)
+
+        Returns
+        -------
+        x : ndarray
+        """
+
+        # Multiple right-hand sides
+        if b.ndim == 2:
+            x = np.zeros(b.shape)
+            num_iterations = 0
+            converged = True
+            for j in range(b.shape[1]):
+                x[:,j] = self.solve(b[:,j],None if x0 is None else x0[:,j])
+                num_iterations += self.num_iterations
+                converged = converged and self.converged
+            self.num_iterations = num_iterations
+            self.converged = converged
+            return x
+
+        n = b.size
+        counter = [0]
+        def callback(r):
+            counter[0] += 1
+        maxiter = self.maxiter if self.maxiter is not None else 10*n
+        restart = min(self.restart,max(n,1))
+        kwargs = {'x0': x0,
+                  'M': self.M,
+                  'restart': restart,
+                  'maxiter': max(maxiter//restart,1),
+                  'callback': callback,
+                  'atol': 0.}
+        try:
+            x,info = gmres(self.operator,b,rtol=self.tol,callback_type='pr_norm',**kwargs)
+        except TypeError: # scipy < 1.12
+            x,info = gmres(self.operator,b,tol=self.tol,**kwargs)
+        if info < 0:
+            raise RuntimeError('gmres failed')
+        self.num_iterations = counter[0]
+        self.converged = info == 0
+        return x
@@ -6,6 +6,30 @@
 # OPTALG is released under the BSD 2-clause license. #
 #****************************************************#
 
+import hashlib
+import numpy as np
+from scipy.sparse import csc_matrix,coo_matrix
+
+def get_pattern_fingerprint(A):
+    """
+    Computes fingerprint of the sparsity pattern of A.
+    Explicitly stored zeros are part of the pattern.
+
+    Parameters
+    ----------
+    A : matrix
+
+    Returns
+    -------
+    fingerprint : tuple
+    """
+
+    A = csc_matrix(A)
+    h = hashlib.sha1()
+    h.update(np.ascontiguousarray(A.indptr,dtype=np.int64).tobytes())
+    h.update(np.ascontiguousarray(A.indices,dtype=np.int64).tobytes())
+    return (A.shape,A.nnz,h.hexdigest())
+
 class LinSolver:
 
     # Class constants
@@ -67,13 +91,27 @@ class LinSolver:
 
         pass
 
+    def get_num_negative_eigenvalues(self):
+        """
+        Gets number of negative eigenvalues of the last
+        factorized matrix (symmetric systems).
+
+        Returns
+        -------
+        num : int (``None`` if not available)
+        """
+
+        return None
+
     def solve(self,b):
         """
-        Solves system Ax=b.
+        Solves system Ax=b. Several systems with the same
+        matrix can be solved at once by passing a matrix b
+        whose columns are the right-hand sides.
         
         Parameters
         ----------
-        b: vector
+        b: vector or matrix of shape (n,k)
         
         Returns
         -------
@@ -95,6 +133,87 @@ class LinSolver:
 
         return self.solve(b)
 
-        
+    def get_full_matrix(self,A):
+        """
+        Gets matrix in CSC format with both triangular parts 
+        in the symmetric case. Explicitly stored zeros are kept
+        so that the sparsity pattern does not depend on the values.
 
-        
+        Parameters
+        ----------
+        A : matrix
+
+        Returns
+        -------
+        A : csc_matrix
+        """
+
+        if self.prop != self.SYMMETRIC:
+            return csc_matrix(A)
+
+        A = coo_matrix(A)
+        off = A.row != A.col
+        return csc_matrix((np.concatenate((A.data,A.data[off])),
+                           (np.concatenate((A.row,A.col[off])),
+                            np.concatenate((A.col,A.row[off])))),
+                          shape=A.shape)
+
+class LinSolverCache:
+    """
+    Cache of analyzed linear solvers keyed by sparsity pattern. It
+    allows solving several systems that share the same structure
+    with a single symbolic analysis. A cache should not be shared
+    by solvers that run concurrently.
+    """
+
+    def __init__(self,maxsize=32):
+        """
+        Cache of analyzed linear solvers.
+
+        Parameters
+        ----------
+        maxsize : maximum number of linear solvers kept (int)
+        """
+
+        #: Maximum number of linear solvers kept (int).
+        self.maxsize = maxsize
+
+        #: Analyzed linear solvers (dict).
+        self.linsolvers = {}
+
+        # Insertion order
+        self.keys = []
+
+    def get_linsolver(self,linsolver,A):
+        """
+        Gets linear solver analyzed for the sparsity pattern of A. If the cache
+        does not contain one, the given linear solver is analyzed and stored.
+
+        Parameters
+        ----------
+        linsolver : :class:`LinSolver <optalg.lin_solver.LinSolver>`
+        A : matrix
+
+        Returns
+        -------
+        linsolver : :class:`LinSolver <optalg.lin_solver.LinSolver>`
+        """
+
+        key = (linsolver.name,linsolver.prop,get_pattern_fingerprint(A))
+        if key in self.linsolvers:
+            return self.linsolvers[key]
+
+        linsolver.analyze(A)
+        self.linsolvers[key] = linsolver
+        self.keys.append(key)
+        while len(self.keys) > self.maxsize:
+            del self.linsolvers[self.keys.pop(0)]
+        return linsolver
+
+    def clear(self):
+        """
+        Removes all linear solvers.
+        """
+
+        self.linsolvers.clear()
+        del self.keys[:]
@@ -6,6 +6,7 @@
 # OPTALG is released under the BSD 2-clause license. #
 #****************************************************#
 
+import numpy as np
 from .lin_solver import LinSolver
 from scipy.sparse import coo_matrix
 
@@ -40,6 +41,13 @@ class LinSolverMUMPS(LinSolver):
         self.mumps.set_silent()
         self.mumps.set_icntl(14,200) # % increase of estimated working space
 
+        # Analyzed pattern
+        self.row = None
+        self.col = None
+        self.irn = None
+        self.jcn = None
+        self.values = None
+
     def analyze(self,A):
         """
         Analyzes structure of A.
@@ -52,12 +60,61 @@ class LinSolverMUMPS(LinSolver):
         """
 
         A = coo_matrix(A)
+
+        # Pattern (references are kept for detecting reuse)
+        self.row = A.row
+        self.col = A.col
+        self.irn = np.array(A.row+1,dtype=np.int32)
+        self.jcn = np.array(A.col+1,dtype=np.int32)
         
         self.mumps.set_shape(A.shape[0])
-        self.mumps.set_centralized_assembled_rows_cols(A.row+1,A.col+1)
+        self.mumps.set_centralized_assembled_rows_cols(self.irn,self.jcn)
         self.mumps.run(job=1)
 
         self.analyzed = True
+
+    def load_values(self,A):
+        """
+        Hands values of A to MUMPS. If A is a coo_matrix whose row and
+        column arrays are the ones given to :func:`analyze`, its data array
+        is passed without conversion or copy. Otherwise, the pattern of A is
+        compared with the analyzed one and A is analyzed again if they differ.
+
+        Parameters
+        ----------
+        A : matrix
+        """
+
+        if not (isinstance(A,coo_matrix) and self.analyzed and
+                A.row is self.row and A.col is self.col):
+            A = coo_matrix(A)
+            if not (self.analyzed and 
+                    np.array_equal(A.row,self.row) and 
+                    np.array_equal(A.col,self.col)):
+                self.analyze(A)
+
+        self.set_values(A.data)
+
+    def set_values(self,values):
+        """
+        Hands values of matrix with the analyzed pattern to MUMPS.
+        The array is used directly, so it must not be released or
+        reallocated before the factorization is computed.
+
+        Parameters
+        ----------
+        values : ndarray
+           Contiguous float64 array ordered as the entries of the analyzed matrix.
+        """
+
+        if not self.analyzed:
+            raise RuntimeError('matrix not analyzed')
+        if values.dtype != np.float64 or values.ndim != 1 or not values.flags.c_contiguous:
+            values = np.ascontiguousarray(values,dtype=np.float64).ravel()
+        if values.size != self.irn.size:
+            raise ValueError('invalid number of values')
+        self.values = values
+        self.mumps.set_centralized_assembled_values(values)
         
     def factorize(self,A):
         """
@@ -69,11 +126,36 @@ class LinSolverMUMPS(LinSolver):
            For symmetric systems, should contain only lower diagonal part.
         """
 
-        A = coo_matrix(A)
+        self.load_values(A)
+        self.mumps.run(job=2)
+
+    def factorize_values(self,values):
+        """
+        Factorizes matrix with the analyzed pattern and the given values.
+
+        Parameters
+        ----------
+        values : ndarray
+           Contiguous float64 array ordered as the entries of the analyzed matrix.
+        """
 
-        self.mumps.set_centralized_assembled_values(A.data)
+        self.set_values(values)
         self.mumps.run(job=2)
 
+    def get_num_negative_eigenvalues(self):
+        """
+        Gets number of negative eigenvalues of the last
+        factorized matrix (symmetric systems).
+
+        Returns
+        -------
+        num : int (``None`` if not available)
+        """
+
+        if self.prop != self.SYMMETRIC:
+            return None
+        return int(self.mumps.id.infog[11])
+
     def solve(self,b):
         """
         Solves system Ax=b.
@@ -81,13 +163,14 @@ class LinSolverMUMPS(LinSolver):
         Parameters
         ----------
         b : ndarray
+           Vector or matrix whose columns are right-hand sides.
         
         Returns
         -------
         x : ndarray
         """
 
-        x = b.copy()
+        x = np.array(b,dtype=np.float64,order='F')
         self.mumps.set_rhs(x)
         self.mumps.run(job=3)
 
@@ -101,16 +184,16 @@ class LinSolverMUMPS(LinSolver):
         ----------
         A : matrix
         b : ndarray
+           Vector or matrix whose columns are right-hand sides.
 
         Returns
         -------
         x : ndarray
         """
 
-        A = coo_matrix(A)
+        self.load_values(A)
 
-        x = b.copy()
-        self.mumps.set_centralized_assembled_values(A.data)
+        x = np.array(b,dtype=np.float64,order='F')
         self.mumps.set_rhs(x)
         self.mumps.run(job=5)
 
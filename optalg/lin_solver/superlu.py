@@ -6,9 +6,9 @@
 # OPTALG is released under the BSD 2-clause license. #
 #****************************************************#
 
+import numpy as np
 from .lin_solver import LinSolver
 from scipy.sparse.linalg import splu
-from scipy.sparse import csc_matrix,triu
 
 class LinSolverSUPERLU(LinSolver):
     """
@@ -29,10 +29,59 @@ class LinSolverSUPERLU(LinSolver):
         
         # Factorization
         self.lu = None
+        self.permuted = False # flag for factorization of column-permuted matrix
+
+        # Symbolic data
+        self.pattern = None # shape, column pointers and row indices of analyzed pattern
+        self.q = None       # fill-reducing column ordering
+
+    def analyze(self,A):
+        """
+        Analyzes structure of A. Stores its sparsity pattern so that
+        the fill-reducing column ordering computed by the next factorization
+        is reused by subsequent factorizations of matrices with the same pattern.
+
+        SciPy only exposes the COLAMD ordering of SuperLU through a numeric
+        factorization, so the ordering is taken from the first factorization
+        after the analysis instead of from an extra factorization here.
+
+        Parameters
+        ----------
+        A : matrix
+           For symmetric systems, should contain only lower diagonal part.
+        """
+
+        A = self.get_full_matrix(A)
+
+        self.pattern = (A.shape,A.indptr.copy(),A.indices.copy())
+        self.q = None
+        self.lu = None
+        self.analyzed = True
+
+    def has_pattern(self,A):
+        """
+        Checks whether A has the analyzed sparsity pattern.
+
+        Parameters
+        ----------
+        A : :class:`csc_matrix <scipy.sparse.csc_matrix>`
+
+        Returns
+        -------
+        flag : {``True``, ``False``}
+        """
+
+        if self.pattern is None:
+            return False
+        shape,indptr,indices = self.pattern
+        if A.shape != shape or A.indices.size != indices.size:
+            return False
+        return np.array_equal(A.indptr,indptr) and np.array_equal(A.indices,indices)
                 
     def factorize(self,A):
         """
-        Factorizes A.
+        Factorizes A. If the sparsity pattern of A differs from
+        the analyzed one, A is analyzed again.
 
         Parameters
         ----------
@@ -40,11 +89,18 @@ class LinSolverSUPERLU(LinSolver):
            For symmetric systems, should contain only lower diagonal part.
         """
         
-        A = csc_matrix(A)
-        if self.prop == self.SYMMETRIC:
-            A = (A + A.T) - triu(A)
+        A = self.get_full_matrix(A)
+
+        if not self.analyzed or not self.has_pattern(A):
+            self.analyze(A)
 
-        self.lu = splu(A)
+        if self.q is None:
+            self.lu = splu(A,permc_spec='COLAMD')
+            self.q = np.argsort(self.lu.perm_c)
+            self.permuted = False
+        else:
+            self.lu = splu(A[:,self.q],permc_spec='NATURAL')
+            self.permuted = True
         
     def solve(self,b):
         """
@@ -53,10 +109,16 @@ class LinSolverSUPERLU(LinSolver):
         Parameters
         ----------
         b : ndarray
+           Vector or matrix whose columns are right-hand sides.
         
         Returns
         -------
         x : ndarray
         """
 
-        return self.lu.solve(b)
+        z = self.lu.solve(b)
+        if not self.permuted:
+            return z
+        x = np.empty_like(z)
+        x[self.q] = z
+        return x
@@ -14,9 +14,14 @@ from .problem_mixintlin import MixIntLinProblem
 from .clp import OptSolverClp
 from .cbc import OptSolverCbc
 from .iqp import OptSolverIQP
+from .bnb import OptSolverBnB
+from .admm import OptSolverADMM
 from .inlp import OptSolverINLP
 from .ipopt import OptSolverIpopt
 from .augl import OptSolverAugL
 from .nr import OptSolverNR
 from .opt_solver_error import OptSolverError
-from .opt_solver import OptSolver, OptCallback, OptTermination
+from .opt_solver import OptSolver, OptCallback, OptTermination, OptProfiler
+from .batch import solve_batch
+from .scaling import compute_scaling, scale_problem
+from .presolve import presolve_problem, Presolve
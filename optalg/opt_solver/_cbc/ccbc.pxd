@@ -19,13 +19,22 @@ cdef extern from "coin/Cbc_C_Interface.h":
     void Cbc_setLogLevel(Cbc_Model* model, int value)
     
     int Cbc_status(Cbc_Model* model)
-    int Cbc_branchAndBound(Cbc_Model* model)
+    int Cbc_solve(Cbc_Model* model) nogil
     
     int Cbc_getNumRows(Cbc_Model* model)
     int Cbc_getNumCols(Cbc_Model* model)
     
     void Cbc_copyInIntegerInformation(Cbc_Model* model, char* information)
 
+    void Cbc_setColLower(Cbc_Model* model, int index, double value)
+    void Cbc_setColUpper(Cbc_Model* model, int index, double value)
+    void Cbc_setRowLower(Cbc_Model* model, int index, double value)
+    void Cbc_setRowUpper(Cbc_Model* model, int index, double value)
+    void Cbc_setObjCoeff(Cbc_Model* model, int index, double value)
+
+    void Cbc_setMIPStartI(Cbc_Model* model, int count, int* colIdxs, double* colValues)
+    void Cbc_setParameter(Cbc_Model* model, char* name, char* value)
+
     double* Cbc_getColSolution(Cbc_Model* model)
     
     int Cbc_isProvenOptimal(Cbc_Model* model)
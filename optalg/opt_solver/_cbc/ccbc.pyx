@@ -98,6 +98,42 @@ cdef class CbcContext:
         cdef np.ndarray[char,mode='c'] _flags = flags.astype(np.uint8)
         ccbc.Cbc_copyInIntegerInformation(self.model,<char*>(_flags.data))
 
+    def setColLower(self,index,value):
+
+        ccbc.Cbc_setColLower(self.model,index,value)
+
+    def setColUpper(self,index,value):
+
+        ccbc.Cbc_setColUpper(self.model,index,value)
+
+    def setRowLower(self,index,value):
+
+        ccbc.Cbc_setRowLower(self.model,index,value)
+
+    def setRowUpper(self,index,value):
+
+        ccbc.Cbc_setRowUpper(self.model,index,value)
+
+    def setObjCoeff(self,index,value):
+
+        ccbc.Cbc_setObjCoeff(self.model,index,value)
+
+    def setMIPStart(self,x):
+
+        n = ccbc.Cbc_getNumCols(self.model)
+        if x.size != n:
+            raise CbcContextError('start array must of size numcols')
+
+        cdef np.ndarray[int,mode='c'] _index = np.arange(n,dtype=np.int32)
+        cdef np.ndarray[double,mode='c'] _x = x
+        ccbc.Cbc_setMIPStartI(self.model,n,<int*>(_index.data),<double*>(_x.data))
+
+    def setParameter(self,name,value):
+
+        _name = str(name).encode('ascii')
+        _value = str(value).encode('ascii')
+        ccbc.Cbc_setParameter(self.model,_name,_value)
+
     def isProvenOptimal(self):
 
         return ccbc.Cbc_isProvenOptimal(self.model)
@@ -110,9 +146,12 @@ cdef class CbcContext:
 
         return ccbc.Cbc_status(self.model)
 
-    def branchAndBound(self):
-        
-        return ccbc.Cbc_branchAndBound(self.model)
+    def solve(self):
+
+        cdef int status
+        with nogil:
+            status = ccbc.Cbc_solve(self.model)
+        return status
 
     def getColSolution(self):
 
@@ -18,7 +18,17 @@ cdef extern from "coin/Clp_C_Interface.h":
 
     int Clp_status(Clp_Simplex* model)
     void Clp_setLogLevel(Clp_Simplex* model, int value)
-    int Clp_initialSolve(Clp_Simplex* model)
+    int Clp_initialSolve(Clp_Simplex* model) nogil
+    int Clp_dual(Clp_Simplex* model, int ifValuesPass) nogil
+    int Clp_primal(Clp_Simplex* model, int ifValuesPass) nogil
+
+    void Clp_chgObjCoefficients(Clp_Simplex* model, double* objIn)
+    void Clp_chgRowLower(Clp_Simplex* model, double* rowLower)
+    void Clp_chgRowUpper(Clp_Simplex* model, double* rowUpper)
+    void Clp_chgColumnLower(Clp_Simplex* model, double* columnLower)
+    void Clp_chgColumnUpper(Clp_Simplex* model, double* columnUpper)
+
+    int Clp_numberIterations(Clp_Simplex* model)
 
     int Clp_numberColumns(Clp_Simplex* model)
     int Clp_numberRows(Clp_Simplex* model)
@@ -97,8 +97,61 @@ cdef class ClpContext:
         return cclp.Clp_status(self.model)
 
     def initialSolve(self):
-        
-        return cclp.Clp_initialSolve(self.model)
+
+        cdef int status
+        with nogil:
+            status = cclp.Clp_initialSolve(self.model)
+        return status
+
+    def dual(self,ifValuesPass=0):
+
+        cdef int status
+        cdef int _ifValuesPass = ifValuesPass
+        with nogil:
+            status = cclp.Clp_dual(self.model,_ifValuesPass)
+        return status
+
+    def primal(self,ifValuesPass=0):
+
+        cdef int status
+        cdef int _ifValuesPass = ifValuesPass
+        with nogil:
+            status = cclp.Clp_primal(self.model,_ifValuesPass)
+        return status
+
+    def chgObjCoefficients(self,obj):
+
+        cdef np.ndarray[double,mode='c'] _obj = obj
+        assert(_obj.size == cclp.Clp_numberColumns(self.model))
+        cclp.Clp_chgObjCoefficients(self.model,<double*>(_obj.data))
+
+    def chgRowLower(self,rowlb):
+
+        cdef np.ndarray[double,mode='c'] _rowlb = rowlb
+        assert(_rowlb.size == cclp.Clp_numberRows(self.model))
+        cclp.Clp_chgRowLower(self.model,<double*>(_rowlb.data))
+
+    def chgRowUpper(self,rowub):
+
+        cdef np.ndarray[double,mode='c'] _rowub = rowub
+        assert(_rowub.size == cclp.Clp_numberRows(self.model))
+        cclp.Clp_chgRowUpper(self.model,<double*>(_rowub.data))
+
+    def chgColumnLower(self,collb):
+
+        cdef np.ndarray[double,mode='c'] _collb = collb
+        assert(_collb.size == cclp.Clp_numberColumns(self.model))
+        cclp.Clp_chgColumnLower(self.model,<double*>(_collb.data))
+
+    def chgColumnUpper(self,colub):
+
+        cdef np.ndarray[double,mode='c'] _colub = colub
+        assert(_colub.size == cclp.Clp_numberColumns(self.model))
+        cclp.Clp_chgColumnUpper(self.model,<double*>(_colub.data))
+
+    def numberIterations(self):
+
+        return cclp.Clp_numberIterations(self.model)
 
     def primalColumnSolution(self):
 
@@ -64,4 +64,4 @@ cdef extern from "coin/IpStdCInterface.h":
                    double* mult_g,
                    double* mult_x_L,
                    double* mult_x_U,
-                   UserDataPtr user_data)
+                   UserDataPtr user_data) nogil
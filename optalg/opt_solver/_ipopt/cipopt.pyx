@@ -51,6 +51,7 @@ cdef class IpoptContext:
     cdef object eval_grad_f
     cdef object eval_jac_g
     cdef object eval_h
+    cdef object error # exception raised by a callback
     cdef cipopt.IpoptProblem problem
     
     def __init__(self,n,m,l,u,gl,gu,eval_f,eval_g,eval_grad_f,eval_jac_g,eval_h):
@@ -67,13 +68,14 @@ cdef class IpoptContext:
         self.eval_grad_f = eval_grad_f
         self.eval_jac_g = eval_jac_g
         self.eval_h = eval_h
+        self.error = None
 
         self.problem = NULL
         
-        Jrow,Jcol = eval_jac_g(None,True) # x, flag        
+        Jrow,Jcol = eval_jac_g(None,False,True) # x, new_x, flag        
         self.nnzj = Jrow.size
 
-        Hrow,Hcol = eval_h(None,None,None,True) # x, lam, obj_factor, flag
+        Hrow,Hcol = eval_h(None,False,None,None,True) # x, new_x, lam, obj_factor, flag
         self.nnzh = Hrow.size
         
         try:
@@ -148,15 +150,29 @@ cdef class IpoptContext:
         cdef np.ndarray[double,mode='c'] nlam = np.zeros(self.m)
         cdef np.ndarray[double,mode='c'] npi = np.zeros(self.n)
         cdef np.ndarray[double,mode='c'] nmu = np.zeros(self.n)
-   
-        status = cipopt.IpoptSolve(self.problem,
-                                   <double*>(nx.data),
-                                   NULL,
-                                   NULL,
-                                   <double*>(nlam.data),
-                                   <double*>(npi.data),
-                                   <double*>(nmu.data),
-                                   cself)
+        cdef double* px = <double*>(nx.data)
+        cdef double* plam = <double*>(nlam.data)
+        cdef double* ppi = <double*>(npi.data)
+        cdef double* pmu = <double*>(nmu.data)
+        cdef int status
+
+        # Callbacks reacquire the GIL, store exceptions and return False
+        self.error = None
+        with nogil:
+            status = cipopt.IpoptSolve(self.problem,
+                                       px,
+                                       NULL,
+                                       NULL,
+                                       plam,
+                                       ppi,
+                                       pmu,
+                                       cself)
+
+        # Callback exceptions
+        if self.error is not None:
+            error = self.error
+            self.error = None
+            raise error
         
         return {'status' : status,
                 'k': self.iters,
@@ -165,66 +181,82 @@ cdef class IpoptContext:
                 'pi': npi,
                 'mu': nmu}
 
-cdef bint eval_f_cb(int n, double* x, bint new_x, double* obj_value, UserDataPtr user_data):
+cdef bint eval_f_cb(int n, double* x, bint new_x, double* obj_value, UserDataPtr user_data) with gil:
     cdef IpoptContext c = <IpoptContext>user_data
-    obj_value[0] = c.eval_f(ArrayDouble(x,c.n))
+    try:
+        obj_value[0] = c.eval_f(ArrayDouble(x,c.n),new_x)
+    except Exception as e:
+        c.error = e
+        return False
     return True
 
-cdef bint eval_grad_f_cb(int n, double* x, bint new_x, double* grad_f, UserDataPtr user_data):
+cdef bint eval_grad_f_cb(int n, double* x, bint new_x, double* grad_f, UserDataPtr user_data) with gil:
     cdef IpoptContext c = <IpoptContext>user_data
-    cdef np.ndarray[double,mode='c'] grad_f_arr = c.eval_grad_f(ArrayDouble(x,c.n))
-    memcpy(grad_f,<double*>(grad_f_arr.data),sizeof(double)*c.n)
+    cdef np.ndarray[double,mode='c'] grad_f_arr
+    try:
+        grad_f_arr = c.eval_grad_f(ArrayDouble(x,c.n),new_x)
+        memcpy(grad_f,<double*>(grad_f_arr.data),sizeof(double)*c.n)
+    except Exception as e:
+        c.error = e
+        return False
     return True
 
-cdef bint eval_g_cb(int n, double* x, bint new_x, int m, double* g, UserDataPtr user_data):
+cdef bint eval_g_cb(int n, double* x, bint new_x, int m, double* g, UserDataPtr user_data) with gil:
     cdef IpoptContext c = <IpoptContext>user_data
-    cdef np.ndarray[double,mode='c'] g_arr = c.eval_g(ArrayDouble(x,c.n))
-    memcpy(g,<double*>(g_arr.data),sizeof(double)*c.m)
+    cdef np.ndarray[double,mode='c'] g_arr
+    try:
+        g_arr = c.eval_g(ArrayDouble(x,c.n),new_x)
+        memcpy(g,<double*>(g_arr.data),sizeof(double)*c.m)
+    except Exception as e:
+        c.error = e
+        return False
     return True
 
 cdef bint eval_jac_g_cb(int n, double* x, bint new_x, int m, int nele_jac, 
-                        int* iRow, int* jCol, double* values, UserDataPtr user_data):
+                        int* iRow, int* jCol, double* values, UserDataPtr user_data) with gil:
     cdef IpoptContext c = <IpoptContext>user_data
     cdef np.ndarray[int,mode='c'] Jrow_arr
     cdef np.ndarray[int,mode='c'] Jcol_arr
-    cdef np.ndarray[double,mode='c'] Jdata_arr
-    if values == NULL:
-        assert(iRow != NULL and jCol != NULL)
-        Jrow_arr,Jcol_arr = c.eval_jac_g(None,True)
-        assert(Jrow_arr.size == nele_jac and Jcol_arr.size == nele_jac)
-        memcpy(iRow,<int*>(Jrow_arr.data),sizeof(int)*nele_jac)
-        memcpy(jCol,<int*>(Jcol_arr.data),sizeof(int)*nele_jac)
-    else:
-        assert(x != NULL)
-        Jdata_arr = c.eval_jac_g(ArrayDouble(x,c.n),False)
-        assert(Jdata_arr.size == nele_jac)
-        memcpy(values,<double*>(Jdata_arr.data),sizeof(double)*nele_jac)
+    try:
+        if values == NULL:
+            assert(iRow != NULL and jCol != NULL)
+            Jrow_arr,Jcol_arr = c.eval_jac_g(None,False,True)
+            assert(Jrow_arr.size == nele_jac and Jcol_arr.size == nele_jac)
+            memcpy(iRow,<int*>(Jrow_arr.data),sizeof(int)*nele_jac)
+            memcpy(jCol,<int*>(Jcol_arr.data),sizeof(int)*nele_jac)
+        else:
+            assert(x != NULL)
+            c.eval_jac_g(ArrayDouble(x,c.n),new_x,False,ArrayDouble(values,nele_jac)) # fills values
+    except Exception as e:
+        c.error = e
+        return False
     return True
 
 cdef bint eval_h_cb(int n, double* x, bint new_x, double obj_factor, int m, double* lam, bint new_lam,
-                    int nele_hess, int* iRow, int* jCol, double* values, UserDataPtr user_data):
+                    int nele_hess, int* iRow, int* jCol, double* values, UserDataPtr user_data) with gil:
     cdef IpoptContext c = <IpoptContext>user_data
     cdef np.ndarray[int,mode='c'] Hrow_arr
     cdef np.ndarray[int,mode='c'] Hcol_arr
-    cdef np.ndarray[double,mode='c'] Hdata_arr
-    if values == NULL:
-        assert(iRow != NULL and jCol != NULL)
-        Hrow_arr,Hcol_arr = c.eval_h(None,None,None,True)
-        assert(Hrow_arr.size == nele_hess and Hcol_arr.size == nele_hess)
-        memcpy(iRow,<int*>(Hrow_arr.data),sizeof(int)*nele_hess)
-        memcpy(jCol,<int*>(Hcol_arr.data),sizeof(int)*nele_hess)
-    else:
-        assert(x != NULL and lam != NULL)
-        Hdata_arr = c.eval_h(ArrayDouble(x,c.n),ArrayDouble(lam,c.m),obj_factor,False)
-        assert(Hdata_arr.size == nele_hess)
-        memcpy(values,<double*>(Hdata_arr.data),sizeof(double)*nele_hess)
+    try:
+        if values == NULL:
+            assert(iRow != NULL and jCol != NULL)
+            Hrow_arr,Hcol_arr = c.eval_h(None,False,None,None,True)
+            assert(Hrow_arr.size == nele_hess and Hcol_arr.size == nele_hess)
+            memcpy(iRow,<int*>(Hrow_arr.data),sizeof(int)*nele_hess)
+            memcpy(jCol,<int*>(Hcol_arr.data),sizeof(int)*nele_hess)
+        else:
+            assert(x != NULL and lam != NULL)
+            c.eval_h(ArrayDouble(x,c.n),new_x,ArrayDouble(lam,c.m),obj_factor,False,ArrayDouble(values,nele_hess)) # fills values
+    except Exception as e:
+        c.error = e
+        return False
     return True
 
 cdef bint intermediate_cb(int alg_mod, int iter_count, double obj_value, double inf_pr, double inf_du,
                           double mu, double d_norm, double regularization_size, double alpha_du, double alpha_pr,
-                          int ls_trials, UserDataPtr user_data):
+                          int ls_trials, UserDataPtr user_data) with gil:
     cdef IpoptContext c = <IpoptContext>user_data
     c.iters = iter_count
-    return True
+    return c.error is None # stops Ipopt after callback exceptions
         
     
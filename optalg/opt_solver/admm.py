@@ -0,0 +1,324 @@
+#****************************************************#
+# This file is part of OPTALG.                       #
+#                                                    #
+# Copyright (c) 2015-2017, Tomas Tinoco De Rubira.   #
+#                                                    #
+# OPTALG is released under the BSD 2-clause license. #
+#****************************************************#
+
+from __future__ import print_function
+import numpy as np
+from .opt_solver_error import *
+from .opt_solver import OptSolver
+from .kkt import KKTAssembler
+from optalg.lin_solver import new_linsolver
+from scipy.sparse import bmat,eye,tril
+
+class OptSolverADMM(OptSolver):
+    """
+    Operator-splitting (ADMM) quadratic program solver.
+
+    It follows the OSQP method of Stellato et al. (2020). The constraints
+    Ax = b and l <= x <= u are written as lc <= Cx <= uc with C = [A; I],
+    and each iteration solves a linear system with the quasi-definite matrix
+    [[H + sigma*I, C^T], [C, -diag(1/rho)]]. This matrix is factorized
+    only when the step parameter rho changes, so most iterations only
+    require one solve with the existing factors and a few matrix-vector
+    products. It is meant for large problems that need moderate accuracy.
+    """
+
+    # Solver parameters
+    parameters = {'tol': 1e-4,            # absolute tolerance
+                  'tol_rel': 1e-4,        # relative tolerance
+                  'maxiter': 10000,       # max iterations
+                  'rho': 0.1,             # initial step parameter
+                  'rho_min': 1e-6,        # min step parameter
+                  'rho_max': 1e6,         # max step parameter
+                  'rho_eq_factor': 1e3,   # step parameter factor of equality constraints
+                  'sigma': 1e-6,          # primal regularization
+                  'alpha': 1.6,           # relaxation parameter
+                  'adaptive_rho': True,   # flag for adapting step parameter
+                  'adaptive_rho_interval': 25, # iterations between step parameter updates
+                  'adaptive_rho_tol': 5., # min change factor that triggers refactorization
+                  'eps_pinf': 1e-4,       # primal infeasibility tolerance
+                  'eps_dinf': 1e-4,       # dual infeasibility tolerance
+                  'linsolver': 'default', # linear solver
+                  'scaling': None,        # problem scaling method (None, 'ruiz' or 'geometric')
+                  'presolve': False,      # flag for presolving problem
+                  'profile': False,       # flag for profiling solver phases
+                  'quiet': False}         # quiet flag
+
+    def __init__(self):
+        """
+        Operator-splitting (ADMM) quadratic program solver.
+        """
+
+        # Init
+        OptSolver.__init__(self)
+        self.parameters = OptSolverADMM.parameters.copy()
+        self.linsolver = None
+        self.kkt = None
+        self.rho = self.parameters['rho']
+        self.num_factorizations = 0
+
+    def get_results(self):
+        """
+        Gets results.
+
+        Returns
+        -------
+        results : dictionary
+        """
+
+        results = OptSolver.get_results(self)
+        results['rho'] = self.rho
+        results['num_factorizations'] = self.num_factorizations
+        return results
+
+    def solve(self,problem):
+        """
+        Solves optimization problem.
+
+        Parameters
+        ----------
+        problem : Object
+        """
+
+        # Local vars
+        norminf = self.norminf
+        parameters = self.parameters
+
+        # Parameters
+        tol = parameters['tol']
+        tol_rel = parameters['tol_rel']
+        maxiter = parameters['maxiter']
+        quiet = parameters['quiet']
+        sigma = parameters['sigma']
+        alpha = parameters['alpha']
+        adaptive_rho = parameters['adaptive_rho']
+        interval = parameters['adaptive_rho_interval']
+        rho_tol = parameters['adaptive_rho_tol']
+        eps_pinf = parameters['eps_pinf']
+        eps_dinf = parameters['eps_dinf']
+
+        # Problem
+        quad_problem = self.prepare_quad_problem(problem)
+        problem = self.problem
+
+        # Linsolver
+        self.linsolver = new_linsolver(parameters['linsolver'],'symmetric')
+
+        # Reset
+        self.reset()
+        self.num_factorizations = 0
+
+        # Solved by presolve
+        if quad_problem.H.shape[0] == 0:
+            self.set_status(self.STATUS_SOLVED)
+            return
+
+        # Checks
+        if not np.all(problem.l <= problem.u):
+            raise OptSolverError_Infeasibility(self)
+
+        # Data
+        self.H = quad_problem.H.tocsr()
+        self.g = quad_problem.g
+        self.A = quad_problem.A
+        self.n = quad_problem.H.shape[0]
+        self.m = quad_problem.A.shape[0]
+        self.C = bmat([[self.A],[eye(self.n)]],format='csr')
+        self.CT = self.C.T.tocsr()
+        self.lc = np.hstack((quad_problem.b,quad_problem.l))
+        self.uc = np.hstack((quad_problem.b,quad_problem.u))
+        n = self.n
+        m = self.m
+
+        # Constraint types
+        self.eq = self.lc == self.uc
+        self.free = np.logical_and(self.lc == -np.inf,self.uc == np.inf)
+
+        # Initial primal
+        if quad_problem.x is None:
+            x = np.zeros(n)
+        else:
+            x = quad_problem.x.copy()
+        z = np.clip(self.C*x,self.lc,self.uc)
+
+        # Initial dual (y = [-lam; mu-pi])
+        y = np.zeros(m+n)
+        if quad_problem.lam is not None:
+            y[:m] = -quad_problem.lam
+        if quad_problem.mu is not None:
+            y[m:] += quad_problem.mu
+        if quad_problem.pi is not None:
+            y[m:] -= quad_problem.pi
+
+        # KKT matrix (fixed pattern)
+        self.kkt = KKTAssembler((n+m+n,n+m+n),
+                                [('H',tril(self.H),0,0),
+                                 ('S',eye(n),0,0),
+                                 ('C',self.C,n,0),
+                                 ('R',eye(m+n),n,n)])
+        self.kkt.set_values('S',sigma)
+        self.rho = parameters['rho']
+        self.factorize(self.rho)
+
+        # Header
+        if not quiet:
+            print('\nSolver: ADMM')
+            print('------------')
+            print('{0:^5s}'.format('iter'), end=' ')
+            print('{0:^9s}'.format('phi'), end=' ')
+            print('{0:^9s}'.format('pres'), end=' ')
+            print('{0:^9s}'.format('dres'), end=' ')
+            print('{0:^8s}'.format('rho'))
+
+        self.k = 0
+        while True:
+
+            # Residuals
+            Hx = self.H*x
+            Cx = self.C*x
+            CTy = self.CT*y
+            pres = norminf(Cx-z)
+            dres = norminf(Hx+self.g+CTy)
+            eps_p = tol+tol_rel*np.maximum(norminf(Cx),norminf(z))
+            eps_d = tol+tol_rel*np.max([norminf(Hx),norminf(CTy),norminf(self.g)])
+
+            # Save
+            self.x = x
+            self.lam = -y[:m]
+            self.mu = np.maximum(y[m:],0.)
+            self.pi = np.maximum(-y[m:],0.)
+
+            # Done
+            done = pres <= eps_p and dres <= eps_d
+
+            # Show progress
+            if not quiet and (done or self.k % interval == 0):
+                phi = 0.5*np.dot(x,Hx)+np.dot(self.g,x)
+                print('{0:^5d}'.format(self.k), end=' ')
+                print('{0:^9.2e}'.format(phi), end=' ')
+                print('{0:^9.2e}'.format(pres), end=' ')
+                print('{0:^9.2e}'.format(dres), end=' ')
+                print('{0:^8.1e}'.format(self.rho))
+
+            if done:
+                self.set_status(self.STATUS_SOLVED)
+                self.set_error_msg('')
+                return
+
+            # Infeasibility certificates
+            if self.k > 0:
+                if self.is_primal_infeasible(y-y_prev,eps_pinf):
+                    raise OptSolverError_Infeasibility(self)
+                if self.is_dual_infeasible(x-x_prev,eps_dinf):
+                    raise OptSolverError_Unbounded(self)
+
+            # Maxiters
+            if self.k >= maxiter:
+                raise OptSolverError_MaxIters(self)
+
+            # Step parameter
+            if adaptive_rho and self.k > 0 and self.k % interval == 0:
+                ratio_p = pres/(np.maximum(norminf(Cx),norminf(z))+1e-10)
+                ratio_d = dres/(np.max([norminf(Hx),norminf(CTy),norminf(self.g)])+1e-10)
+                rho = np.clip(self.rho*np.sqrt(ratio_p/(ratio_d+1e-10)),
+                              parameters['rho_min'],
+                              parameters['rho_max'])
+                if rho > rho_tol*self.rho or rho*rho_tol < self.rho:
+                    self.factorize(rho)
+
+            # Linear system
+            rhs = np.hstack((sigma*x-self.g,z-y/self.rho_vec))
+            try:
+                with self.profiler.phase('solve'):
+                    w = self.linsolver.solve(rhs)
+            except RuntimeError:
+                raise OptSolverError_BadLinSystem(self)
+            xt = w[:n]
+            zt = z+(w[n:]-y)/self.rho_vec
+
+            # Update
+            x_prev = x
+            y_prev = y
+            x = alpha*xt+(1.-alpha)*x
+            zr = alpha*zt+(1.-alpha)*z
+            z = np.clip(zr+y/self.rho_vec,self.lc,self.uc)
+            y = y+self.rho_vec*(zr-z)
+            self.k += 1
+
+    def is_primal_infeasible(self,dy,eps):
+        """
+        Checks whether the change of the dual iterate is a certificate
+        of primal infeasibility, namely ||C^Tdy|| <= eps*||dy|| and
+        uc^Tmax(dy,0) + lc^Tmin(dy,0) < -eps*||dy||.
+
+        Parameters
+        ----------
+        dy : change of dual iterate (ndarray)
+        eps : tolerance (float)
+
+        Returns
+        -------
+        flag : {``True``, ``False``}
+        """
+
+        t = eps*self.norminf(dy)
+        if t == 0. or self.norminf(self.CT*dy) > t:
+            return False
+        up = np.isfinite(self.uc)
+        lo = np.isfinite(self.lc)
+        if np.any(dy[~up] > t) or np.any(dy[~lo] < -t):
+            return False
+        return np.dot(self.uc[up],np.maximum(dy[up],0.))+np.dot(self.lc[lo],np.minimum(dy[lo],0.)) < -t
+
+    def is_dual_infeasible(self,dx,eps):
+        """
+        Checks whether the change of the primal iterate is a certificate
+        of dual infeasibility (unboundedness), namely ||Hdx|| <= eps*||dx||,
+        g^Tdx < -eps*||dx|| and Cdx in the recession cone of [lc,uc].
+
+        Parameters
+        ----------
+        dx : change of primal iterate (ndarray)
+        eps : tolerance (float)
+
+        Returns
+        -------
+        flag : {``True``, ``False``}
+        """
+
+        t = eps*self.norminf(dx)
+        if t == 0. or self.norminf(self.H*dx) > t or np.dot(self.g,dx) >= -t:
+            return False
+        Cdx = self.C*dx
+        return (np.all(Cdx[np.isfinite(self.uc)] <= t) and
+                np.all(Cdx[np.isfinite(self.lc)] >= -t))
+
+    def factorize(self,rho):
+        """
+        Factorizes quasi-definite matrix for a given step parameter.
+
+        Parameters
+        ----------
+        rho : float
+        """
+
+        self.rho = rho
+        self.rho_vec = rho*np.ones(self.m+self.n)
+        self.rho_vec[self.eq] = rho*self.parameters['rho_eq_factor']
+        self.rho_vec[self.free] = self.parameters['rho_min']
+
+        with self.profiler.phase('assembly'):
+            self.kkt.set_values('R',-1./self.rho_vec)
+            K = self.kkt.get_matrix()
+        try:
+            if not self.linsolver.is_analyzed():
+                self.linsolver = self.analyze(self.linsolver,K)
+            with self.profiler.phase('factorize'):
+                self.linsolver.factorize(K)
+        except RuntimeError:
+            raise OptSolverError_BadLinSystem(self)
+        self.num_factorizations += 1
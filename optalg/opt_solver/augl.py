@@ -11,6 +11,7 @@ import numpy as np
 from functools import reduce
 from .opt_solver_error import *
 from .problem import cast_problem
+from .scaling import scale_problem
 from .opt_solver import OptSolver
 from optalg.lin_solver import new_linsolver
 from scipy.sparse import bmat,eye,coo_matrix,tril
@@ -36,11 +37,24 @@ class OptSolverAugL(OptSolver):
                   'subprob_force' : 10,     # for periodic sigma decrease
                   'subprob_maxiter' : 150,  # maximum subproblem iterations
                   'linsolver' : 'default',  # linear solver
+                  'line_search' : 'bisection', # line search method ('bisection' or 'cubic')
+                  'scaling' : None,         # problem scaling method (None, 'ruiz' or 'geometric')
+                  'hessian' : 'exact',      # Hessian of subproblems ('exact' or 'lbfgs')
+                  'lbfgs_memory' : 10,      # number of L-BFGS correction pairs
+                  'profile' : False,        # flag for profiling solver phases
                   'quiet' : False}          # flag for omitting output
     
     def __init__(self):
         """
         Augmented Lagrangian algorithm.
+
+        With parameter ``'hessian'`` set to ``'lbfgs'``, the Hessian of the
+        Lagrangian in the subproblems is replaced by a limited-memory BFGS
+        approximation built from gradient differences, and combine_H of the
+        problem is never called. The approximation is kept in compact form
+        and the KKT systems are solved with the Sherman-Morrison-Woodbury formula,
+        so the factorized matrix only contains the barrier Hessian and
+        the constraint Jacobians.
         """
         
         OptSolver.__init__(self)
@@ -48,6 +62,7 @@ class OptSolverAugL(OptSolver):
         self.linsolver1 = None 
         self.linsolver2 = None
         self.barrier = None
+        self.lbfgs = None
 
     def solve(self,problem):
         
@@ -69,9 +84,13 @@ class OptSolverAugL(OptSolver):
         theta_init_min = params['theta_init_min']
         theta_init_max = params['theta_init_max']
         theta_min = params['theta_min']
+        if params['hessian'] not in ['exact','lbfgs']:
+            raise ValueError('invalid hessian type')
 
         # Problem
         problem = cast_problem(problem)
+        if params['scaling'] is not None:
+            problem = scale_problem(problem,params['scaling'])
         self.problem = problem
 
         # Linear solver
@@ -94,6 +113,12 @@ class OptSolverAugL(OptSolver):
         assert(np.all(self.x > self.barrier.umin))
         assert(np.all(self.x < self.barrier.umax))
 
+        # Quasi-Newton
+        if params['hessian'] == 'lbfgs':
+            self.lbfgs = AugLLBFGS(problem.get_num_primal_variables(),params['lbfgs_memory'])
+        else:
+            self.lbfgs = None
+
         # Init dual
         if problem.lam is not None:
             self.lam = problem.lam.copy()
@@ -291,6 +316,11 @@ class OptSolverAugL(OptSolver):
             if not alpha_max:
                 raise OptSolverError_NumProblems(self)
             
+            # Lagrangian gradient (fixed multipliers)
+            if self.lbfgs is not None:
+                w = fdata.f/self.sigma-self.nu
+                gL = fdata.gphi+problem.J.T*w
+
             try:
 
                 # Line search
@@ -299,6 +329,10 @@ class OptSolverAugL(OptSolver):
                 # Update x
                 self.x += alpha*p
 
+                # Quasi-Newton update
+                if self.lbfgs is not None:
+                    self.lbfgs.update(alpha*p,fdata.gphi+problem.J.T*w-gL)
+
             except OptSolverError_LineSearch:
 
                 # Update 
@@ -332,6 +366,9 @@ class OptSolverAugL(OptSolver):
                 j = 0 
 
     def compute_search_direction(self,useH):
+
+        if self.lbfgs is not None:
+            return self.compute_search_direction_lbfgs()
         
         fdata = self.fdata
         problem = self.problem
@@ -340,40 +377,89 @@ class OptSolverAugL(OptSolver):
         sigma = self.sigma
         theta = self.theta
 
-        problem.combine_H(-sigma*self.nu+problem.f,not useH)
+        with self.profiler.phase('combine_H'):
+            problem.combine_H(-sigma*self.nu+problem.f,not useH)
         self.code[0] = 'h' if useH else 'g'
 
         Hfsigma = problem.H_combined/sigma
         Hphi = fdata.Hphi
         HphiB = fdata.HphiB
-        G = coo_matrix((np.concatenate((Hphi.data,theta*HphiB.data,Hfsigma.data)),
-                        (np.concatenate((Hphi.row,HphiB.row,Hfsigma.row)),
-                         np.concatenate((Hphi.col,HphiB.col,Hfsigma.col)))))
-
-        if problem.A.size:
-            W = bmat([[G,None,None],
-                      [problem.J,-sigma*self.Iff,None],
-                      [problem.A,None,-sigma*self.Iaa]])
-        else:
-            W = bmat([[G,None],
-                      [problem.J,-sigma*self.Iff]])
+        Ixx = self.Ixx
+        
+        def get_matrix(dw,dc):
+            G = coo_matrix((np.concatenate((Hphi.data,theta*HphiB.data,Hfsigma.data,dw*Ixx.data)),
+                            (np.concatenate((Hphi.row,HphiB.row,Hfsigma.row,Ixx.row)),
+                             np.concatenate((Hphi.col,HphiB.col,Hfsigma.col,Ixx.col)))))
+            if problem.A.size:
+                return bmat([[G,None,None],
+                             [problem.J,-(sigma+dc)*self.Iff,None],
+                             [problem.A,None,-(sigma+dc)*self.Iaa]])
+            else:
+                return bmat([[G,None],
+                             [problem.J,-(sigma+dc)*self.Iff]])
         b = np.hstack((-fdata.GradF/sigma,
                        self.of,
                        self.oa))
 
-        if not self.linsolver1.is_analyzed():
-            self.linsolver1.analyze(W)
+        self.linsolver1 = self.factorize_kkt(self.linsolver1,get_matrix,self.nf+(self.na if problem.A.size else 0))
 
-        return self.linsolver1.factorize_and_solve(W,b)[:self.x.size]
+        with self.profiler.phase('solve'):
+            return self.linsolver1.solve(b)[:self.x.size]
         
+    def compute_search_direction_lbfgs(self):
+
+        fdata = self.fdata
+        problem = self.problem
+        lbfgs = self.lbfgs
+
+        sigma = self.sigma
+        theta = self.theta
+        self.code[0] = 'q'
+
+        n = self.x.size
+        delta,W,Minv = lbfgs.get_compact_form()
+        HphiB = fdata.HphiB
+        Ixx = self.Ixx
+
+        # Matrix without low-rank term
+        def get_matrix(dw,dc):
+            G = coo_matrix((np.concatenate((theta*HphiB.data,(delta+dw)*Ixx.data)),
+                            (np.concatenate((HphiB.row,Ixx.row)),
+                             np.concatenate((HphiB.col,Ixx.col)))))
+            if problem.A.size:
+                return bmat([[G,None,None],
+                             [problem.J,-(sigma+dc)*self.Iff,None],
+                             [problem.A,None,-(sigma+dc)*self.Iaa]])
+            else:
+                return bmat([[G,None],
+                             [problem.J,-(sigma+dc)*self.Iff]])
+        b = np.hstack((-fdata.GradF/sigma,
+                       self.of,
+                       self.oa))
+
+        self.linsolver1 = self.factorize_kkt(self.linsolver1,get_matrix,self.nf+(self.na if problem.A.size else 0))
+
+        # Sherman-Morrison-Woodbury
+        with self.profiler.phase('solve'):
+            if not W.shape[1]:
+                return self.linsolver1.solve(b)[:n]
+            rhs = np.zeros((b.size,W.shape[1]+1))
+            rhs[:,0] = b
+            rhs[:n,1:] = W
+            Z = self.linsolver1.solve(rhs)[:n,:]
+            v = Z[:,0]
+            Z = Z[:,1:]
+            t = np.linalg.solve(Minv-np.dot(W.T,Z),np.dot(W.T,v))
+            return v+np.dot(Z,t)
+
     def func(self,x):
         
         # Norm
         norm = self.norminf
 
-        # Multipliers
-        lam = self.lam    
-        nu = self.nu
+        # Multipliers (copies since lazy fields use them after update_multiplier_estimates)
+        lam = self.lam.copy()
+        nu = self.nu.copy()
 
         # Penalty
         sigma = self.sigma
@@ -385,13 +471,15 @@ class OptSolverAugL(OptSolver):
         barrier = self.barrier
 
         # Eval
-        p.eval(x)
-        barrier.eval(x)
+        fdata.reset(x)
+        with self.profiler.phase('eval'):
+            p.eval(x)
+            barrier.eval(x)
         
         # Problem data
-        phi = p.phi/self.obj_sca
-        gphi = p.gphi/self.obj_sca
-        Hphi = p.Hphi/self.obj_sca
+        obj_sca = self.obj_sca
+        phi = p.phi/obj_sca
+        gphi = p.gphi/obj_sca
         f = p.f
         J = p.J
         A = p.A
@@ -406,22 +494,23 @@ class OptSolverAugL(OptSolver):
         nuTf = np.dot(nu,f)
         y = (sigma*nu-f)
         JT = J.T
-        JTnu = JT*nu
         JTy = JT*y
         
         # Intermediate
         lamTr = np.dot(lam,r)
         z = (sigma*lam-r)
         AT = A.T
-        ATlam = AT*lam
         ATz = AT*z
         
         pres = np.hstack((r,f))
-        dres = gphi+theta*gphiB-ATlam-JTnu
-        dres_den = 1.+norm(gphi)+theta*norm(gphiB)+norm(A.data)*norm(lam)+norm(J.data)*norm(nu)
+
+        def dres():
+            dres = gphi+theta*gphiB-fdata.ATlam-fdata.JTnu
+            dres_den = 1.+norm(gphi)+theta*norm(gphiB)+norm(A.data)*norm(lam)+norm(J.data)*norm(nu)
+            return dres/dres_den
                
-        fdata.ATlam = ATlam
-        fdata.JTnu = JTnu
+        fdata.set_lazy('ATlam',lambda: AT*lam)
+        fdata.set_lazy('JTnu',lambda: JT*nu)
  
         fdata.r = r
         fdata.f = f
@@ -430,11 +519,11 @@ class OptSolverAugL(OptSolver):
         fdata.GradF = sigma*gphi + sigma*theta*gphiB - JTy - ATz
         
         fdata.pres = pres
-        fdata.dres = dres/dres_den
+        fdata.set_lazy('dres',dres)
 
         fdata.phi = phi
         fdata.gphi = gphi
-        fdata.Hphi = Hphi
+        fdata.set_lazy('Hphi',lambda: p.Hphi/obj_sca)
 
         fdata.phiB = phiB
         fdata.gphiB = gphiB
@@ -492,21 +581,25 @@ class OptSolverAugL(OptSolver):
         JT = J.T
 
         t = fdata.gphi+theta*fdata.gphiB-fdata.ATlam-fdata.JTnu
-        if problem.A.size:
-            W = bmat([[eta*self.Iaa,None,None],
-                      [None,eta*self.Iff,None],
-                      [AT,JT,-self.Ixx]],format='coo')
-        else:
-            W = bmat([[eta*self.Iff,None],
-                      [JT,-self.Ixx]],format='coo')
+        with self.profiler.phase('assembly'):
+            if problem.A.size:
+                W = bmat([[eta*self.Iaa,None,None],
+                          [None,eta*self.Iff,None],
+                          [AT,JT,-self.Ixx]],format='coo')
+            else:
+                W = bmat([[eta*self.Iff,None],
+                          [JT,-self.Ixx]],format='coo')
         b = np.hstack((A*t,
                        J*t,
                        self.ox))
 
         if not self.linsolver2.is_analyzed():
-            self.linsolver2.analyze(W)
+            self.linsolver2 = self.analyze(self.linsolver2,W)
 
-        sol = self.linsolver2.factorize_and_solve(W,b)
+        with self.profiler.phase('factorize'):
+            self.linsolver2.factorize(W)
+        with self.profiler.phase('solve'):
+            sol = self.linsolver2.solve(b)
         
         self.lam += sol[:self.na]
         self.nu += sol[self.na:self.na+self.nf]
@@ -565,3 +658,69 @@ class AugLBarrier:
         
         du = self.umax-self.umin
         return np.maximum(np.minimum(x, self.umax-eps*du), self.umin+eps*du)
+
+class AugLLBFGS:
+    """
+    Class for handling limited-memory BFGS approximations.
+    """
+
+    def __init__(self, n, memory=10, eps=1e-8):
+
+        assert(n >= 0)
+        assert(memory >= 0)
+
+        self.n = n
+        self.memory = memory
+        self.eps = eps
+        self.S = []
+        self.Y = []
+        self.delta = 1.
+
+    def update(self,s,y):
+        """
+        Stores correction pair if it has positive curvature.
+
+        Parameters
+        ----------
+        s : step (ndarray)
+        y : gradient difference (ndarray)
+
+        Returns
+        -------
+        flag : {``True``, ``False``}
+        """
+
+        sy = np.dot(s,y)
+        if not self.memory or sy <= self.eps*np.linalg.norm(s)*np.linalg.norm(y):
+            return False
+        self.S.append(s.copy())
+        self.Y.append(y.copy())
+        if len(self.S) > self.memory:
+            self.S.pop(0)
+            self.Y.pop(0)
+        self.delta = np.dot(y,y)/sy
+        return True
+
+    def get_compact_form(self):
+        """
+        Gets compact representation B = delta*I - W*inv(Minv)*W^T
+        of the approximation (Byrd, Nocedal and Schnabel, 1994).
+
+        Returns
+        -------
+        delta : float
+        W : ndarray
+        Minv : ndarray
+        """
+
+        if not self.S:
+            return self.delta,np.zeros((self.n,0)),np.zeros((0,0))
+        delta = self.delta
+        S = np.array(self.S).T
+        Y = np.array(self.Y).T
+        SY = np.dot(S.T,Y)
+        L = np.tril(SY,-1)
+        W = np.hstack((delta*S,Y))
+        Minv = np.vstack((np.hstack((delta*np.dot(S.T,S),L)),
+                          np.hstack((L.T,-np.diag(np.diag(SY))))))
+        return delta,W,Minv
@@ -0,0 +1,117 @@
+#****************************************************#
+# This file is part of OPTALG.                       #
+#                                                    #
+# Copyright (c) 2015-2017, Tomas Tinoco De Rubira.   #
+#                                                    #
+# OPTALG is released under the BSD 2-clause license. #
+#****************************************************#
+
+import threading
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+from optalg.lin_solver import LinSolverCache
+from .opt_solver import OptSolver
+
+# Worker data
+worker_data = threading.local()
+
+def solve_batch(problems,solver_class,parameters=None,num_workers=None,pool='process',chunksize=1,
+                share_analysis=True):
+    """
+    Solves independent optimization problems in parallel.
+
+    Parameters
+    ----------
+    problems : list of problems
+    solver_class : :class:`OptSolver <optalg.opt_solver.OptSolver>` subclass
+    parameters : solver parameters (dict)
+    num_workers : number of workers (int, default is number of CPUs)
+    pool : {``'process'``, ``'thread'``}
+    chunksize : number of problems sent to a worker at a time (int)
+    share_analysis : flag for reusing analyzed linear solvers among problems
+                     with the same structure solved by a worker during the call
+
+    Returns
+    -------
+    results : list of dictionaries returned by :func:`get_results() <optalg.opt_solver.OptSolver.get_results>`, in the order of the problems.
+              Failed solves have status ``'error'`` and the error message in ``'error_msg'``.
+    """
+
+    if pool not in ['process','thread']:
+        raise ValueError('invalid pool type')
+    if num_workers is None:
+        num_workers = multiprocessing.cpu_count()
+    num_workers = max(min(num_workers,len(problems)),1)
+
+    items = [(solver_class,parameters,problem) for problem in problems]
+
+    # Serial
+    if num_workers == 1:
+        init_batch_worker(share_analysis)
+        try:
+            return [solve_batch_item(item) for item in items]
+        finally:
+            clear_batch_worker()
+
+    # Parallel (caches of workers end with the pool)
+    if pool == 'process':
+        p = multiprocessing.Pool(num_workers,init_batch_worker,(share_analysis,))
+    else:
+        p = ThreadPool(num_workers,init_batch_worker,(share_analysis,))
+    try:
+        return p.map(solve_batch_item,items,chunksize)
+    finally:
+        p.close()
+        p.join()
+
+def init_batch_worker(share_analysis):
+    """
+    Creates cache of analyzed linear solvers of the current worker
+    for one call of :func:`solve_batch`.
+
+    Parameters
+    ----------
+    share_analysis : flag for reusing analyzed linear solvers among problems
+    """
+
+    worker_data.linsolver_cache = LinSolverCache() if share_analysis else None
+
+def clear_batch_worker():
+    """
+    Clears and removes cache of analyzed linear solvers of the current worker.
+    """
+
+    cache = getattr(worker_data,'linsolver_cache',None)
+    if cache is not None:
+        cache.clear()
+    worker_data.linsolver_cache = None
+
+def solve_batch_item(item):
+    """
+    Solves single problem of a batch.
+
+    Parameters
+    ----------
+    item : (solver class, parameters, problem) tuple
+
+    Returns
+    -------
+    results : dictionary
+    """
+
+    solver_class,parameters,problem = item
+
+    solver = solver_class()
+    if parameters:
+        solver.set_parameters(parameters)
+    cache = getattr(worker_data,'linsolver_cache',None)
+    if cache is not None:
+        solver.set_linsolver_cache(cache)
+    try:
+        solver.solve(problem)
+    except Exception as e:
+        if solver.get_status() != OptSolver.STATUS_ERROR:
+            solver.set_status(OptSolver.STATUS_ERROR)
+            solver.set_error_msg(str(e))
+
+    return solver.get_results()
@@ -0,0 +1,468 @@
+#****************************************************#
+# This file is part of OPTALG.                       #
+#                                                    #
+# Copyright (c) 2015-2017, Tomas Tinoco De Rubira.   #
+#                                                    #
+# OPTALG is released under the BSD 2-clause license. #
+#****************************************************#
+
+from __future__ import print_function
+import heapq
+import threading
+import multiprocessing
+import numpy as np
+from multiprocessing.pool import ThreadPool
+from .opt_solver_error import *
+from .opt_solver import OptSolver
+from .iqp import OptSolverIQP
+from .problem_lin import LinProblem
+from .problem_quad import QuadProblem
+from .problem_mixintlin import MixIntLinProblem
+from .problem_error import OptProblemError_Infeasible, OptProblemError_Unbounded
+from .presolve import presolve_problem
+from scipy.sparse import coo_matrix,bmat,eye
+
+# Worker data
+worker_data = threading.local()
+
+class OptSolverBnB(OptSolver):
+    """
+    Branch-and-bound solver for mixed-integer linear and quadratic problems.
+
+    It solves :class:`MixIntLinProblem <optalg.opt_solver.problem_mixintlin.MixIntLinProblem>`
+    instances, as well as :class:`QuadProblem <optalg.opt_solver.problem_quad.QuadProblem>`
+    and :class:`LinProblem <optalg.opt_solver.problem_lin.LinProblem>` instances whose
+    attribute P flags the integer variables. Node relaxations are solved with
+    :class:`OptSolverClp <optalg.opt_solver.clp.OptSolverClp>` in persistent mode,
+    which re-solves from the basis of the previous node of the same worker, or with
+    :class:`OptSolverIQP <optalg.opt_solver.iqp.OptSolverIQP>` started from the
+    solution of the parent node. With more than one worker, batches of open nodes
+    are evaluated concurrently on a process or thread pool.
+    """
+
+    # Solver parameters
+    parameters = {'relaxation': 'default',   # relaxation solver ('default', 'clp' or 'iqp')
+                  'relaxation_parameters': None, # parameters of relaxation solver (dict)
+                  'node_selection': 'hybrid', # node selection ('hybrid', 'best_bound' or 'depth_first')
+                  'int_tol': 1e-5,           # integrality tolerance
+                  'mip_gap': 1e-6,           # relative gap tolerance
+                  'maxiter': 10000,          # max number of nodes
+                  'bound_inf': 1e8,          # finite bound of unbounded variables for IQP relaxations
+                  'num_workers': 1,          # number of workers for evaluating nodes
+                  'pool': 'process',         # worker pool ('process' or 'thread')
+                  'profile': False,          # flag for profiling solver phases
+                  'quiet': False}            # quiet flag
+
+    def __init__(self):
+        """
+        Branch-and-bound solver for mixed-integer linear and quadratic problems.
+
+        With node selection ``'hybrid'``, the tree is explored depth-first
+        until an integer feasible point is found, and best-bound afterwards.
+        Nodes are pruned only if their relaxations are infeasible or bounded by
+        the incumbent. If a relaxation fails for other reasons and its subtree
+        could contain better points, :class:`OptSolverError_Relaxation` is raised
+        (the incumbent, bound and gap remain available). The IQP relaxation
+        tolerance is set to a tenth of ``'int_tol'`` unless given in ``'relaxation_parameters'``.
+        Infinite variable bounds are replaced by ``'bound_inf'`` for IQP relaxations, whose
+        interior-point method needs finite bounds.
+        """
+
+        # Init
+        OptSolver.__init__(self)
+        self.parameters = OptSolverBnB.parameters.copy()
+        self.bound = -np.inf
+        self.gap = np.inf
+        self.num_nodes = 0
+
+    def get_results(self):
+        """
+        Gets results.
+
+        Returns
+        -------
+        results : dictionary
+        """
+
+        results = OptSolver.get_results(self)
+        results['bound'] = self.bound
+        results['gap'] = self.gap
+        results['num_nodes'] = self.num_nodes
+        return results
+
+    def solve(self,problem):
+        """
+        Solves optimization problem.
+
+        Parameters
+        ----------
+        problem : Object
+        """
+
+        # Local vars
+        params = self.parameters
+
+        # Parameters
+        int_tol = params['int_tol']
+        mip_gap = params['mip_gap']
+        maxiter = params['maxiter']
+        num_workers = params['num_workers']
+        quiet = params['quiet']
+        selection = params['node_selection']
+        if selection not in ['hybrid','best_bound','depth_first']:
+            raise ValueError('invalid node selection')
+        if params['pool'] not in ['process','thread']:
+            raise ValueError('invalid pool type')
+
+        # Problem
+        if not isinstance(problem,(MixIntLinProblem,LinProblem,QuadProblem)):
+            raise OptSolverError_BadProblemType(self)
+        self.problem = problem
+        n = problem.get_num_primal_variables()
+        P = problem.P if problem.P is not None else np.zeros(n,dtype=bool)
+        self.P = P
+
+        # Relaxation
+        relaxation_solver = params['relaxation']
+        if relaxation_solver == 'default':
+            relaxation_solver = 'iqp'
+            if not isinstance(problem,QuadProblem):
+                try:
+                    from ._clp import ClpContext
+                    relaxation_solver = 'clp'
+                except ImportError:
+                    pass
+        if relaxation_solver not in ['clp','iqp']:
+            raise ValueError('invalid relaxation solver')
+        if relaxation_solver == 'clp' and isinstance(problem,QuadProblem):
+            raise OptSolverError_BadProblemType(self)
+        relaxation = create_bnb_relaxation(problem,relaxation_solver)
+        relaxation_params = {}
+        if relaxation_solver == 'iqp':
+            relaxation_params['tol'] = min(OptSolverIQP.parameters['tol'],0.1*int_tol)
+        relaxation_params.update(params['relaxation_parameters'] or {})
+        init_data = (relaxation,relaxation_solver,relaxation_params)
+
+        # Reset
+        self.reset()
+        self.bound = -np.inf
+        self.gap = np.inf
+        self.num_nodes = 0
+        self.x = None
+        phi_best = np.inf
+        cutoff = np.inf
+        unresolved = [] # bounds of nodes whose relaxation failed
+
+        # Root bounds
+        l = problem.l.copy()
+        u = problem.u.copy()
+        if relaxation_solver == 'iqp':
+            l = np.maximum(l,-params['bound_inf'])
+            u = np.minimum(u,params['bound_inf'])
+
+        # Open nodes (heap for best-bound and stack for depth-first)
+        counter = 0
+        root = BnBNode(l,u,-np.inf,0,problem.x)
+        heap = [(root.bound,counter,root)]
+        stack = [root]
+        num_open = 1
+
+        # Header
+        if not quiet:
+            print('\nSolver: BnB')
+            print('-----------')
+            print('{0:^7s}'.format('nodes'), end=' ')
+            print('{0:^7s}'.format('open'), end=' ')
+            print('{0:^10s}'.format('bound'), end=' ')
+            print('{0:^10s}'.format('best'), end=' ')
+            print('{0:^9s}'.format('gap'))
+
+        # Workers
+        pool = None
+        if num_workers > 1:
+            if params['pool'] == 'process':
+                pool = multiprocessing.Pool(num_workers,init_bnb_worker,init_data)
+            else:
+                pool = ThreadPool(num_workers,init_bnb_worker,init_data)
+        else:
+            init_bnb_worker(*init_data)
+
+        try:
+            while num_open > 0:
+
+                # Bound and gap
+                while heap[0][2].taken:
+                    heapq.heappop(heap)
+                unresolved = [b for b in unresolved if b < cutoff]
+                self.bound = min([heap[0][0],phi_best]+unresolved)
+                self.gap = gap(phi_best,self.bound)
+
+                # Show progress
+                if not quiet:
+                    print('{0:^7d}'.format(self.num_nodes), end=' ')
+                    print('{0:^7d}'.format(num_open), end=' ')
+                    print('{0:^10.3e}'.format(self.bound), end=' ')
+                    print('{0:^10.3e}'.format(phi_best), end=' ')
+                    print('{0:^9.2e}'.format(self.gap))
+
+                # Done
+                if self.gap <= mip_gap:
+                    break
+
+                # Maxiters
+                if self.num_nodes >= maxiter:
+                    raise OptSolverError_MaxIters(self)
+
+                # Select nodes
+                depth_first = (selection == 'depth_first' or
+                               (selection == 'hybrid' and self.x is None))
+                nodes = []
+                while len(nodes) < max(num_workers,1) and num_open > 0:
+                    if depth_first:
+                        node = stack.pop()
+                    else:
+                        node = heapq.heappop(heap)[2]
+                    if node.taken:
+                        continue
+                    node.taken = True
+                    num_open -= 1
+                    if node.bound < cutoff:
+                        nodes.append(node)
+                if not nodes:
+                    continue
+
+                # Evaluate
+                items = [(node.l,node.u,node.x) for node in nodes]
+                if pool is not None:
+                    results = pool.map(solve_bnb_node,items)
+                else:
+                    results = [solve_bnb_node(item) for item in items]
+                self.num_nodes += len(nodes)
+                self.k = self.num_nodes
+
+                # Process
+                for node,(status,x,phi) in zip(nodes,results):
+                    if status == 'infeasible':
+                        continue
+                    if status == 'failed':
+                        unresolved.append(node.bound)
+                        continue
+                    if phi >= cutoff:
+                        continue
+                    frac = np.abs(x-np.round(x))
+                    frac[~P] = 0.
+                    if np.all(frac <= int_tol):
+                        x = x.copy()
+                        x[P] = np.round(x[P])
+                        relaxation.eval(x)
+                        phi_best = relaxation.phi
+                        cutoff = phi_best-mip_gap*max(1.,abs(phi_best))
+                        self.x = x
+                        continue
+                    j = np.argmax(frac)
+                    down = BnBNode(node.l,node.u.copy(),phi,node.depth+1,x)
+                    down.u[j] = np.floor(x[j])
+                    up = BnBNode(node.l.copy(),node.u,phi,node.depth+1,x)
+                    up.l[j] = np.ceil(x[j])
+                    for child in (down,up) if x[j]-np.floor(x[j]) > 0.5 else (up,down):
+                        counter += 1
+                        heapq.heappush(heap,(child.bound,counter,child))
+                        if selection != 'best_bound':
+                            stack.append(child) # nearest child is explored first
+                        num_open += 1
+
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+        # Result
+        unresolved = [b for b in unresolved if b < cutoff]
+        if num_open == 0:
+            self.bound = min([phi_best]+unresolved)
+        self.gap = gap(phi_best,self.bound)
+        if self.gap > mip_gap and unresolved:
+            if self.x is None:
+                self.x = np.zeros(0)
+            raise OptSolverError_Relaxation(self)
+        if self.x is None:
+            self.x = np.zeros(0)
+            raise OptSolverError_Infeasibility(self)
+        self.set_status(self.STATUS_SOLVED)
+        self.set_error_msg('')
+
+class BnBNode(object):
+    """
+    Branch-and-bound node.
+    """
+
+    __slots__ = ['l','u','bound','depth','x','taken']
+
+    def __init__(self,l,u,bound,depth,x):
+        """
+        Branch-and-bound node.
+
+        Parameters
+        ----------
+        l : lower bounds (ndarray)
+        u : upper bounds (ndarray)
+        bound : objective lower bound (float)
+        depth : int
+        x : warm start point (ndarray or None)
+        """
+
+        self.l = l
+        self.u = u
+        self.bound = bound
+        self.depth = depth
+        self.x = x
+        self.taken = False
+
+def gap(phi,bound):
+    """
+    Computes relative gap.
+
+    Parameters
+    ----------
+    phi : objective value of best integer feasible point (float)
+    bound : objective lower bound (float)
+
+    Returns
+    -------
+    gap : float
+    """
+
+    if phi == np.inf:
+        return np.inf
+    return max(phi-bound,0.)/max(1.,abs(phi))
+
+def create_bnb_relaxation(problem,solver_name):
+    """
+    Creates continuous relaxation of mixed-integer problem.
+
+    Parameters
+    ----------
+    problem : :class:`MixIntLinProblem <optalg.opt_solver.problem_mixintlin.MixIntLinProblem>`,
+              :class:`LinProblem <optalg.opt_solver.problem_lin.LinProblem>` or
+              :class:`QuadProblem <optalg.opt_solver.problem_quad.QuadProblem>`
+    solver_name : {``'clp'``, ``'iqp'``}
+
+    Returns
+    -------
+    problem : :class:`LinProblem <optalg.opt_solver.problem_lin.LinProblem>` (``'clp'``) or
+              :class:`QuadProblem <optalg.opt_solver.problem_quad.QuadProblem>` (``'iqp'``)
+    """
+
+    n = problem.get_num_primal_variables()
+    if isinstance(problem,QuadProblem):
+        return QuadProblem(problem.H,problem.g,problem.A,problem.b,problem.l,problem.u)
+    if solver_name == 'iqp':
+        return QuadProblem(coo_matrix((n,n)),problem.c,problem.A,problem.b,problem.l,problem.u)
+    return LinProblem(problem.c,problem.A,problem.b,problem.l,problem.u)
+
+def init_bnb_worker(relaxation,solver_name,parameters):
+    """
+    Creates relaxation solver of the current worker.
+
+    Parameters
+    ----------
+    relaxation : continuous relaxation (see :func:`create_bnb_relaxation`)
+    solver_name : {``'clp'``, ``'iqp'``}
+    parameters : relaxation solver parameters (dict)
+    """
+
+    from .clp import OptSolverClp
+
+    if solver_name == 'clp':
+        solver = OptSolverClp()
+        solver.set_parameters({'persistent': True})
+    else:
+        solver = OptSolverIQP()
+    solver.set_parameters({'quiet': True})
+    if parameters:
+        solver.set_parameters(parameters)
+    worker_data.bnb_relaxation = relaxation
+    worker_data.bnb_solver = solver
+
+def solve_bnb_node(item):
+    """
+    Solves relaxation of branch-and-bound node.
+
+    Parameters
+    ----------
+    item : (lower bounds, upper bounds, warm start point) tuple
+
+    Returns
+    -------
+    status : {``'solved'``, ``'infeasible'``, ``'failed'``}
+    x : solution of relaxation (ndarray or None)
+    phi : objective value of relaxation (float or None)
+    """
+
+    l,u,x = item
+    relaxation = worker_data.bnb_relaxation
+    solver = worker_data.bnb_solver
+
+    if np.any(l > u):
+        return 'infeasible',None,None
+    if isinstance(relaxation,QuadProblem):
+        if x is not None:
+            x = np.clip(x,l,u)
+        problem = QuadProblem(relaxation.H,relaxation.g,relaxation.A,relaxation.b,l,u,x=x)
+        try:
+            problem = presolve_problem(problem) # removes fixed variables
+        except OptProblemError_Infeasible:
+            return 'infeasible',None,None
+        except OptProblemError_Unbounded:
+            return 'failed',None,None
+    else:
+        problem = LinProblem(relaxation.c,relaxation.A,relaxation.b,l,u)
+    try:
+        solver.solve(problem)
+    except OptSolverError_Clp:
+        if solver.clp_context.status() == 1: # primal infeasible
+            return 'infeasible',None,None
+        return 'failed',None,None
+    except OptSolverError: # includes numerical failures of IQP reported as infeasibility
+        if is_bnb_node_infeasible(relaxation,l,u,solver):
+            return 'infeasible',None,None
+        return 'failed',None,None
+    x = solver.get_primal_variables()
+    relaxation.eval(x)
+    return 'solved',x,relaxation.phi
+
+def is_bnb_node_infeasible(relaxation,l,u,solver,inf=1e8):
+    """
+    Checks infeasibility of node relaxation after a failed solve by minimizing
+    the norm of the residual s = Ax-b subject to l <= x <= u.
+
+    Parameters
+    ----------
+    relaxation : :class:`QuadProblem <optalg.opt_solver.problem_quad.QuadProblem>`
+    l : lower bounds (ndarray)
+    u : upper bounds (ndarray)
+    solver : :class:`OptSolverIQP <optalg.opt_solver.iqp.OptSolverIQP>`
+    inf : bound of residual (float)
+
+    Returns
+    -------
+    flag : {``True``, ``False``} (``False`` if infeasibility could not be verified)
+    """
+
+    A = relaxation.A
+    m,n = A.shape
+    if not m:
+        return False
+    H = coo_matrix((np.ones(m),(np.arange(n,n+m),np.arange(n,n+m))),shape=(n+m,n+m))
+    problem = QuadProblem(H,
+                          np.zeros(n+m),
+                          bmat([[A,-eye(m)]]),
+                          relaxation.b,
+                          np.hstack((l,-inf*np.ones(m))),
+                          np.hstack((u,inf*np.ones(m))))
+    try:
+        solver.solve(presolve_problem(problem)) # always feasible
+    except (OptSolverError,OptProblemError_Infeasible,OptProblemError_Unbounded):
+        return False
+    s = solver.get_primal_variables()[n:]
+    return np.max(np.abs(s)) > 100.*solver.parameters['tol']*max(1.,np.max(np.abs(relaxation.b)))
@@ -14,15 +14,31 @@ from .problem_mixintlin import MixIntLinProblem
 
 class OptSolverCbc(OptSolver):
 
-    parameters = {'quiet' : False}
+    parameters = {'quiet' : False,
+                  'persistent' : False, # flag for keeping model between solves
+                  'mip_start' : True,   # flag for starting persistent re-solves from previous solution
+                  'time_limit' : None,  # time limit in seconds
+                  'mip_gap' : None,     # relative gap tolerance
+                  'profile' : False}    # flag for profiling solver phases
 
     def __init__(self):
         """
         Mixed integer linear "branch and cut" sovler from COIN-OR.
+
+        With parameter ``'persistent'``, the Cbc model is kept after each solve.
+        Solving again a problem with the same constraint matrix and integer
+        flags only sends the entries of c, b, l and u that changed to Cbc,
+        and the previous solution is given to Cbc as MIP start.
+
+        Problems are solved with the standard Cbc driver (``Cbc_solve``),
+        which reads the ``'time_limit'`` and ``'mip_gap'`` parameters and
+        supports solving a modified model again. Requires Cbc 2.10 or newer.
         """
         
         OptSolver.__init__(self)
         self.parameters = OptSolverCbc.parameters.copy()
+        self.cbc_context = None
+        self.loaded = None # data loaded in persistent model
         
     def solve(self,problem):
 
@@ -34,22 +50,43 @@ class OptSolverCbc(OptSolver):
 
         # Parameters
         quiet = params['quiet']
+        persistent = params['persistent']
+        mip_start = params['mip_start']
+        time_limit = params['time_limit']
+        mip_gap = params['mip_gap']
 
         # Problem
         if not isinstance(problem,MixIntLinProblem):
             raise OptSolverError_BadProblemType(self)
         self.problem = problem
 
+        # Warm start
+        warm = persistent and self.is_loaded(problem)
+        x_prev = self.x if warm else None
+
         # Cbc context
-        self.cbc_context = CbcContext()
-        self.cbc_context.loadProblem(problem.get_num_primal_variables(),
-                                     problem.A,
-                                     problem.l,
-                                     problem.u,
-                                     problem.c,
-                                     problem.b,
-                                     problem.b)
-        self.cbc_context.copyInIntegerInformation(problem.P)
+        if warm:
+            self.update_context(problem)
+        else:
+            self.cbc_context = CbcContext()
+            self.cbc_context.loadProblem(problem.get_num_primal_variables(),
+                                         problem.A,
+                                         problem.l,
+                                         problem.u,
+                                         problem.c,
+                                         problem.b,
+                                         problem.b)
+            self.cbc_context.copyInIntegerInformation(problem.P)
+            self.loaded = None
+            if persistent:
+                self.loaded = {'row': problem.A.row.copy(),
+                               'col': problem.A.col.copy(),
+                               'data': problem.A.data.copy(),
+                               'P': problem.P.copy(),
+                               'c': problem.c.copy(),
+                               'b': problem.b.copy(),
+                               'l': problem.l.copy(),
+                               'u': problem.u.copy()}
         
         # Reset
         self.reset()
@@ -57,14 +94,78 @@ class OptSolverCbc(OptSolver):
         # Options
         if quiet:
             self.cbc_context.setlogLevel(0)
+            self.cbc_context.setParameter('log',0)
+        if time_limit is not None:
+            self.cbc_context.setParameter('seconds',time_limit)
+        if mip_gap is not None:
+            self.cbc_context.setParameter('ratioGap',mip_gap)
+        if mip_start and x_prev is not None and x_prev.size:
+            self.cbc_context.setMIPStart(x_prev)
 
         # Solve
-        self.cbc_context.branchAndBound()
+        self.cbc_context.solve()
 
         # Save
         self.x = self.cbc_context.getColSolution()
+        if persistent:
+            self.x = self.x.copy() # Cbc reuses its solution array
         if self.cbc_context.status() == 0:
             self.set_status(self.STATUS_SOLVED)
             self.set_error_msg('')
         else:
             raise OptSolverError_Cbc(self)
+
+    def is_loaded(self,problem):
+        """
+        Checks whether the persistent model has the constraint
+        matrix and integer flags of the given problem.
+
+        Parameters
+        ----------
+        problem : :class:`MixIntLinProblem <optalg.opt_solver.problem_mixintlin.MixIntLinProblem>`
+
+        Returns
+        -------
+        flag : {``True``, ``False``}
+        """
+
+        loaded = self.loaded
+        if self.cbc_context is None or loaded is None:
+            return False
+        A = problem.A
+        return (A.shape == (loaded['b'].size,loaded['c'].size) and
+                np.array_equal(problem.P,loaded['P']) and
+                np.array_equal(A.row,loaded['row']) and
+                np.array_equal(A.col,loaded['col']) and
+                np.array_equal(A.data,loaded['data']))
+
+    def update_context(self,problem):
+        """
+        Sends the entries of the vectors of the problem that
+        differ from the ones in the persistent model to Cbc.
+
+        Parameters
+        ----------
+        problem : :class:`MixIntLinProblem <optalg.opt_solver.problem_mixintlin.MixIntLinProblem>`
+
+        Returns
+        -------
+        num : number of changed entries (int)
+        """
+
+        loaded = self.loaded
+        context = self.cbc_context
+        setters = {'c': [context.setObjCoeff],
+                   'b': [context.setRowLower,context.setRowUpper],
+                   'l': [context.setColLower],
+                   'u': [context.setColUpper]}
+        num = 0
+        for name in ['c','b','l','u']:
+            new = getattr(problem,name)
+            old = loaded[name]
+            for i in np.where(new != old)[0]:
+                for setter in setters[name]:
+                    setter(int(i),float(new[i]))
+                old[i] = new[i]
+                num += 1
+        return num
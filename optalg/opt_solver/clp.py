@@ -14,16 +14,29 @@ from .problem_lin import LinProblem
 
 class OptSolverClp(OptSolver):
 
-    parameters = {'quiet' : False}
+    parameters = {'quiet' : False,
+                  'persistent' : False, # flag for keeping model and basis between solves
+                  'profile' : False}    # flag for profiling solver phases
 
     def __init__(self):
         """
         Linear programming solver from COIN-OR.
+
+        With parameter ``'persistent'``, the Clp model is kept after each solve.
+        Solving again a problem with the same constraint matrix only sends
+        the data that changed (c, b, l, u) to Clp and re-solves from the
+        previous basis, with the dual simplex method after changes of b, l or u
+        only, and with the primal simplex method after changes of c only. If c
+        and b, l or u change together, the previous basis can be neither primal
+        nor dual feasible, and the problem is solved with the initial solve of Clp.
         """
         
         OptSolver.__init__(self)
         self.parameters = OptSolverClp.parameters.copy()
-        
+        self.clp_context = None
+        self.loaded = None # data loaded in persistent model
+        self.method = None # Clp method of last solve ('initial', 'primal' or 'dual')
+
     def solve(self,problem):
 
         # Import
@@ -34,21 +47,37 @@ class OptSolverClp(OptSolver):
 
         # Parameters
         quiet = params['quiet']
+        persistent = params['persistent']
 
         # Problem
         if not isinstance(problem,LinProblem):
             raise OptSolverError_BadProblemType(self)
         self.problem = problem
 
+        # Warm start
+        warm = persistent and self.is_loaded(problem)
+
         # Clp context
-        self.clp_context = ClpContext()
-        self.clp_context.loadProblem(problem.get_num_primal_variables(),
-                                     problem.A,
-                                     problem.l,
-                                     problem.u,
-                                     problem.c,
-                                     problem.b,
-                                     problem.b)
+        if warm:
+            changes = self.update_context(problem)
+        else:
+            self.clp_context = ClpContext()
+            self.clp_context.loadProblem(problem.get_num_primal_variables(),
+                                         problem.A,
+                                         problem.l,
+                                         problem.u,
+                                         problem.c,
+                                         problem.b,
+                                         problem.b)
+            self.loaded = None
+            if persistent:
+                self.loaded = {'row': problem.A.row.copy(),
+                               'col': problem.A.col.copy(),
+                               'data': problem.A.data.copy(),
+                               'c': problem.c.copy(),
+                               'b': problem.b.copy(),
+                               'l': problem.l.copy(),
+                               'u': problem.u.copy()}
         
         # Reset
         self.reset()
@@ -58,16 +87,84 @@ class OptSolverClp(OptSolver):
             self.clp_context.setlogLevel(0)
 
         # Solve
-        self.clp_context.initialSolve()
+        if not warm or ('c' in changes and len(changes) > 1):
+            self.method = 'initial'
+            self.clp_context.initialSolve()
+        elif changes == ['c']:
+            self.method = 'primal'
+            self.clp_context.primal()
+        else:
+            self.method = 'dual'
+            self.clp_context.dual()
 
         # Save
+        self.k = self.clp_context.numberIterations()
         self.x = self.clp_context.primalColumnSolution()
         self.lam = self.clp_context.dualRowSolution()
         self.pi = np.maximum(self.clp_context.dualColumnSolution(),0)
         self.mu = -np.minimum(self.clp_context.dualColumnSolution(),0)
+        if persistent:
+            self.x = self.x.copy()     # Clp reuses its solution arrays
+            self.lam = self.lam.copy()
         if self.clp_context.status() == 0:
             self.set_status(self.STATUS_SOLVED)
             self.set_error_msg('')
         else:
             raise OptSolverError_Clp(self)
-            
+
+    def is_loaded(self,problem):
+        """
+        Checks whether the persistent model has the
+        constraint matrix of the given problem.
+
+        Parameters
+        ----------
+        problem : :class:`LinProblem <optalg.opt_solver.problem_lin.LinProblem>`
+
+        Returns
+        -------
+        flag : {``True``, ``False``}
+        """
+
+        loaded = self.loaded
+        if self.clp_context is None or loaded is None:
+            return False
+        A = problem.A
+        return (A.shape == (loaded['b'].size,loaded['c'].size) and
+                np.array_equal(A.row,loaded['row']) and
+                np.array_equal(A.col,loaded['col']) and
+                np.array_equal(A.data,loaded['data']))
+
+    def update_context(self,problem):
+        """
+        Sends the vectors of the problem that differ from
+        the ones in the persistent model to Clp.
+
+        Parameters
+        ----------
+        problem : :class:`LinProblem <optalg.opt_solver.problem_lin.LinProblem>`
+
+        Returns
+        -------
+        changes : list of names of changed vectors
+        """
+
+        loaded = self.loaded
+        context = self.clp_context
+        changes = []
+        if not np.array_equal(problem.c,loaded['c']):
+            context.chgObjCoefficients(problem.c)
+            changes.append('c')
+        if not np.array_equal(problem.b,loaded['b']):
+            context.chgRowLower(problem.b)
+            context.chgRowUpper(problem.b)
+            changes.append('b')
+        if not np.array_equal(problem.l,loaded['l']):
+            context.chgColumnLower(problem.l)
+            changes.append('l')
+        if not np.array_equal(problem.u,loaded['u']):
+            context.chgColumnUpper(problem.u)
+            changes.append('u')
+        for name in changes:
+            loaded[name] = getattr(problem,name).copy()
+        return changes
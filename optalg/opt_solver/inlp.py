@@ -11,6 +11,7 @@ import numpy as np
 from .opt_solver_error import *
 from .opt_solver import OptSolver
 from .problem import cast_problem
+from .scaling import scale_problem
 from optalg.lin_solver import new_linsolver
 from scipy.sparse import bmat, triu, eye, spdiags, coo_matrix
 
@@ -26,6 +27,8 @@ class OptSolverINLP(OptSolver):
                   'eps': 1e-3,            # Boundary proximity factor 
                   'eps_cold': 1e-2,       # Boundary proximity factor (cold start)
                   'linsolver': 'default', # Linear solver
+                  'scaling': None,        # Problem scaling method (None, 'ruiz' or 'geometric')
+                  'profile': False,       # Flag for profiling solver phases
                   'quiet': False}         # Quiet flag
 
     def __init__(self):
@@ -62,6 +65,8 @@ class OptSolverINLP(OptSolver):
 
         # Problem
         problem = cast_problem(problem)
+        if parameters['scaling'] is not None:
+            problem = scale_problem(problem,parameters['scaling'])
         self.problem = problem
         
         # Linsolver
@@ -85,8 +90,8 @@ class OptSolverINLP(OptSolver):
         self.m2 = problem.get_num_nonlinear_equality_constraints()
         self.e = np.ones(self.n)
         self.I = eye(self.n,format='coo')
-        self.Omm1 = coo_matrix((self.m1,self.m1))
-        self.Omm2 = coo_matrix((self.m2,self.m2))
+        self.Imm1 = eye(self.m1,format='coo')
+        self.Imm2 = eye(self.m2,format='coo')
 
         # Initial primal
         if problem.x is None:
@@ -123,7 +128,6 @@ class OptSolverINLP(OptSolver):
         # Objective scaling
         fdata = self.func(self.y)
         self.obj_sca = np.maximum(norminf(problem.gphi)/10.,1.)
-        fdata = self.func(self.y)
 
         # Header
         if not quiet:
@@ -138,9 +142,10 @@ class OptSolverINLP(OptSolver):
             # Average violation of complementarity slackness
             self.eta_mu = np.dot(self.mu,self.u-self.x)/self.x.size
             self.eta_pi = np.dot(self.pi,self.x-self.l)/self.x.size
+            self.fdata.reset()
             
             # Init eval
-            fdata = self.func(self.y)
+            fdata = self.get_fdata(self.y)
             fmax = norminf(fdata.f)     # KKT residual
             pres = norminf(np.hstack((fdata.rp1,fdata.rp2)))
             dres = norminf(np.hstack((fdata.rd,fdata.ru,fdata.rl)))
@@ -172,7 +177,7 @@ class OptSolverINLP(OptSolver):
             while True:
                 
                 # Eval
-                fdata = self.func(self.y)
+                fdata = self.get_fdata(self.y)
                 fmax = norminf(fdata.f)
                 gmax = norminf(fdata.GradF)
                 compu = norminf(self.mu*(self.u-self.x))
@@ -208,26 +213,27 @@ class OptSolverINLP(OptSolver):
                 D1 = spdiags(self.mu/ux,0,self.n,self.n,format='coo')
                 D2 = spdiags(self.pi/xl,0,self.n,self.n,format='coo')
                 fbar = np.hstack((-fdata.rd+fdata.ru/ux-fdata.rl/xl,fdata.rp1,fdata.rp2))
-                Hbar = coo_matrix((np.concatenate((problem.Hphi.data/self.obj_sca,
-                                                   problem.H_combined.data,
-                                                   D1.data,
-                                                   D2.data)),
-                                   (np.concatenate((problem.Hphi.row,
-                                                    problem.H_combined.row,
-                                                    D1.row,
-                                                    D2.row)),
-                                    np.concatenate((problem.Hphi.col,
-                                                    problem.H_combined.col,
-                                                    D1.col,
-                                                    D2.col)))))
-                Jbar = bmat([[Hbar,None,None],
-                             [-self.A,self.Omm1,None],
-                             [-problem.J,None,self.Omm2]],
-                            format='coo')
+                def get_matrix(dw,dc):
+                    Hbar = coo_matrix((np.concatenate((problem.Hphi.data/self.obj_sca,
+                                                       problem.H_combined.data,
+                                                       D1.data+dw,
+                                                       D2.data)),
+                                       (np.concatenate((problem.Hphi.row,
+                                                        problem.H_combined.row,
+                                                        D1.row,
+                                                        D2.row)),
+                                        np.concatenate((problem.Hphi.col,
+                                                        problem.H_combined.col,
+                                                        D1.col,
+                                                        D2.col)))))
+                    return bmat([[Hbar,None,None],
+                                 [-self.A,-dc*self.Imm1,None],
+                                 [-problem.J,None,-dc*self.Imm2]],
+                                format='coo')
                 try:
-                    if not self.linsolver.is_analyzed():
-                        self.linsolver.analyze(Jbar)
-                    pbar = self.linsolver.factorize_and_solve(Jbar,fbar)
+                    self.linsolver = self.factorize_kkt(self.linsolver,get_matrix,self.m1+self.m2)
+                    with self.profiler.phase('solve'):
+                        pbar = self.linsolver.solve(fbar)
                 except RuntimeError:
                     raise OptSolverError_BadLinSystem(self)
                 px = pbar[:self.n]
@@ -287,11 +293,14 @@ class OptSolverINLP(OptSolver):
         prob = self.problem
         obj_sca = self.obj_sca
 
-        x,lam,nu,mu,pi = self.extract_components(y)
+        fdata.reset(y)
+        x,lam,nu,mu,pi = self.extract_components(fdata.x)
 
         # Eval
-        prob.eval(x)
-        prob.combine_H(-nu)
+        with self.profiler.phase('eval'):
+            prob.eval(x)
+        with self.profiler.phase('combine_H'):
+            prob.combine_H(-nu)
         
         ux = self.u-x
         xl = x-self.l
@@ -304,20 +313,7 @@ class OptSolverINLP(OptSolver):
         ru = mu*ux-sigma*self.eta_mu*self.e            # residual of perturbed complementarity
         rl = pi*xl-sigma*self.eta_pi*self.e            # residual of perturbed complementarity
         
-        Dmu = spdiags(self.mu,0,self.n,self.n)
-        Dux = spdiags(ux,0,self.n,self.n)
-        Dpi = spdiags(self.pi,0,self.n,self.n)
-        Dxl = spdiags(xl,0,self.n,self.n)
-
         f = np.hstack((rd,rp1,rp2,ru,rl))          # residuals
-        H = prob.Hphi/obj_sca + prob.H_combined    # second derivatives
-        H = H + H.T - triu(H)
-        J = bmat([[H,-self.AT,-JT,self.I,-self.I], # Jacobian or residuals
-                  [self.A,None,None,None,None],
-                  [prob.J,None,None,None,None],
-                  [-Dmu,None,None,Dux,None],
-                  [Dpi,None,None,None,Dxl]],
-                 format='coo')
 
         # Save
         fdata.rd = rd
@@ -326,11 +322,58 @@ class OptSolverINLP(OptSolver):
         fdata.ru = ru
         fdata.rl = rl
         fdata.f = f
-        fdata.J = J
+        fdata.set_lazy('J',lambda: self.jacobian(fdata.x))
+
+        # Second derivatives times dual residual
+        Hrd = sym_dot(prob.Hphi,rd)/obj_sca + sym_dot(prob.H_combined,rd)
 
         # Merid function
         fdata.F = 0.5*np.dot(f,f) # merit function
-        fdata.GradF = J.T*f       # gradient of merit function
+        fdata.GradF = np.hstack((Hrd+self.AT*rp1+JT*rp2-mu*ru+pi*rl, # gradient of merit function (J^Tf)
+                                 -(self.A*rd),
+                                 -(prob.J*rd),
+                                 rd+ux*ru,
+                                 xl*rl-rd))
 
         # Return data
         return fdata
+
+    def jacobian(self,y):
+
+        prob = self.problem
+        obj_sca = self.obj_sca
+
+        x,lam,nu,mu,pi = self.extract_components(y)
+        ux = self.u-x
+        xl = x-self.l
+
+        Dmu = spdiags(mu,0,self.n,self.n)
+        Dux = spdiags(ux,0,self.n,self.n)
+        Dpi = spdiags(pi,0,self.n,self.n)
+        Dxl = spdiags(xl,0,self.n,self.n)
+
+        H = prob.Hphi/obj_sca + prob.H_combined    # second derivatives
+        H = H + H.T - triu(H)
+        return bmat([[H,-self.AT,-prob.J.T,self.I,-self.I], # Jacobian or residuals
+                     [self.A,None,None,None,None],
+                     [prob.J,None,None,None,None],
+                     [-Dmu,None,None,Dux,None],
+                     [Dpi,None,None,None,Dxl]],
+                    format='coo')
+
+def sym_dot(L,v):
+    """
+    Computes product of symmetric matrix with vector
+    given only its lower triangular part.
+
+    Parameters
+    ----------
+    L : lower triangular matrix
+    v : vector
+    
+    Returns
+    -------
+    Mv : vector
+    """
+
+    return L*v + L.T*v - L.diagonal()*v
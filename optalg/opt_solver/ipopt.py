@@ -11,7 +11,7 @@ import numpy as np
 from .opt_solver_error import *
 from .problem import cast_problem
 from .opt_solver import OptSolver
-from scipy.sparse import bmat
+from scipy.sparse import coo_matrix
 
 class OptSolverIpopt(OptSolver):
     
@@ -24,6 +24,7 @@ class OptSolverIpopt(OptSolver):
                   'max_iter': 1000,
                   'mu_init': 1e-1,
                   'sb' : 'yes',
+                  'profile':False,
                   'quiet':False}
     
     def __init__(self):
@@ -33,6 +34,8 @@ class OptSolverIpopt(OptSolver):
         
         OptSolver.__init__(self)
         self.parameters = OptSolverIpopt.parameters.copy()
+        self.x_eval = None  # point of last problem evaluation
+        self.num_evals = 0  # number of problem evaluations
 
     def create_ipopt_context(self):
         
@@ -45,37 +48,76 @@ class OptSolverIpopt(OptSolver):
         # Parameters
         inf = self.parameters['inf']
 
-        def eval_f(x):
-            problem.eval(x)
+        # Profiler
+        phase = self.profiler.phase
+
+        # Evaluation cache
+        self.x_eval = None
+        self.num_evals = 0
+
+        def eval(x,new_x):
+            if not new_x and self.x_eval is not None:
+                return
+            if self.x_eval is not None and np.array_equal(x,self.x_eval):
+                return
+            with phase('eval'):
+                problem.eval(x)
+            self.x_eval = x.copy() # x is owned by Ipopt
+            self.num_evals += 1
+
+        def eval_f(x,new_x):
+            eval(x,new_x)
             return problem.phi
             
-        def eval_grad_f(x):
-            problem.eval(x)
+        def eval_grad_f(x,new_x):
+            eval(x,new_x)
             return problem.gphi
 
-        def eval_g(x):
-            problem.eval(x)
+        def eval_g(x,new_x):
+            eval(x,new_x)
             return np.hstack((problem.A*x-problem.b,problem.f))
 
-        def eval_jac_g(x,flag):
+        # Jacobian structure ([A;J], fixed)
+        A = coo_matrix(problem.A)
+        J = coo_matrix(problem.J)
+        nnzA = A.nnz
+        nnzJ = J.nnz
+        Adata = A.data.copy()
+        Jrow = np.concatenate((A.row,J.row+A.shape[0])).astype(np.int32)
+        Jcol = np.concatenate((A.col,J.col)).astype(np.int32)
+
+        # Hessian structure ([Hphi,H_combined], fixed)
+        problem.combine_H(np.zeros(problem.get_num_nonlinear_equality_constraints()))
+        nnzHphi = problem.Hphi.nnz
+        nnzHcomb = problem.H_combined.nnz
+        Hrow = np.concatenate((problem.Hphi.row,problem.H_combined.row)).astype(np.int32)
+        Hcol = np.concatenate((problem.Hphi.col,problem.H_combined.col)).astype(np.int32)
+        
+        def eval_jac_g(x,new_x,flag,values=None):
             if flag:
-                J = bmat([[problem.A],[problem.J]],format='coo')
-                return J.row,J.col
+                return Jrow,Jcol
             else:
-                problem.eval(x)
-                J = bmat([[problem.A],[problem.J]],format='coo')
-                return J.data
-
-        def eval_h(x,lam,obj_factor,flag):
+                eval(x,new_x)
+                if problem.J.data.size != nnzJ:
+                    raise ValueError('Jacobian sparsity pattern changed')
+                with phase('assembly'):
+                    values[:nnzA] = Adata
+                    values[nnzA:] = problem.J.data
+
+        def eval_h(x,new_x,lam,obj_factor,flag,values=None):
             if flag:
-                problem.combine_H(np.zeros(problem.get_num_nonlinear_equality_constraints()))
-                return (np.concatenate((problem.Hphi.row,problem.H_combined.row)),
-                        np.concatenate((problem.Hphi.col,problem.H_combined.col)))
+                return Hrow,Hcol
             else:
-                problem.eval(x)
+                eval(x,new_x)
                 lamf = lam[problem.get_num_linear_equality_constraints():]
-                problem.combine_H(lamf)
-                return np.concatenate((obj_factor*(problem.Hphi.data),problem.H_combined.data))
+                with phase('combine_H'):
+                    problem.combine_H(lamf)
+                if (problem.Hphi.data.size != nnzHphi or 
+                    problem.H_combined.data.size != nnzHcomb):
+                    raise ValueError('Hessian sparsity pattern changed')
+                with phase('assembly'):
+                    np.multiply(problem.Hphi.data,obj_factor,out=values[:nnzHphi])
+                    values[nnzHphi:] = problem.H_combined.data
 
         n = problem.get_num_primal_variables()
         m = problem.get_num_linear_equality_constraints()+problem.get_num_nonlinear_equality_constraints()
@@ -138,7 +180,8 @@ class OptSolverIpopt(OptSolver):
             x0 = (problem.u+problem.l)/2
                             
         # Solve
-        results = self.ipopt_context.solve(x0)
+        with self.profiler.phase('ipopt'):
+            results = self.ipopt_context.solve(x0)
 
         # Save
         self.k = results['k']
@@ -10,8 +10,7 @@ from __future__ import print_function
 import numpy as np
 from .opt_solver_error import *
 from .opt_solver import OptSolver
-from .problem import cast_problem
-from .problem_quad import QuadProblem
+from .kkt import KKTAssembler
 from optalg.lin_solver import new_linsolver
 from scipy.sparse import bmat,triu,eye,spdiags,coo_matrix,tril
 
@@ -27,6 +26,11 @@ class OptSolverIQP(OptSolver):
                   'eps': 1e-3,            # boundary proximity factor 
                   'eps_cold': 1e-2,       # boundary proximity factor (cold start)
                   'linsolver': 'default', # linear solver
+                  'scaling': None,        # problem scaling method (None, 'ruiz' or 'geometric')
+                  'presolve': False,      # flag for presolving problem
+                  'line_search': 'bisection', # line search method ('bisection' or 'cubic')
+                  'predictor_corrector': False, # flag for using Mehrotra's predictor-corrector method
+                  'profile': False,       # flag for profiling solver phases
                   'quiet': False}         # quiet flag
 
     def __init__(self):
@@ -38,6 +42,7 @@ class OptSolverIQP(OptSolver):
         OptSolver.__init__(self)
         self.parameters = OptSolverIQP.parameters.copy()
         self.linsolver = None
+        self.kkt = None
         
     def solve(self,problem):
         """
@@ -62,19 +67,19 @@ class OptSolverIQP(OptSolver):
         eps_cold = parameters['eps_cold']
 
         # Problem
-        if not isinstance(problem,QuadProblem):
-            problem = cast_problem(problem)
-            quad_problem = QuadProblem(None,None,None,None,None,None,problem=problem)
-        else:
-            quad_problem = problem
-        self.problem = problem
-        self.quad_problem = quad_problem
+        quad_problem = self.prepare_quad_problem(problem)
+        problem = self.problem
 
         # Linsolver
         self.linsolver = new_linsolver(parameters['linsolver'],'symmetric')
 
         # Reset
         self.reset()
+
+        # Solved by presolve
+        if quad_problem.H.shape[0] == 0:
+            self.set_status(self.STATUS_SOLVED)
+            return
     
         # Checks
         if not np.all(problem.l < problem.u):
@@ -93,7 +98,6 @@ class OptSolverIQP(OptSolver):
         self.e = np.ones(self.n)
         self.I = eye(self.n,format='coo')
         self.Onm = coo_matrix((self.n,self.m))
-        self.Omm = coo_matrix((self.m,self.m))
 
         # Initial primal
         if quad_problem.x is None:
@@ -133,16 +137,26 @@ class OptSolverIQP(OptSolver):
         self.eta_pi = np.dot(self.pi,self.x-self.l)/self.x.size
 
         # Objective scaling
-        fdata = self.func(self.y)
         self.obj_sca = np.maximum(norminf(self.g+self.H*self.x)/10.,1.)
         self.H = self.H/self.obj_sca
         self.g = self.g/self.obj_sca
-        fdata = self.func(self.y)
+
+        # KKT matrix (fixed pattern)
+        self.kkt = KKTAssembler((self.n+self.m,self.n+self.m),
+                                [('H',tril(self.H),0,0),
+                                 ('D',eye(self.n),0,0),
+                                 ('A',-self.A,self.n,0),
+                                 ('C',eye(self.m),self.n,self.n)])
+        self.kkt.set_values('C',0.)
 
         # Header
         if not quiet:
             print('\nSolver: IQP')
             print('-----------')
+
+        # Predictor-corrector
+        if parameters['predictor_corrector']:
+            return self.solve_predictor_corrector()
                                    
         # Outer
         s = 0.
@@ -152,9 +166,10 @@ class OptSolverIQP(OptSolver):
             # Complementarity measures
             self.eta_mu = np.dot(self.mu,self.u-self.x)/self.x.size
             self.eta_pi = np.dot(self.pi,self.x-self.l)/self.x.size
+            self.fdata.reset()
             
             # Init eval
-            fdata = self.func(self.y)
+            fdata = self.get_fdata(self.y)
             fmax = norminf(fdata.f)
             gmax = norminf(fdata.GradF)
             
@@ -183,7 +198,7 @@ class OptSolverIQP(OptSolver):
             while True:
                 
                 # Eval
-                fdata = self.func(self.y)
+                fdata = self.get_fdata(self.y)
                 fmax = norminf(fdata.f)
                 gmax = norminf(fdata.GradF)
                 compu = norminf(self.mu*(self.u-self.x))
@@ -215,19 +230,16 @@ class OptSolverIQP(OptSolver):
                 # Search direction
                 ux = self.u-self.x
                 xl = self.x-self.l
-                D1 = spdiags(self.mu/ux,0,self.n,self.n,format='coo')
-                D2 = spdiags(self.pi/xl,0,self.n,self.n,format='coo')
                 fbar = np.hstack((-fdata.rd+fdata.ru/ux-fdata.rl/xl,fdata.rp))
-                if self.A.shape[0] > 0:
-                    Jbar = bmat([[tril(self.H)+D1+D2,None],
-                                 [-self.A,self.Omm]],format='coo')
-                else:
-                    Jbar = bmat([[tril(self.H)+D1+D2]],
-                                format='coo')
+                D = self.mu/ux+self.pi/xl
+                def get_matrix(dw,dc):
+                    self.kkt.set_values('D',D+dw)
+                    self.kkt.set_values('C',-dc)
+                    return self.kkt.get_matrix()
                 try:
-                    if not self.linsolver.is_analyzed():
-                        self.linsolver.analyze(Jbar)
-                    pbar = self.linsolver.factorize_and_solve(Jbar,fbar)
+                    self.linsolver = self.factorize_kkt(self.linsolver,get_matrix,self.m)
+                    with self.profiler.phase('solve'):
+                        pbar = self.linsolver.solve(fbar)
                 except RuntimeError:
                     raise OptSolverError_BadLinSystem(self)
                 px = pbar[:self.n]
@@ -264,6 +276,151 @@ class OptSolverIQP(OptSolver):
                     raise OptSolverError_Infeasibility(self)
 
 
+    def solve_predictor_corrector(self):
+        """
+        Solves scaled problem using Mehrotra's predictor-corrector
+        method. The affine-scaling and corrector directions are computed
+        with the same factorization, the centering parameter is chosen
+        adaptively, and steplengths are determined by the fraction-to-boundary rule.
+        """
+
+        # Local vars
+        norminf = self.norminf
+        parameters = self.parameters
+        
+        # Parameters
+        tol = parameters['tol']
+        maxiter = parameters['maxiter']
+        quiet = parameters['quiet']
+        tau = 1.-parameters['eps'] # fraction to boundary
+
+        # Header
+        if not quiet:
+            print('{0:^3s}'.format('iter'), end=' ')
+            print('{0:^9s}'.format('phi'), end=' ')
+            print('{0:^9s}'.format('fmax'), end=' ')
+            print('{0:^8s}'.format('cu'), end=' ')
+            print('{0:^8s}'.format('cl'), end=' ')
+            print('{0:^8s}'.format('sigma'), end=' ')
+            print('{0:^8s}'.format('s'))
+
+        s = 0.
+        sigma = 0.
+        self.k = 0
+        while True:
+
+            x,lam,mu,pi = self.x,self.lam,self.mu,self.pi
+            ux = self.u-x
+            xl = x-self.l
+            
+            # Residuals
+            rd = self.H*x+self.g-self.AT*lam+mu-pi
+            rp = self.A*x-self.b
+            cu = mu*ux
+            cl = pi*xl
+            fmax = np.maximum(norminf(rd),norminf(rp))
+            compu = norminf(cu)
+            compl = norminf(cl)
+            gap = (np.sum(cu)+np.sum(cl))/(2.*self.n)
+            phi = (0.5*np.dot(x,self.H*x)+np.dot(self.g,x))*self.obj_sca
+
+            # Show progress
+            if not quiet:
+                print('{0:^3d}'.format(self.k), end=' ')
+                print('{0:^9.2e}'.format(phi), end=' ')
+                print('{0:^9.2e}'.format(fmax), end=' ')
+                print('{0:^8.1e}'.format(compu), end=' ')
+                print('{0:^8.1e}'.format(compl), end=' ')
+                print('{0:^8.1e}'.format(sigma), end=' ')
+                print('{0:^8.1e}'.format(s))
+
+            # Done
+            if fmax < tol and np.maximum(compu,compl) < tol:
+                self.set_status(self.STATUS_SOLVED)
+                self.set_error_msg('')
+                return
+
+            # Maxiters
+            if self.k >= maxiter:
+                raise OptSolverError_MaxIters(self)
+
+            # Factorize
+            D = mu/ux+pi/xl
+            def get_matrix(dw,dc):
+                self.kkt.set_values('D',D+dw)
+                self.kkt.set_values('C',-dc)
+                return self.kkt.get_matrix()
+            try:
+                self.linsolver = self.factorize_kkt(self.linsolver,get_matrix,self.m)
+            except RuntimeError:
+                raise OptSolverError_BadLinSystem(self)
+
+            def direction(ru,rl):
+                fbar = np.hstack((-rd+ru/ux-rl/xl,rp))
+                try:
+                    with self.profiler.phase('solve'):
+                        pbar = self.linsolver.solve(fbar)
+                except RuntimeError:
+                    raise OptSolverError_BadLinSystem(self)
+                px = pbar[:self.n]
+                plam = pbar[self.n:]
+                pmu = (-ru+mu*px)/ux
+                ppi = (-rl-pi*px)/xl
+                return px,plam,pmu,ppi
+
+            # Predictor (affine scaling)
+            px,plam,pmu,ppi = direction(cu,cl)
+            s = self.max_steplength(px,pmu,ppi)
+            gap_aff = (np.dot(mu+s*pmu,ux-s*px)+np.dot(pi+s*ppi,xl+s*px))/(2.*self.n)
+            sigma = np.minimum((gap_aff/gap)**3.,1.)
+
+            # Corrector
+            px,plam,pmu,ppi = direction(cu-sigma*gap-pmu*px,cl-sigma*gap+ppi*px)
+            s = np.minimum(tau*self.max_steplength(px,pmu,ppi),1.)
+
+            # Update
+            self.x = x+s*px
+            self.lam = lam+s*plam
+            self.mu = mu+s*pmu
+            self.pi = pi+s*ppi
+            self.y = np.hstack((self.x,self.lam,self.mu,self.pi))
+            self.k += 1
+
+            # Check
+            try:
+                assert(np.all(self.x < self.u))
+                assert(np.all(self.x > self.l))
+                assert(np.all(self.mu > 0))
+                assert(np.all(self.pi > 0))
+            except AssertionError:
+                raise OptSolverError_Infeasibility(self)
+
+    def max_steplength(self,px,pmu,ppi):
+        """
+        Computes largest steplength that keeps
+        primal and dual variables within bounds.
+
+        Parameters
+        ----------
+        px : ndarray
+        pmu : ndarray
+        ppi : ndarray
+
+        Returns
+        -------
+        s : float
+        """
+
+        indices = px > 0
+        s1 = np.min(np.hstack(((self.u-self.x)[indices]/px[indices],np.inf)))
+        indices = px < 0
+        s2 = np.min(np.hstack(((self.l-self.x)[indices]/px[indices],np.inf)))
+        indices = pmu < 0
+        s3 = np.min(np.hstack((-self.mu[indices]/pmu[indices],np.inf)))
+        indices = ppi < 0
+        s4 = np.min(np.hstack((-self.pi[indices]/ppi[indices],np.inf)))
+        return np.min([s1,s2,s3,s4,1.])
+
     def extract_components(self,y):
 
         n = self.n
@@ -281,7 +438,8 @@ class OptSolverIQP(OptSolver):
         fdata = self.fdata
         sigma = self.parameters['sigma']
 
-        x,lam,mu,pi = self.extract_components(y)
+        fdata.reset(y)
+        x,lam,mu,pi = self.extract_components(fdata.x)
         ux = self.u-x
         xl = x-self.l
         
@@ -290,26 +448,35 @@ class OptSolverIQP(OptSolver):
         ru = mu*ux-sigma*self.eta_mu*self.e  # residual of perturbed complementarity
         rl = pi*xl-sigma*self.eta_pi*self.e  # residual of perturbed complementarity
         
-        Dmu = spdiags(self.mu,0,self.n,self.n) 
-        Dux = spdiags(ux,0,self.n,self.n)
-        Dpi = spdiags(self.pi,0,self.n,self.n)
-        Dxl = spdiags(xl,0,self.n,self.n)
-
         f = np.hstack((rd,rp,ru,rl))
-        
-        J = bmat([[self.H,-self.AT,self.I,-self.I],
-                  [self.A,None,None,None],
-                  [-Dmu,None,Dux,None],
-                  [Dpi,self.Onm,None,Dxl]])
 
         fdata.rd = rd
         fdata.rp = rp
         fdata.ru = ru
         fdata.rl = rl
         fdata.f = f
-        fdata.J = J
+        fdata.set_lazy('J',lambda: self.jacobian(fdata.x))
         
         fdata.F = 0.5*np.dot(f,f) # merit function
-        fdata.GradF = J.T*f       # gradient of merit function
+        fdata.GradF = np.hstack((self.H*rd+self.AT*rp-mu*ru+pi*rl, # gradient of merit function (J^Tf)
+                                 -(self.A*rd),
+                                 rd+ux*ru,
+                                 xl*rl-rd))
 
         return fdata
+
+    def jacobian(self,y):
+
+        x,lam,mu,pi = self.extract_components(y)
+        ux = self.u-x
+        xl = x-self.l
+
+        Dmu = spdiags(mu,0,self.n,self.n) 
+        Dux = spdiags(ux,0,self.n,self.n)
+        Dpi = spdiags(pi,0,self.n,self.n)
+        Dxl = spdiags(xl,0,self.n,self.n)
+
+        return bmat([[self.H,-self.AT,self.I,-self.I],
+                     [self.A,None,None,None],
+                     [-Dmu,None,Dux,None],
+                     [Dpi,self.Onm,None,Dxl]])
@@ -0,0 +1,87 @@
+#****************************************************#
+# This file is part of OPTALG.                       #
+#                                                    #
+# Copyright (c) 2015-2017, Tomas Tinoco De Rubira.   #
+#                                                    #
+# OPTALG is released under the BSD 2-clause license. #
+#****************************************************#
+
+import numpy as np
+from scipy.sparse import coo_matrix
+
+class KKTAssembler:
+    """
+    Class for assembling sparse matrices with fixed sparsity pattern.
+
+    The pattern and the location of each block inside the
+    value array are computed once. After that, only the values
+    of the blocks that change need to be rewritten.
+    """
+
+    def __init__(self,shape,blocks):
+        """
+        Constructor.
+
+        Parameters
+        ----------
+        shape : tuple
+        blocks : list of (name, matrix, row offset, column offset) tuples
+        """
+
+        rows = []
+        cols = []
+        data = []
+        self.slices = {}
+        k = 0
+        for name,M,i,j in blocks:
+            M = coo_matrix(M)
+            rows.append(M.row+i)
+            cols.append(M.col+j)
+            data.append(M.data)
+            self.slices[name] = slice(k,k+M.nnz)
+            k += M.nnz
+
+        row = np.concatenate(rows).astype(np.int32) if rows else np.zeros(0,dtype=np.int32)
+        col = np.concatenate(cols).astype(np.int32) if cols else np.zeros(0,dtype=np.int32)
+        val = np.concatenate(data).astype(np.float64) if data else np.zeros(0)
+
+        #: Assembled matrix (coo_matrix). Its row, col and data arrays never change identity.
+        self.K = coo_matrix((val,(row,col)),shape=shape)
+
+    def get_matrix(self):
+        """
+        Gets assembled matrix.
+
+        Returns
+        -------
+        K : coo_matrix
+        """
+
+        return self.K
+
+    def get_values(self,name):
+        """
+        Gets view of the values of a block.
+
+        Parameters
+        ----------
+        name : string
+
+        Returns
+        -------
+        values : ndarray
+        """
+
+        return self.K.data[self.slices[name]]
+
+    def set_values(self,name,values):
+        """
+        Sets values of a block in place.
+
+        Parameters
+        ----------
+        name : string
+        values : ndarray or float
+        """
+
+        self.K.data[self.slices[name]] = values
@@ -12,18 +12,42 @@ from .opt_solver_error import *
 from .problem import cast_problem
 from .opt_solver import OptSolver
 from scipy.sparse import bmat
-from optalg.lin_solver import new_linsolver
+from scipy.sparse.linalg import LinearOperator
+from optalg.lin_solver import new_linsolver, LinSolverGMRES
 
 class OptSolverNR(OptSolver):
     
     parameters = {'feastol':1e-4,
                   'maxiter':100,
                   'linsolver':'superlu',
+                  'line_search':'bisection',
+                  'eta_max':0.9,                 # max forcing term (gmres)
+                  'eta_gamma':0.9,               # forcing term factor (gmres)
+                  'eta_alpha':2.,                # forcing term exponent (gmres)
+                  'preconditioner':'ilu',        # preconditioner ('ilu', 'block_jacobi' or None) (gmres)
+                  'preconditioner_reuse':5,      # max iterations with same preconditioner (gmres)
+                  'gmres_restart':30,            # iterations between restarts (gmres)
+                  'jacobian_update':'newton',    # Jacobian update ('newton', 'chord' or 'broyden')
+                  'jacobian_ratio':0.5,          # max residual reduction ratio for keeping factorization
+                  'jacobian_reuse_max':20,       # max iterations with same factorization
+                  'profile':False,               # flag for profiling solver phases
                   'quiet':False}
 
     def __init__(self):
         """
         Newton-Raphson algorithm.
+
+        With linear solver ``'gmres'``, Newton steps are computed inexactly
+        by restarted GMRES with the Eisenstat-Walker forcing terms (choice 2),
+        using the Jacobians only for products. The preconditioner is computed
+        from the Jacobian and reused for several iterations, and it is
+        recomputed when GMRES does not reach the forcing tolerance.
+
+        With Jacobian update ``'chord'`` or ``'broyden'`` (direct linear solvers),
+        the factorization of the Jacobian is kept while the norm of the residual
+        decreases at least by the factor ``'jacobian_ratio'`` per iteration.
+        With ``'broyden'``, the kept factorization is corrected with Broyden rank-one
+        updates, which are applied through the Sherman-Morrison-Woodbury formula.
         """
         
         # Init
@@ -31,13 +55,33 @@ class OptSolverNR(OptSolver):
         self.parameters = OptSolverNR.parameters.copy()     
         self.linsolver = None
         self.problem = None
+        self.num_factorizations = 0
+        self.num_linear_iterations = 0
+        self.M = None       # factorized matrix
+        self.broyden = None # Broyden updates (U,V,Z) with Z = inv(M)U
+
+    def get_results(self):
+        """
+        Gets results.
+
+        Returns
+        -------
+        results : dictionary
+        """
+
+        results = OptSolver.get_results(self)
+        results['num_factorizations'] = self.num_factorizations
+        results['num_linear_iterations'] = self.num_linear_iterations
+        return results
         
     def func(self,x):
 
         fdata = self.fdata
         p = self.problem
 
-        p.eval(x)
+        fdata.reset(x)
+        with self.profiler.phase('eval'):
+            p.eval(x)
         
         J = p.J
         f = p.f
@@ -67,9 +111,20 @@ class OptSolverNR(OptSolver):
         feastol = params['feastol']
         maxiter = params['maxiter']
         quiet = params['quiet']
+        update = params['jacobian_update']
+        if update not in ['newton','chord','broyden']:
+            raise ValueError('invalid jacobian update')
 
         # Linear solver
-        self.linsolver = new_linsolver(params['linsolver'],'unsymmetric')
+        krylov = params['linsolver'] == 'gmres'
+        if krylov and update != 'newton':
+            raise ValueError('jacobian update requires direct linear solver')
+        if krylov:
+            self.linsolver = LinSolverGMRES('unsymmetric',
+                                            preconditioner=params['preconditioner'],
+                                            restart=params['gmres_restart'])
+        else:
+            self.linsolver = new_linsolver(params['linsolver'],'unsymmetric')
 
         # Problem
         problem = cast_problem(problem)
@@ -77,6 +132,8 @@ class OptSolverNR(OptSolver):
 
         # Reset
         self.reset()
+        self.num_factorizations = 0
+        self.num_linear_iterations = 0
                 
         # Init point
         if problem.x is not None:
@@ -89,7 +146,8 @@ class OptSolverNR(OptSolver):
         
         # Analyze phase
         try: 
-            self.linsolver.analyze(bmat([[problem.J],[problem.A]]))
+            with self.profiler.phase('analyze'):
+                self.linsolver.analyze(bmat([[problem.J],[problem.A]]))
         except Exception:
             raise OptSolverError_BadLinSystem(self)
             
@@ -110,13 +168,19 @@ class OptSolverNR(OptSolver):
         # Main loop
         s = 0.         
         pmax = 0.      
+        eta = None
+        Fnorm_prev = None
+        refresh = True
+        age = 0
         self.k = 0
         while True:
             
             # Callbacks
             for c in self.callbacks:
                 c(self)
-            fdata = self.func(self.x)
+            if self.callbacks:
+                self.fdata.reset() # callbacks may modify the problem
+            fdata = self.get_fdata(self.x)
                         
             # Compute info quantities
             fmax = np.maximum(norminf(fdata.f),norminf(fdata.r))
@@ -150,15 +214,152 @@ class OptSolverNR(OptSolver):
             
             # Search direction
             try:
-                p = self.linsolver.factorize_and_solve(bmat([[problem.J],[problem.A]]),
-                                                       np.hstack([-fdata.f,-fdata.r]))
+                if krylov:
+                    Fnorm = norm2(np.hstack([fdata.f,fdata.r]))
+                    eta = self.forcing_term(Fnorm,Fnorm_prev,eta)
+                    Fnorm_prev = Fnorm
+                    self.linsolver.tol = eta
+                    if refresh or age >= params['preconditioner_reuse']:
+                        with self.profiler.phase('assembly'):
+                            M = bmat([[problem.J],[problem.A]])
+                        with self.profiler.phase('factorize'):
+                            self.linsolver.factorize(M)
+                        self.num_factorizations += 1
+                        age = 0
+                    else:
+                        self.linsolver.set_operator(self.jacobian_operator())
+                    with self.profiler.phase('solve'):
+                        p = self.linsolver.solve(np.hstack([-fdata.f,-fdata.r]))
+                    self.num_linear_iterations += self.linsolver.num_iterations
+                    refresh = not self.linsolver.converged
+                    age += 1
+                else:
+                    F = np.hstack([fdata.f,fdata.r])
+                    fresh = update == 'newton' or refresh or age >= params['jacobian_reuse_max']
+                    if fresh:
+                        with self.profiler.phase('assembly'):
+                            self.M = bmat([[problem.J],[problem.A]])
+                        with self.profiler.phase('factorize'):
+                            self.linsolver.factorize(self.M)
+                        self.num_factorizations += 1
+                        self.broyden = ([],[],[])
+                        age = 0
+                    with self.profiler.phase('solve'):
+                        p = self.solve_jacobian(-F)
+                    age += 1
             except Exception:
                 raise OptSolverError_BadLinSystem(self)
             pmax = norminf(p)
 
             # Line search
-            s,fdata = self.line_search(self.x,p,fdata.F,fdata.GradF,self.func)
+            try:
+                s,fdata = self.line_search(self.x,p,fdata.F,fdata.GradF,self.func)
+            except OptSolverError_LineSearch:
+                if krylov or fresh:
+                    raise
+                refresh = True # retry with new Jacobian
+                s = 0.
+                self.k += 1
+                continue
 
             # Update x
             self.x += s*p
             self.k += 1
+
+            # Jacobian reuse
+            if not krylov and update != 'newton':
+                Fnew = np.hstack([fdata.f,fdata.r])
+                refresh = norm2(Fnew) > params['jacobian_ratio']*norm2(F)
+                if update == 'broyden' and not refresh:
+                    with self.profiler.phase('solve'):
+                        self.update_broyden(s*p,Fnew-F)
+
+    def solve_jacobian(self,b):
+        """
+        Solves system with factorized Jacobian and its Broyden updates.
+
+        Parameters
+        ----------
+        b : ndarray
+
+        Returns
+        -------
+        x : ndarray
+        """
+
+        w = self.linsolver.solve(b)
+        U,V,Z = self.broyden
+        if not U:
+            return w
+        V = np.array(V).T
+        Z = np.array(Z).T
+        t = np.linalg.solve(np.eye(Z.shape[1])+np.dot(V.T,Z),np.dot(V.T,w))
+        return w-np.dot(Z,t)
+
+    def update_broyden(self,s,y):
+        """
+        Adds Broyden rank-one update B+(y-Bs)s^T/(s^Ts)
+        to the Jacobian approximation B.
+
+        Parameters
+        ----------
+        s : step (ndarray)
+        y : residual difference (ndarray)
+        """
+
+        sTs = np.dot(s,s)
+        if sTs == 0.:
+            return
+        U,V,Z = self.broyden
+        Bs = self.M*s
+        for u,v in zip(U,V):
+            Bs += u*np.dot(v,s)
+        u = (y-Bs)/sTs
+        U.append(u)
+        V.append(s.copy())
+        Z.append(self.linsolver.solve(u))
+
+    def jacobian_operator(self):
+        """
+        Gets operator that computes products with the
+        Jacobian of the current equations.
+
+        Returns
+        -------
+        operator : LinearOperator
+        """
+
+        J = self.problem.J
+        A = self.problem.A
+        return LinearOperator((J.shape[0]+A.shape[0],J.shape[1]),
+                              matvec=lambda v: np.hstack((J*v,A*v)))
+
+    def forcing_term(self,Fnorm,Fnorm_prev,eta_prev):
+        """
+        Computes forcing term of inexact Newton step
+        (Eisenstat and Walker, 1996, choice 2).
+
+        Parameters
+        ----------
+        Fnorm : norm of current residual (float)
+        Fnorm_prev : norm of previous residual (float or None)
+        eta_prev : previous forcing term (float or None)
+
+        Returns
+        -------
+        eta : float
+        """
+
+        params = self.parameters
+        eta_max = params['eta_max']
+        gamma = params['eta_gamma']
+        alpha = params['eta_alpha']
+
+        if Fnorm_prev is None or eta_prev is None:
+            return min(eta_max,0.5)
+        eta = gamma*(Fnorm/Fnorm_prev)**alpha
+        eta_safe = gamma*eta_prev**alpha
+        if eta_safe > 0.1:
+            eta = max(eta,eta_safe)
+        eta = min(eta,eta_max)
+        return min(max(eta,0.5*params['feastol']/max(Fnorm,1e-300)),eta_max)
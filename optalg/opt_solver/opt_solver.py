@@ -7,7 +7,13 @@
 #****************************************************#
 
 import numpy as np
+from timeit import default_timer
 from .opt_solver_error import *
+from .problem import cast_problem
+from .problem_quad import QuadProblem
+from .scaling import scale_problem
+from .presolve import presolve_problem
+from .problem_error import OptProblemError_Infeasible, OptProblemError_Unbounded
 
 class OptSolver:
 
@@ -15,6 +21,15 @@ class OptSolver:
     STATUS_SOLVED = 'solved'
     STATUS_UNKNOWN = 'unknown'
     STATUS_ERROR = 'error'
+
+    # Inertia correction constants
+    REG_DW_0 = 1e-4         # initial primal regularization
+    REG_DW_MIN = 1e-20      # minimum primal regularization
+    REG_DW_MAX = 1e40       # maximum primal regularization
+    REG_DC = 1e-8           # dual regularization
+    REG_KAPPA_MINUS = 1./3. # decrease factor of primal regularization
+    REG_KAPPA_PLUS = 8.     # increase factor of primal regularization
+    REG_KAPPA_PLUS_0 = 100. # increase factor of first primal regularization
     
     def __init__(self):
         """
@@ -36,6 +51,12 @@ class OptSolver:
         #: Information printer (function).
         self.info_printer = None
 
+        #: Profiler of solver phases (enabled during solves with parameter ``'profile'``).
+        self.profiler = OptProfiler()
+
+        #: Cache of analyzed linear solvers (:class:`LinSolverCache <optalg.lin_solver.LinSolverCache>`).
+        self.linsolver_cache = None
+
         # Other
         self.k = 0.
         self.x = np.zeros(0)
@@ -47,6 +68,11 @@ class OptSolver:
         self.error_msg = ''
         self.obj_sca = 1. # objective scaling
         self.problem = None
+        self.line_search_evals = [] # function evaluations of each line search
+        self.reg_dw = 0.      # primal regularization of last KKT factorization
+        self.reg_dc = 0.      # dual regularization of last KKT factorization
+        self.reg_dw_last = 0. # last nonzero primal regularization
+        self.inertia_warned = False # flag for warning about missing inertia
 
         # Norms
         self.norminf = lambda x: np.linalg.norm(x,np.inf) if x.size else 0.
@@ -134,30 +160,61 @@ class OptSolver:
         """
         
         if self.problem:
-            return self.problem.recover_dual_variables(self.lam*self.obj_sca,
-                                                       self.nu*self.obj_sca,
-                                                       self.mu*self.obj_sca,
-                                                       self.pi*self.obj_sca)
+            duals = (self.lam*self.obj_sca,self.nu*self.obj_sca,self.mu*self.obj_sca,self.pi*self.obj_sca)
+            if getattr(self.problem,'dual_recovery_uses_primal',False): # presolved problems
+                return self.problem.recover_dual_variables(*duals,x=self.x)
+            return self.problem.recover_dual_variables(*duals)
         else:
             return None,None,None,None
         
     def get_results(self):
         """
-        Gets results.
+        Gets results. The variables are the ones of the original problem, as
+        returned by :func:`get_primal_variables` and :func:`get_dual_variables`,
+        unless the solve stopped before setting its iterate.
 
         Returns
         -------
         results : dictionary
         """
 
+        if self.problem and self.x.size == self.problem.get_num_primal_variables():
+            x = self.get_primal_variables()
+            lam,nu,mu,pi = self.get_dual_variables()
+        else:
+            x = self.x
+            lam,nu,mu,pi = [v*self.obj_sca for v in (self.lam,self.nu,self.mu,self.pi)]
+
         return {'status': self.status,
                 'error_msg': self.error_msg,
                 'k': self.k,
-                'x': self.x,
-                'lam': self.lam*self.obj_sca,
-                'nu': self.nu*self.obj_sca,
-                'mu': self.mu*self.obj_sca,
-                'pi': self.pi*self.obj_sca}
+                'x': x,
+                'lam': lam,
+                'nu': nu,
+                'mu': mu,
+                'pi': pi,
+                'line_search_evals': list(self.line_search_evals),
+                'profile': self.profiler.get_results()}
+
+    def get_fdata(self,x):
+        """
+        Gets function data at the given point. The solver function
+        is only evaluated if the stored data corresponds to a different
+        point (e.g., it is not the point accepted by the last line search).
+        
+        Parameters
+        ----------
+        x : ndarray
+
+        Returns
+        -------
+        fdata : :class:`OptFuncData <optalg.opt_solver.opt_solver.OptFuncData>`
+        """
+
+        fdata = self.fdata
+        if fdata.x is None or fdata.x.shape != x.shape or not np.array_equal(fdata.x,x):
+            return self.func(x)
+        return fdata
 
     def is_status_solved(self):
         """
@@ -170,10 +227,117 @@ class OptSolver:
 
         return self.status == self.STATUS_SOLVED
 
+    def set_linsolver_cache(self,cache):
+        """
+        Sets cache of analyzed linear solvers. Solvers that
+        support it take analyzed linear solvers from the cache
+        instead of analyzing matrices with known patterns.
+
+        Parameters
+        ----------
+        cache : :class:`LinSolverCache <optalg.lin_solver.LinSolverCache>` (or ``None``)
+        """
+
+        self.linsolver_cache = cache
+
+    def analyze(self,linsolver,A):
+        """
+        Analyzes matrix, or takes a linear solver that
+        has already analyzed its pattern from the cache.
+
+        Parameters
+        ----------
+        linsolver : :class:`LinSolver <optalg.lin_solver.LinSolver>`
+        A : matrix
+
+        Returns
+        -------
+        linsolver : :class:`LinSolver <optalg.lin_solver.LinSolver>`
+        """
+
+        with self.profiler.phase('analyze'):
+            if self.linsolver_cache is None:
+                linsolver.analyze(A)
+                return linsolver
+            return self.linsolver_cache.get_linsolver(linsolver,A)
+
+    def factorize_kkt(self,linsolver,get_matrix,num_neg):
+        """
+        Factorizes symmetric matrix [[W + dw*I, A^T], [A, -dc*I]]. If the
+        factorization fails or the linear solver reports a number of negative
+        eigenvalues different from `num_neg`, the regularization parameters
+        dw and dc are increased and the matrix is factorized again, as
+        in Waechter and Biegler (2006). Linear solvers that do not report
+        inertia (e.g., SuperLU) are only regularized when the factorization
+        fails, and a warning is printed once per solve unless the solver is quiet.
+
+        Parameters
+        ----------
+        linsolver : :class:`LinSolver <optalg.lin_solver.LinSolver>`
+        get_matrix : function of dw and dc that returns the lower triangular part of the matrix
+        num_neg : required number of negative eigenvalues (int)
+
+        Returns
+        -------
+        linsolver : linear solver that holds the factorization (see :func:`analyze`)
+        """
+
+        dw = 0.
+        dc = 0.
+        while True:
+
+            # Factorize
+            with self.profiler.phase('assembly'):
+                K = get_matrix(dw,dc)
+            try:
+                if not linsolver.is_analyzed():
+                    linsolver = self.analyze(linsolver,K)
+                with self.profiler.phase('factorize'):
+                    linsolver.factorize(K)
+                neg = linsolver.get_num_negative_eigenvalues()
+                if neg is None:
+                    if not self.inertia_warned and not self.parameters.get('quiet',False):
+                        print('Warning: linear solver %s does not report inertia, ' %linsolver.name +
+                              'KKT matrices with wrong inertia are not corrected (use mumps)')
+                    self.inertia_warned = True
+                    break
+                if neg == num_neg:
+                    break
+                singular = neg < num_neg
+            except RuntimeError:
+                singular = True
+
+            # Dual regularization
+            if singular and dc == 0.:
+                dc = self.REG_DC
+                continue
+
+            # Primal regularization
+            if dw == 0.:
+                if self.reg_dw_last == 0.:
+                    dw = self.REG_DW_0
+                else:
+                    dw = np.maximum(self.REG_DW_MIN,self.REG_KAPPA_MINUS*self.reg_dw_last)
+            elif self.reg_dw_last == 0.:
+                dw *= self.REG_KAPPA_PLUS_0
+            else:
+                dw *= self.REG_KAPPA_PLUS
+            if dw > self.REG_DW_MAX:
+                raise OptSolverError_BadLinSystem(self)
+
+        self.reg_dw = dw
+        self.reg_dc = dc
+        if dw > 0.:
+            self.reg_dw_last = dw
+
+        return linsolver
+
     def line_search(self,x,p,F,GradF,func,smax=np.inf,maxiter=40):
         """
         Finds steplength along search direction p that 
-        satisfies the strong Wolfe conditions.
+        satisfies the strong Wolfe conditions. The method
+        used is selected with the solver parameter ``line_search``
+        ({``'bisection'``, ``'cubic'``}, default ``'bisection'``).
         
         Parameters
         ----------
@@ -183,10 +347,49 @@ class OptSolver:
         GradF : gradient of function at `x` (ndarray)
         func : function of `x` that returns function object with attributes `F` and `GradF` (function)
         smax : maximum allowed steplength (float)
+        maxiter : maximum number of function evaluations (int)
            
         Returns
         -------
         s : stephlength that satisfies the Wolfe conditions (float).           
+        fdata : function object at `x+s*p`
+        """
+
+        # Count evaluations
+        counter = [0]
+        def counted_func(x):
+            counter[0] += 1
+            return func(x)
+
+        try:
+            with self.profiler.phase('line_search'):
+                if self.parameters.get('line_search','bisection') == 'cubic':
+                    return self.line_search_cubic(x,p,F,GradF,counted_func,smax,maxiter)
+                else:
+                    return self.line_search_bisection(x,p,F,GradF,counted_func,smax,maxiter)
+        finally:
+            self.line_search_evals.append(counter[0])
+
+    def line_search_bisection(self,x,p,F,GradF,func,smax=np.inf,maxiter=40):
+        """
+        Finds steplength along search direction p that 
+        satisfies the strong Wolfe conditions using
+        bisection and doubling.
+        
+        Parameters
+        ----------
+        x : current point (ndarray)
+        p : search direction (ndarray)
+        F : function value at `x` (float)
+        GradF : gradient of function at `x` (ndarray)
+        func : function of `x` that returns function object with attributes `F` and `GradF` (function)
+        smax : maximum allowed steplength (float)
+        maxiter : maximum number of function evaluations (int)
+           
+        Returns
+        -------
+        s : stephlength that satisfies the Wolfe conditions (float).           
+        fdata : function object at `x+s*p`
         """
         
         # Parameters of line search
@@ -235,6 +438,140 @@ class OptSolver:
 
         raise OptSolverError_LineSearch(self)
 
+    def line_search_cubic(self,x,p,F,GradF,func,smax=np.inf,maxiter=40):
+        """
+        Finds steplength along search direction p that 
+        satisfies the strong Wolfe conditions using safeguarded
+        cubic (or quadratic) interpolation, in the style of Moré and Thuente.
+        
+        Parameters
+        ----------
+        x : current point (ndarray)
+        p : search direction (ndarray)
+        F : function value at `x` (float)
+        GradF : gradient of function at `x` (ndarray)
+        func : function of `x` that returns function object with attributes `F` and `GradF` (function)
+        smax : maximum allowed steplength (float)
+        maxiter : maximum number of function evaluations (int)
+           
+        Returns
+        -------
+        s : stephlength that satisfies the Wolfe conditions (float).           
+        fdata : function object at `x+s*p`
+        """
+
+        # Parameters of line search
+        c1 = 1e-4
+        c2 = 5e-1
+
+        phi = F
+        dphi = np.dot(GradF,p)
+        
+        # Check that p is descent direction
+        if dphi >= 0:
+            raise OptSolverError_BadSearchDir(self)
+
+        # Bracketing phase
+        s_prev,phi_prev,dphi_prev = 0.,phi,dphi
+        s = np.minimum(1.,smax)
+        i = 0
+        while True:
+
+            if i >= maxiter:
+                raise OptSolverError_LineSearch(self)
+
+            fdata = func(x+s*p)
+            phis = fdata.F
+            dphis = np.dot(fdata.GradF,p)
+            i += 1
+
+            if phis > phi + c1*s*dphi or (i > 1 and phis >= phi_prev):
+                lo = (s_prev,phi_prev,dphi_prev)
+                hi = (s,phis,dphis)
+                break
+            if np.abs(dphis) <= -c2*dphi:
+                return s,fdata
+            if dphis >= 0:
+                lo = (s,phis,dphis)
+                hi = (s_prev,phi_prev,dphi_prev)
+                break
+            if s >= smax:
+                return s,fdata
+
+            # Extrapolate
+            width = s-s_prev
+            snew = cubic_min(s_prev,phi_prev,dphi_prev,s,phis,dphis)
+            if snew is None or snew < s+1.1*width or snew > s+4.*width:
+                snew = s+2.*width
+            s_prev,phi_prev,dphi_prev = s,phis,dphis
+            s = np.minimum(snew,smax)
+
+        # Zoom phase
+        while True:
+
+            if i >= maxiter:
+                raise OptSolverError_LineSearch(self)
+
+            a,b = np.minimum(lo[0],hi[0]),np.maximum(lo[0],hi[0])
+            delta = 0.1*(b-a)
+            s = cubic_min(lo[0],lo[1],lo[2],hi[0],hi[1],hi[2])
+            if s is None or s < a+delta or s > b-delta:
+                s = quad_min(lo[0],lo[1],lo[2],hi[0],hi[1])
+            if s is None or s < a+delta or s > b-delta:
+                s = (a+b)/2.
+
+            fdata = func(x+s*p)
+            phis = fdata.F
+            dphis = np.dot(fdata.GradF,p)
+            i += 1
+
+            if phis > phi + c1*s*dphi or phis >= lo[1]:
+                hi = (s,phis,dphis)
+            else:
+                if np.abs(dphis) <= -c2*dphi:
+                    return s,fdata
+                if dphis*(hi[0]-lo[0]) >= 0:
+                    hi = lo
+                lo = (s,phis,dphis)
+
+    def prepare_quad_problem(self,problem):
+        """
+        Creates quadratic problem solved by quadratic program solvers.
+        The given problem is cast to a quadratic problem if needed, and
+        presolved and scaled according to the ``'presolve'`` and ``'scaling'``
+        parameters. The problem used for recovering the variables is stored
+        in ``problem`` and the quadratic problem in ``quad_problem``.
+
+        Parameters
+        ----------
+        problem : Object
+
+        Returns
+        -------
+        quad_problem : :class:`QuadProblem <optalg.opt_solver.problem_quad.QuadProblem>`
+        """
+
+        parameters = self.parameters
+        if not isinstance(problem,QuadProblem):
+            problem = cast_problem(problem)
+            quad_problem = QuadProblem(None,None,None,None,None,None,problem=problem)
+        else:
+            quad_problem = problem
+        if parameters['presolve']:
+            try:
+                quad_problem = presolve_problem(quad_problem)
+            except OptProblemError_Infeasible:
+                raise OptSolverError_Infeasibility(self)
+            except OptProblemError_Unbounded:
+                raise OptSolverError_Unbounded(self)
+            problem = quad_problem
+        if parameters['scaling'] is not None:
+            quad_problem = scale_problem(quad_problem,parameters['scaling'])
+            problem = quad_problem
+        self.problem = problem
+        self.quad_problem = quad_problem
+        return quad_problem
+
     def reset(self):
         """
         Resets solver data.
@@ -249,6 +586,14 @@ class OptSolver:
         self.status = self.STATUS_UNKNOWN
         self.error_msg = ''
         self.obj_sca = 1. # objective scaling
+        self.line_search_evals = []
+        self.reg_dw = 0.
+        self.reg_dc = 0.
+        self.reg_dw_last = 0.
+        self.inertia_warned = False
+        self.profiler.reset()
+        self.profiler.enable(self.parameters.get('profile',False))
+        self.fdata.reset()
 
     def set_error_msg(self,msg):
         """
@@ -307,12 +652,129 @@ class OptSolver:
 
         pass
 
-class OptFuncData:
+def cubic_min(a,fa,da,b,fb,db):
+    """
+    Computes minimizer of cubic that interpolates
+    function values and derivatives at a and b.
+
+    Returns
+    -------
+    s : float (``None`` if minimizer does not exist)
+    """
+
+    if a == b:
+        return None
+    d1 = da+db-3.*(fa-fb)/(a-b)
+    rad = d1*d1-da*db
+    if rad < 0:
+        return None
+    d2 = np.sign(b-a)*np.sqrt(rad)
+    den = db-da+2.*d2
+    if den == 0:
+        return None
+    s = b-(b-a)*(db+d2-d1)/den
+    return s if np.isfinite(s) else None
+
+def quad_min(a,fa,da,b,fb):
+    """
+    Computes minimizer of quadratic that interpolates
+    function values at a and b, and derivative at a.
+
+    Returns
+    -------
+    s : float (``None`` if minimizer does not exist)
+    """
+
+    w = b-a
+    den = 2.*(fb-fa-da*w)
+    if den <= 0:
+        return None
+    s = a-da*w*w/den
+    return s if np.isfinite(s) else None
+
+class OptFuncData(object):
     """
     Optimization function data container.
+
+    Fields can be set directly or registered as lazy fields,
+    which are computed on first access. All fields are cleared
+    when the container is reset at a new point.
     """
 
-    pass
+    __slots__ = ('x','_fields','_lazy')
+
+    def __init__(self):
+        """
+        Optimization function data container.
+        """
+
+        object.__setattr__(self,'x',None)
+        object.__setattr__(self,'_fields',{})
+        object.__setattr__(self,'_lazy',{})
+
+    def __getattr__(self,name):
+
+        if name.startswith('_'):
+            raise AttributeError(name)
+        fields = self._fields
+        if name in fields:
+            return fields[name]
+        lazy = self._lazy
+        if name in lazy:
+            value = lazy.pop(name)()
+            fields[name] = value
+            return value
+        raise AttributeError(name)
+
+    def __setattr__(self,name,value):
+
+        if name in OptFuncData.__slots__:
+            object.__setattr__(self,name,value)
+        else:
+            self._fields[name] = value
+            self._lazy.pop(name,None)
+
+    def is_evaluated(self,name):
+        """
+        Determines whether a field has been computed.
+
+        Parameters
+        ----------
+        name : string
+
+        Returns
+        -------
+        flag : {``True``, ``False``}
+        """
+
+        return name in self._fields
+
+    def reset(self,x=None):
+        """
+        Clears all fields and sets the point at which
+        new fields are evaluated.
+
+        Parameters
+        ----------
+        x : ndarray
+        """
+
+        object.__setattr__(self,'x',None if x is None else x.copy())
+        self._fields.clear()
+        self._lazy.clear()
+
+    def set_lazy(self,name,func):
+        """
+        Registers field that is computed on first access.
+
+        Parameters
+        ----------
+        name : string
+        func : function with no arguments that returns the field value
+        """
+
+        self._fields.pop(name,None)
+        self._lazy[name] = func
         
 class OptTermination:
     """
@@ -373,3 +835,111 @@ class OptPrinter:
     
     def __call__(self,solver):
         self.func(solver)
+
+class OptProfiler:
+    """
+    Accumulator of wall time and number of calls of solver phases.
+    """
+
+    def __init__(self):
+        """
+        Constructor.
+        """
+
+        #: Flag that specifies whether phases are timed.
+        self.enabled = False
+
+        #: Accumulated wall time of each phase (dict).
+        self.times = {}
+
+        #: Number of calls of each phase (dict).
+        self.calls = {}
+
+        self._null = OptProfilerPhase(None,None)
+
+    def enable(self,flag=True):
+        """
+        Enables or disables profiling.
+
+        Parameters
+        ----------
+        flag : {``True``, ``False``}
+        """
+
+        self.enabled = flag
+
+    def reset(self):
+        """
+        Clears accumulated data.
+        """
+
+        self.times.clear()
+        self.calls.clear()
+
+    def phase(self,name):
+        """
+        Gets context manager that times a phase. Nested phases are
+        timed independently, so time of a phase includes the time
+        of the phases nested in it.
+
+        Parameters
+        ----------
+        name : string
+
+        Returns
+        -------
+        phase : context manager
+        """
+
+        if not self.enabled:
+            return self._null
+        return OptProfilerPhase(self,name)
+
+    def add(self,name,time):
+        """
+        Adds call of a phase.
+
+        Parameters
+        ----------
+        name : string
+        time : float
+        """
+
+        self.times[name] = self.times.get(name,0.)+time
+        self.calls[name] = self.calls.get(name,0)+1
+
+    def get_results(self):
+        """
+        Gets accumulated data.
+
+        Returns
+        -------
+        results : dictionary of phase name to dictionary with keys ``time`` and ``calls``
+        """
+
+        return dict([(name,{'time': self.times[name],'calls': self.calls[name]}) 
+                     for name in self.times])
+
+class OptProfilerPhase(object):
+    """
+    Context manager that times a solver phase.
+    """
+
+    __slots__ = ('profiler','name','t0')
+
+    def __init__(self,profiler,name):
+
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+
+        if self.profiler is not None:
+            self.t0 = default_timer()
+        return self
+
+    def __exit__(self,*args):
+
+        if self.profiler is not None:
+            self.profiler.add(self.name,default_timer()-self.t0)
+        return False
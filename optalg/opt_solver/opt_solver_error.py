@@ -77,3 +77,11 @@ class OptSolverError_BadInitPoint(OptSolverError):
     def __init__(self,solver=None):
         OptSolverError.__init__(self,solver,'bad initial point')
 
+
+class OptSolverError_Unbounded(OptSolverError):
+    def __init__(self,solver=None):
+        OptSolverError.__init__(self,solver,'unbounded problem')
+
+class OptSolverError_Relaxation(OptSolverError):
+    def __init__(self,solver=None):
+        OptSolverError.__init__(self,solver,'relaxation solver failed')
@@ -0,0 +1,524 @@
+#****************************************************#
+# This file is part of OPTALG.                       #
+#                                                    #
+# Copyright (c) 2015-2017, Tomas Tinoco De Rubira.   #
+#                                                    #
+# OPTALG is released under the BSD 2-clause license. #
+#****************************************************#
+
+import numpy as np
+from types import MethodType
+from scipy.sparse import coo_matrix
+from .problem_lin import LinProblem
+from .problem_quad import QuadProblem
+from .problem_error import *
+
+def presolve_problem(problem,tol=1e-9,maxiter=100):
+    """
+    Creates reduced version of linear or quadratic problem.
+
+    The reduced problem recovers full-size primal and dual variables
+    of the given problem through its
+    :func:`recover_primal_variables <optalg.opt_solver.problem.OptProblem.recover_primal_variables>`
+    and :func:`recover_dual_variables <optalg.opt_solver.problem.OptProblem.recover_dual_variables>`.
+    See :class:`Presolve`.
+
+    Parameters
+    ----------
+    problem : :class:`QuadProblem <optalg.opt_solver.problem_quad.QuadProblem>` or :class:`LinProblem <optalg.opt_solver.problem_lin.LinProblem>`
+    tol : tolerance for feasibility checks (float)
+    maxiter : max number of reduction passes (int)
+
+    Returns
+    -------
+    problem : reduced problem of the same class
+    """
+
+    if isinstance(problem,QuadProblem):
+        presolve = Presolve(problem.A,problem.b,problem.g,problem.l,problem.u,problem.H,tol)
+    elif isinstance(problem,LinProblem):
+        presolve = Presolve(problem.A,problem.b,problem.c,problem.l,problem.u,None,tol)
+    else:
+        raise ValueError('invalid problem type')
+
+    presolve.reduce(maxiter)
+
+    p = presolve.get_reduced_problem(problem.x,problem.lam,problem.mu,problem.pi)
+    p.wrapped_problem = problem
+    p.presolve = presolve
+    p.dual_recovery_uses_primal = True # recover_dual_variables needs keyword argument x
+
+    def recover_primal_variables(cls,x):
+        return cls.wrapped_problem.recover_primal_variables(cls.presolve.recover_primal_variables(x))
+
+    def recover_dual_variables(cls,lam,nu,mu,pi,x=None):
+        if x is None:
+            raise ValueError('primal variables are needed for recovering dual variables')
+        x = cls.presolve.recover_primal_variables(x)
+        lam,mu,pi = cls.presolve.recover_dual_variables(lam,mu,pi,x)
+        return cls.wrapped_problem.recover_dual_variables(lam,nu,mu,pi)
+
+    p.recover_primal_variables = MethodType(recover_primal_variables,p)
+    p.recover_dual_variables = MethodType(recover_dual_variables,p)
+
+    return p
+
+class Presolve:
+    """
+    Presolve of problems of the form
+
+    minimize    (1/2)x^THx + g^Tx
+    subject to  Ax = b
+                l <= x <= u.
+
+    It removes empty rows, singleton rows (which fix their variable),
+    fixed variables, empty columns, duplicate rows and free column
+    singletons (which are substituted out using their row), and keeps
+    a postsolve stack for recovering full-size solutions.
+    """
+
+    # Postsolve record types
+    SINGLETON_ROW = 0
+    FREE_COLUMN = 1
+
+    def __init__(self,A,b,g,l,u,H=None,tol=1e-9):
+        """
+        Constructor.
+
+        Parameters
+        ----------
+        A : matrix
+        b : vector
+        g : vector
+        l : vector
+        u : vector
+        H : symmetric matrix (None for linear problems)
+        tol : tolerance for feasibility checks (float)
+        """
+
+        self.A = coo_matrix(A)
+        self.Acsr = self.A.tocsr()
+        self.Acsc = self.A.tocsc()
+        self.H = coo_matrix(H) if H is not None else None
+        self.Hcsc = self.H.tocsc() if H is not None else None
+        self.m,self.n = self.A.shape
+        self.b0 = b
+        self.g0 = g
+        self.tol = tol
+
+        # Working data
+        self.b = np.array(b,dtype=float)
+        self.g = np.array(g,dtype=float)
+        self.l = np.array(l,dtype=float)
+        self.u = np.array(u,dtype=float)
+
+        #: Flags of rows of the reduced problem.
+        self.rows = np.ones(self.m,dtype=bool)
+        #: Flags of columns of the reduced problem.
+        self.cols = np.ones(self.n,dtype=bool)
+
+        #: Values of removed variables (nan until known).
+        self.x = np.nan*np.ones(self.n)
+
+        #: Postsolve stack.
+        self.stack = []
+
+    def reduce(self,maxiter=100):
+        """
+        Applies reductions until no more are found.
+
+        Parameters
+        ----------
+        maxiter : max number of passes (int)
+        """
+
+        reductions = [self.remove_empty_rows,
+                      self.remove_singleton_rows,
+                      self.remove_fixed_columns,
+                      self.remove_empty_columns,
+                      self.remove_duplicate_rows,
+                      self.remove_free_column_singletons]
+
+        for k in range(maxiter):
+            changed = False
+            for reduction in reductions:
+                if reduction():
+                    changed = True
+            if not changed:
+                break
+
+    def get_active_entries(self):
+        """
+        Gets entries of A in rows and columns of the reduced problem.
+
+        Returns
+        -------
+        row : ndarray
+        col : ndarray
+        data : ndarray
+        """
+
+        A = self.A
+        mask = np.logical_and(self.rows[A.row],self.cols[A.col])
+        return A.row[mask],A.col[mask],A.data[mask]
+
+    def fix_columns(self,j,v):
+        """
+        Removes variables with known values.
+
+        Parameters
+        ----------
+        j : column indices (ndarray)
+        v : values (ndarray)
+        """
+
+        self.x[j] = v
+        self.cols[j] = False
+        self.b -= self.Acsc[:,j]*v
+        if self.H is not None:
+            self.g += self.Hcsc[:,j]*v
+
+    def remove_empty_rows(self):
+        """
+        Removes rows without entries.
+
+        Returns
+        -------
+        flag : {``True``, ``False``} indicating whether the problem changed
+        """
+
+        row,col,data = self.get_active_entries()
+        count = np.bincount(row,minlength=self.m)
+        i = np.where(np.logical_and(self.rows,count == 0))[0]
+        if not i.size:
+            return False
+        if np.any(np.abs(self.b[i]) > self.tol*(1.+np.abs(self.b0[i]))):
+            raise OptProblemError_Infeasible()
+        self.rows[i] = False
+        return True
+
+    def remove_singleton_rows(self):
+        """
+        Removes rows with one entry and fixes their variable.
+
+        Returns
+        -------
+        flag : {``True``, ``False``} indicating whether the problem changed
+        """
+
+        row,col,data = self.get_active_entries()
+        count = np.bincount(row,minlength=self.m)
+        mask = np.logical_and(self.rows,count == 1)[row]
+        if not np.any(mask):
+            return False
+        j,k = np.unique(col[mask],return_index=True) # one row per column
+        i = row[mask][k]
+        a = data[mask][k]
+        v = self.b[i]/a
+        l = self.l[j]
+        u = self.u[j]
+        if (np.any(v < l-self.tol*(1.+np.abs(l))) or
+            np.any(v > u+self.tol*(1.+np.abs(u)))):
+            raise OptProblemError_Infeasible()
+        for ii,jj,aa in zip(i,j,a):
+            self.stack.append((self.SINGLETON_ROW,ii,jj,aa)+self.get_column_data(jj,ii))
+        self.rows[i] = False
+        self.fix_columns(j,np.maximum(np.minimum(v,u),l))
+        return True
+
+    def remove_fixed_columns(self):
+        """
+        Removes variables with equal bounds.
+
+        Returns
+        -------
+        flag : {``True``, ``False``} indicating whether the problem changed
+        """
+
+        j = np.where(np.logical_and(self.cols,self.l == self.u))[0]
+        if not j.size:
+            return False
+        self.fix_columns(j,self.l[j])
+        return True
+
+    def remove_empty_columns(self):
+        """
+        Removes variables that only appear in separable objective terms.
+
+        Returns
+        -------
+        flag : {``True``, ``False``} indicating whether the problem changed
+        """
+
+        row,col,data = self.get_active_entries()
+        count = np.bincount(col,minlength=self.n)
+        hdiag = np.zeros(self.n)
+        if self.H is not None:
+            H = self.H
+            mask = np.logical_and(np.logical_and(self.cols[H.row],self.cols[H.col]),H.data != 0)
+            offdiag = np.logical_and(mask,H.row != H.col)
+            count += np.bincount(H.col[offdiag],minlength=self.n)
+            diag = np.logical_and(mask,H.row == H.col)
+            hdiag += np.bincount(H.col[diag],weights=H.data[diag],minlength=self.n)
+        j = np.where(np.logical_and(self.cols,count == 0))[0]
+        if not j.size:
+            return False
+        h = hdiag[j]
+        g = self.g[j]
+        l = self.l[j]
+        u = self.u[j]
+        v = np.maximum(np.minimum(np.zeros(j.size),u),l)
+        quad = h > 0
+        v[quad] = np.maximum(np.minimum(-g[quad]/h[quad],u[quad]),l[quad])
+        lin = np.logical_and(h == 0,g > 0)
+        v[lin] = l[lin]
+        lin = np.logical_and(h == 0,g < 0)
+        v[lin] = u[lin]
+        conc = h < 0
+        if np.any(np.isinf(l[conc])) or np.any(np.isinf(u[conc])):
+            raise OptProblemError_Unbounded()
+        fl = 0.5*h[conc]*l[conc]**2+g[conc]*l[conc]
+        fu = 0.5*h[conc]*u[conc]**2+g[conc]*u[conc]
+        v[conc] = np.where(fl <= fu,l[conc],u[conc])
+        if np.any(np.isinf(v)):
+            raise OptProblemError_Unbounded()
+        self.fix_columns(j,v)
+        return True
+
+    def remove_duplicate_rows(self):
+        """
+        Removes rows that are multiples of other rows.
+
+        Returns
+        -------
+        flag : {``True``, ``False``} indicating whether the problem changed
+        """
+
+        row,col,data = self.get_active_entries()
+        count = np.bincount(row,minlength=self.m)
+        r = np.random.RandomState(0)
+        w1 = r.uniform(1.,2.,self.n)
+        w2 = r.uniform(1.,2.,self.n)
+        p = np.bincount(row,weights=w1[col],minlength=self.m)
+        v1 = np.bincount(row,weights=data*w1[col],minlength=self.m)
+        v2 = np.bincount(row,weights=data*w2[col],minlength=self.m)
+
+        # Candidates (same pattern and same ratio of weighted sums)
+        groups = {}
+        for i in np.where(np.logical_and(self.rows,count >= 2))[0]:
+            if v2[i] == 0.:
+                continue
+            key = (count[i],'%.10e' %p[i],'%.10e' %(v1[i]/v2[i]))
+            groups.setdefault(key,[]).append(i)
+
+        changed = False
+        for rows in groups.values():
+            if len(rows) < 2:
+                continue
+            i = rows[0]
+            ci,ai = self.get_row(i)
+            for k in rows[1:]:
+                ck,ak = self.get_row(k)
+                if not np.array_equal(ci,ck):
+                    continue
+                alpha = ak[0]/ai[0]
+                if not np.allclose(ak,alpha*ai,rtol=1e-12,atol=0.):
+                    continue
+                if np.abs(self.b[k]-alpha*self.b[i]) > self.tol*(1.+np.abs(self.b[k])):
+                    raise OptProblemError_Infeasible()
+                self.rows[k] = False
+                changed = True
+        return changed
+
+    def remove_free_column_singletons(self):
+        """
+        Substitutes out free variables that appear in one row and not in H.
+
+        Returns
+        -------
+        flag : {``True``, ``False``} indicating whether the problem changed
+        """
+
+        row,col,data = self.get_active_entries()
+        count = np.bincount(col,minlength=self.n)
+        free = np.logical_and(np.logical_and(self.cols,count == 1),
+                              np.logical_and(self.l == -np.inf,self.u == np.inf))
+        if self.H is not None:
+            H = self.H
+            mask = np.logical_and(np.logical_and(self.cols[H.row],self.cols[H.col]),H.data != 0)
+            free[H.col[mask]] = False
+        mask = free[col]
+        if not np.any(mask):
+            return False
+        i,k = np.unique(row[mask],return_index=True) # one column per row
+        j = col[mask][k]
+        a = data[mask][k]
+        for ii,jj,aa in zip(i,j,a):
+            c,v = self.get_row(ii)
+            other = c != jj
+            c = c[other]
+            v = v[other]
+            self.stack.append((self.FREE_COLUMN,ii,jj,aa,c,v,self.b[ii],self.g[jj]))
+            self.g[c] -= self.g[jj]*v/aa
+            self.rows[ii] = False
+            self.cols[jj] = False
+        return True
+
+    def get_row(self,i):
+        """
+        Gets active columns and values of row of A.
+
+        Parameters
+        ----------
+        i : int
+
+        Returns
+        -------
+        cols : ndarray
+        values : ndarray
+        """
+
+        A = self.Acsr
+        c = A.indices[A.indptr[i]:A.indptr[i+1]]
+        v = A.data[A.indptr[i]:A.indptr[i+1]]
+        mask = self.cols[c]
+        order = np.argsort(c[mask])
+        return c[mask][order],v[mask][order]
+
+    def get_column_data(self,j,i):
+        """
+        Gets data of column needed for recovering the dual variable of a singleton row.
+
+        Parameters
+        ----------
+        j : column index (int)
+        i : row index (int)
+
+        Returns
+        -------
+        data : tuple (other active rows, their values, active columns of H, their values, g_j)
+        """
+
+        A = self.Acsc
+        r = A.indices[A.indptr[j]:A.indptr[j+1]]
+        a = A.data[A.indptr[j]:A.indptr[j+1]]
+        mask = np.logical_and(self.rows[r],r != i)
+        if self.H is not None:
+            H = self.Hcsc
+            c = H.indices[H.indptr[j]:H.indptr[j+1]]
+            h = H.data[H.indptr[j]:H.indptr[j+1]]
+            hmask = self.cols[c]
+            c = c[hmask]
+            h = h[hmask]
+        else:
+            c = np.zeros(0,dtype=int)
+            h = np.zeros(0)
+        return (r[mask],a[mask],c,h,self.g[j])
+
+    def get_reduced_problem(self,x=None,lam=None,mu=None,pi=None):
+        """
+        Gets reduced problem.
+
+        Parameters
+        ----------
+        x : initial primal variables of full problem
+        lam : initial dual variables of full problem
+        mu : initial dual variables of full problem
+        pi : initial dual variables of full problem
+
+        Returns
+        -------
+        problem : :class:`QuadProblem <optalg.opt_solver.problem_quad.QuadProblem>` or :class:`LinProblem <optalg.opt_solver.problem_lin.LinProblem>`
+        """
+
+        rows = self.rows
+        cols = self.cols
+        def restrict(v,mask):
+            return v[mask] if v is not None else None
+
+        A = self.Acsr[rows,:][:,cols]
+        if self.H is not None:
+            H = self.H.tocsr()[cols,:][:,cols]
+            return QuadProblem(H,
+                               self.g[cols],
+                               A,
+                               self.b[rows],
+                               self.l[cols],
+                               self.u[cols],
+                               x=restrict(x,cols),
+                               lam=restrict(lam,rows),
+                               mu=restrict(mu,cols),
+                               pi=restrict(pi,cols))
+        else:
+            return LinProblem(self.g[cols],
+                              A,
+                              self.b[rows],
+                              self.l[cols],
+                              self.u[cols],
+                              x=restrict(x,cols),
+                              lam=restrict(lam,rows),
+                              mu=restrict(mu,cols),
+                              pi=restrict(pi,cols))
+
+    def recover_primal_variables(self,x):
+        """
+        Recovers primal variables of full problem.
+
+        Parameters
+        ----------
+        x : primal variables of reduced problem
+
+        Returns
+        -------
+        x : ndarray
+        """
+
+        xfull = self.x.copy()
+        xfull[self.cols] = x
+        for record in reversed(self.stack):
+            if record[0] == self.FREE_COLUMN:
+                t,i,j,a,c,v,b,g = record
+                xfull[j] = (b-np.dot(v,xfull[c]))/a
+        return xfull
+
+    def recover_dual_variables(self,lam,mu,pi,x):
+        """
+        Recovers dual variables of full problem.
+
+        Parameters
+        ----------
+        lam : dual variables of reduced problem
+        mu : dual variables of reduced problem
+        pi : dual variables of reduced problem
+        x : primal variables of full problem
+
+        Returns
+        -------
+        lam : ndarray
+        mu : ndarray
+        pi : ndarray
+        """
+
+        lamfull = np.zeros(self.m)
+        lamfull[self.rows] = lam
+        for record in reversed(self.stack):
+            if record[0] == self.SINGLETON_ROW:
+                t,i,j,a,r,ar,c,h,g = record
+                lamfull[i] = (np.dot(h,x[c])+g-np.dot(ar,lamfull[r]))/a
+            else:
+                t,i,j,a,c,v,b,g = record
+                lamfull[i] = g/a
+
+        # Removed columns
+        removed = np.logical_not(self.cols)
+        rc = self.g0-self.A.T*lamfull
+        if self.H is not None:
+            rc += self.H*x
+        mufull = np.zeros(self.n)
+        pifull = np.zeros(self.n)
+        mufull[self.cols] = mu
+        pifull[self.cols] = pi
+        mufull[removed] = np.maximum(-rc[removed],0.)
+        pifull[removed] = np.maximum(rc[removed],0.)
+
+        return lamfull,mufull,pifull
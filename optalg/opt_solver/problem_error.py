@@ -19,3 +19,10 @@ class OptProblemError_InvalidDataDimensions(OptProblemError):
         OptProblemError.__init__(self,'invalid data dimemnesions')
 
 
+class OptProblemError_Infeasible(OptProblemError):
+    def __init__(self):
+        OptProblemError.__init__(self,'infeasible problem')
+
+class OptProblemError_Unbounded(OptProblemError):
+    def __init__(self):
+        OptProblemError.__init__(self,'unbounded problem')
@@ -45,6 +45,9 @@ class QuadProblem(OptProblem):
             b = problem.b
             l = problem.l
             u = problem.u
+            self.recover_primal_variables = problem.recover_primal_variables
+            self.recover_dual_variables = problem.recover_dual_variables
+            self.dual_recovery_uses_primal = getattr(problem,'dual_recovery_uses_primal',False)
             
         self.H = coo_matrix(H)
         self.Hphi = tril(self.H) # lower triangular
@@ -0,0 +1,294 @@
+#****************************************************#
+# This file is part of OPTALG.                       #
+#                                                    #
+# Copyright (c) 2015-2017, Tomas Tinoco De Rubira.   #
+#                                                    #
+# OPTALG is released under the BSD 2-clause license. #
+#****************************************************#
+
+import numpy as np
+from types import MethodType
+from scipy.sparse import coo_matrix
+from .problem import OptProblem
+from .problem_lin import LinProblem
+from .problem_quad import QuadProblem
+from .problem_mixintlin import MixIntLinProblem
+
+# Constants
+SCALING_MIN = 1e-4 # min scaling factor
+SCALING_MAX = 1e4  # max scaling factor
+
+def compute_scaling(A,H=None,method='ruiz',maxiter=25,tol=1e-2):
+    """
+    Computes diagonal scaling factors D (columns) and E (rows)
+    so that the entries of EAD (and DHD) have magnitudes close to one.
+
+    With method ``'ruiz'``, the symmetric matrix [[H, A^T], [A, 0]] is
+    equilibrated in the infinity norm as in Ruiz (2001). With method
+    ``'geometric'``, the rows and columns of A are scaled by the inverse
+    of the geometric mean of the largest and smallest magnitudes
+    of their entries, and H is ignored.
+
+    Parameters
+    ----------
+    A : matrix
+    H : symmetric matrix (only lower or upper triangular part needed)
+    method : {``'ruiz'``, ``'geometric'``}
+    maxiter : max number of passes (int)
+    tol : tolerance for stopping (float)
+
+    Returns
+    -------
+    D : ndarray
+    E : ndarray
+    """
+
+    if method not in ['ruiz','geometric']:
+        raise ValueError('invalid scaling method')
+
+    A = coo_matrix(A)
+    m,n = A.shape
+    D = np.ones(n)
+    E = np.ones(m)
+
+    # Entries (H symmetrized)
+    if H is not None and method == 'ruiz':
+        H = coo_matrix(H)
+        offdiag = H.row != H.col
+        Hrow = np.concatenate((H.row,H.col[offdiag]))
+        Hcol = np.concatenate((H.col,H.row[offdiag]))
+        Hval = np.abs(np.concatenate((H.data,H.data[offdiag])))
+    else:
+        Hrow = Hcol = np.zeros(0,dtype=int)
+        Hval = np.zeros(0)
+    Aval = np.abs(A.data)
+
+    for k in range(maxiter):
+
+        a = E[A.row]*Aval*D[A.col]
+        h = D[Hrow]*Hval*D[Hcol]
+
+        # Ruiz
+        if method == 'ruiz':
+            col_norm = np.zeros(n)
+            row_norm = np.zeros(m)
+            np.maximum.at(col_norm,A.col,a)
+            np.maximum.at(col_norm,Hcol,h)
+            np.maximum.at(row_norm,A.row,a)
+            if (np.all(np.abs(1.-col_norm[col_norm > 0]) < tol) and
+                np.all(np.abs(1.-row_norm[row_norm > 0]) < tol)):
+                break
+            col_norm[col_norm == 0] = 1.
+            row_norm[row_norm == 0] = 1.
+            D = np.clip(D/np.sqrt(col_norm),SCALING_MIN,SCALING_MAX)
+            E = np.clip(E/np.sqrt(row_norm),SCALING_MIN,SCALING_MAX)
+
+        # Geometric
+        else:
+            row_max = np.zeros(m)
+            row_min = np.inf*np.ones(m)
+            np.maximum.at(row_max,A.row,a)
+            np.minimum.at(row_min,A.row,a)
+            row_min[row_max == 0] = 1.
+            row_max[row_max == 0] = 1.
+            E = np.clip(E/np.sqrt(row_max*row_min),SCALING_MIN,SCALING_MAX)
+            a = E[A.row]*Aval*D[A.col]
+            col_max = np.zeros(n)
+            col_min = np.inf*np.ones(n)
+            np.maximum.at(col_max,A.col,a)
+            np.minimum.at(col_min,A.col,a)
+            col_min[col_max == 0] = 1.
+            col_max[col_max == 0] = 1.
+            delta = np.sqrt(col_max*col_min)
+            D = np.clip(D/delta,SCALING_MIN,SCALING_MAX)
+            if np.all(np.abs(1.-delta) < tol):
+                break
+
+    return D,E
+
+def scale_matrix(M,r,c):
+    """
+    Scales rows and columns of matrix.
+
+    Parameters
+    ----------
+    M : matrix
+    r : row scaling factors (ndarray)
+    c : column scaling factors (ndarray)
+
+    Returns
+    -------
+    M : coo_matrix with entries r_i M_ij c_j
+    """
+
+    M = coo_matrix(M)
+    return coo_matrix((r[M.row]*M.data*c[M.col],(M.row,M.col)),shape=M.shape)
+
+def scale_problem(problem,method='ruiz'):
+    """
+    Creates scaled version of problem.
+
+    The variables of the scaled problem are x/D, its linear equality
+    constraints are scaled by E and its nonlinear equality constraints by F
+    (see :func:`compute_scaling`). The scaled problem recovers primal and dual
+    variables of the given problem through its
+    :func:`recover_primal_variables <optalg.opt_solver.problem.OptProblem.recover_primal_variables>`
+    and :func:`recover_dual_variables <optalg.opt_solver.problem.OptProblem.recover_dual_variables>`.
+    Integer variables of mixed-integer problems are not scaled.
+
+    Parameters
+    ----------
+    problem : :class:`OptProblem <optalg.opt_solver.problem.OptProblem>`
+    method : {``'ruiz'``, ``'geometric'``}
+
+    Returns
+    -------
+    problem : scaled problem of the same class
+    """
+
+    n = problem.get_num_primal_variables()
+    m1 = problem.get_num_linear_equality_constraints()
+    A = problem.A if problem.A is not None else coo_matrix((0,n))
+    def optional(v,s):
+        return v*s if v is not None else None
+
+    # Quadratic
+    if isinstance(problem,QuadProblem):
+        D,E = compute_scaling(A,problem.H,method)
+        F = np.ones(0)
+        p = QuadProblem(scale_matrix(problem.H,D,D),
+                        D*problem.g,
+                        scale_matrix(A,E,D),
+                        E*problem.b,
+                        problem.l/D,
+                        problem.u/D,
+                        x=optional(problem.x,1./D),
+                        lam=optional(problem.lam,1./E),
+                        mu=optional(problem.mu,D),
+                        pi=optional(problem.pi,D))
+
+    # Linear
+    elif isinstance(problem,LinProblem):
+        D,E = compute_scaling(A,None,method)
+        F = np.ones(0)
+        p = LinProblem(D*problem.c,
+                       scale_matrix(A,E,D),
+                       E*problem.b,
+                       problem.l/D,
+                       problem.u/D,
+                       x=optional(problem.x,1./D),
+                       lam=optional(problem.lam,1./E),
+                       mu=optional(problem.mu,D),
+                       pi=optional(problem.pi,D))
+
+    # Mixed integer linear
+    elif isinstance(problem,MixIntLinProblem):
+        D,E = compute_scaling(A,None,method)
+        D[problem.P] = 1.
+        F = np.ones(0)
+        p = MixIntLinProblem(D*problem.c,
+                             scale_matrix(A,E,D),
+                             E*problem.b,
+                             problem.l/D,
+                             problem.u/D,
+                             problem.P,
+                             x=optional(problem.x,1./D))
+
+    # General
+    else:
+        m2 = problem.get_num_nonlinear_equality_constraints()
+        if problem.x is not None:
+            problem.eval(problem.x)
+            J = coo_matrix(problem.J) if m2 else coo_matrix((0,n))
+            C = coo_matrix((np.concatenate((A.data,J.data)),
+                            (np.concatenate((A.row,J.row+m1)),np.concatenate((A.col,J.col)))),
+                           shape=(m1+m2,n))
+            D,EF = compute_scaling(C,problem.Hphi,method)
+        else:
+            D,EF = compute_scaling(A,None,method)
+            EF = np.hstack((EF,np.ones(m2)))
+        E = EF[:m1]
+        F = EF[m1:]
+        p = create_scaled_problem(problem,D,E,F)
+
+    p.wrapped_problem = problem
+    p.D = D
+    p.E = E
+    p.F = F
+    p.dual_recovery_uses_primal = getattr(problem,'dual_recovery_uses_primal',False)
+
+    def recover_primal_variables(cls,x):
+        return cls.wrapped_problem.recover_primal_variables(cls.D*x)
+
+    def recover_dual_variables(cls,lam,nu,mu,pi,x=None):
+        duals = (optional(lam,cls.E),optional(nu,cls.F),optional(mu,1./cls.D),optional(pi,1./cls.D))
+        if cls.dual_recovery_uses_primal:
+            return cls.wrapped_problem.recover_dual_variables(*duals,x=optional(x,cls.D))
+        return cls.wrapped_problem.recover_dual_variables(*duals)
+
+    p.recover_primal_variables = MethodType(recover_primal_variables,p)
+    p.recover_dual_variables = MethodType(recover_dual_variables,p)
+
+    return p
+
+def create_scaled_problem(problem,D,E,F):
+    """
+    Creates scaled version of general problem.
+
+    Parameters
+    ----------
+    problem : :class:`OptProblem <optalg.opt_solver.problem.OptProblem>`
+    D : column scaling factors (ndarray)
+    E : linear equality constraint scaling factors (ndarray)
+    F : nonlinear equality constraint scaling factors (ndarray)
+
+    Returns
+    -------
+    problem : :class:`OptProblem <optalg.opt_solver.problem.OptProblem>`
+    """
+
+    n = D.size
+    p = OptProblem()
+
+    p.A = scale_matrix(problem.A if problem.A is not None else coo_matrix((0,n)),E,D)
+    p.b = E*problem.b if problem.b is not None else np.zeros(0)
+    p.u = problem.u/D
+    p.l = problem.l/D
+    p.P = problem.P
+    p.x = problem.x/D if problem.x is not None else None
+    p.lam = problem.lam/E if problem.lam is not None else None
+    p.nu = problem.nu/F if problem.nu is not None else None
+    p.mu = problem.mu*D if problem.mu is not None else None
+    p.pi = problem.pi*D if problem.pi is not None else None
+
+    def eval(cls,x):
+        prob = cls.wrapped_problem
+        prob.eval(cls.D*x)
+        cls.phi = prob.phi
+        cls.gphi = cls.D*prob.gphi
+        cls.Hphi = scale_matrix(prob.Hphi,cls.D,cls.D)
+        cls.f = cls.F*prob.f
+        cls.J = scale_matrix(prob.J,cls.F,cls.D)
+
+    def combine_H(cls,coeff,ensure_psd=False):
+        prob = cls.wrapped_problem
+        prob.combine_H(cls.F*coeff,ensure_psd)
+        cls.H_combined = scale_matrix(prob.H_combined,cls.D,cls.D)
+
+    p.eval = MethodType(eval,p)
+    p.combine_H = MethodType(combine_H,p)
+
+    # Current data
+    p.wrapped_problem = problem
+    p.D = D
+    p.F = F
+    p.phi = problem.phi
+    def scaled(M,r,c):
+        return scale_matrix(M,r,c) if M is not None else None
+    p.gphi = D*problem.gphi if problem.gphi is not None else None
+    p.Hphi = scaled(problem.Hphi,D,D)
+    p.f = F*problem.f if problem.f is not None else None
+    p.J = scaled(problem.J,F,D)
+    p.H_combined = scaled(problem.H_combined,D,D)
+
+    return p
@@ -33,3 +33,154 @@ class TestOptSolvers(unittest.TestCase):
         x = mumps.solve(b)
 
         self.assertLess(norm(np.dot(A,x)-b),1e-10)
+
+        # Multiple right-hand sides
+        B = np.random.randn(100,7)
+        X = mumps.solve(B)
+        self.assertTupleEqual(X.shape,(100,7))
+        self.assertLess(norm(np.dot(A,X)-B),1e-10)
+        X = mumps.factorize_and_solve(A,B[:,:1])
+        self.assertTupleEqual(X.shape,(100,1))
+        self.assertLess(norm(np.dot(A,X)-B[:,:1]),1e-10)
+
+    def test_mumps_values(self):
+
+        from scipy.sparse import tril
+
+        try:
+            mumps = opt.lin_solver.new_linsolver('mumps','symmetric')
+        except ImportError:
+            raise unittest.SkipTest('no mumps')
+
+        n = 50
+        B = np.random.randn(n,n)*(np.random.rand(n,n) < 0.1)
+        A = coo_matrix(tril(B+B.T+10*np.eye(n)))
+        b = np.random.randn(n)
+
+        mumps.analyze(A)
+        for i in range(3):
+            A.data[:] = A.data*(1.+0.1*np.random.rand(A.nnz))
+            x = mumps.factorize_and_solve(A,b)
+            self.assertTrue(mumps.values is A.data) # no copy
+            S = A+A.T-coo_matrix((A.data*(A.row == A.col),(A.row,A.col)),shape=A.shape)
+            self.assertLess(norm(S*x-b),1e-10)
+
+        # Values only
+        mumps.factorize_values(2.*A.data)
+        self.assertLess(norm(S*mumps.solve(b)-b/2.),1e-10)
+        self.assertRaises(ValueError,mumps.factorize_values,np.ones(A.nnz+1))
+
+        # Pattern drift
+        A = coo_matrix(tril(B+B.T+10*np.eye(n)+np.diag(np.ones(n-1),1)+np.diag(np.ones(n-1),-1)))
+        x = mumps.factorize_and_solve(A,b)
+        S = A+A.T-coo_matrix((A.data*(A.row == A.col),(A.row,A.col)),shape=A.shape)
+        self.assertLess(norm(S*x-b),1e-10)
+        self.assertEqual(mumps.irn.size,A.nnz)
+
+    def test_superlu(self):
+
+        from scipy.sparse import tril
+        from optalg.lin_solver.lin_solver import get_pattern_fingerprint
+
+        n = 100
+        A = coo_matrix(np.random.randn(n,n)*(np.random.rand(n,n) < 0.1)+10*np.eye(n))
+        b = np.random.randn(n)
+
+        superlu = opt.lin_solver.new_linsolver('superlu','unsymmetric')
+        self.assertFalse(superlu.is_analyzed())
+        superlu.analyze(A)
+        self.assertTrue(superlu.is_analyzed())
+        self.assertTrue(superlu.q is None)
+        pattern = superlu.pattern
+        x = superlu.factorize_and_solve(A,b)
+        self.assertLess(norm(A*x-b),1e-10)
+        q = superlu.q
+        self.assertEqual(q.size,n)
+
+        # Same pattern, new values
+        for i in range(5):
+            A.data = np.random.randn(A.nnz)+10*(A.row == A.col)
+            x = superlu.factorize_and_solve(A,b)
+            self.assertLess(norm(A*x-b),1e-10)
+            self.assertTrue(superlu.pattern is pattern)
+            self.assertTrue(superlu.q is q)
+
+        # Multiple right-hand sides
+        B = np.random.randn(n,7)
+        X = superlu.solve(B)
+        self.assertTupleEqual(X.shape,(n,7))
+        self.assertLess(norm(A*X-B),1e-10)
+        for j in range(7):
+            self.assertLess(norm(X[:,j]-superlu.solve(B[:,j])),1e-12)
+
+        # Explicit zeros are part of pattern
+        fingerprint = get_pattern_fingerprint(A)
+        A.data[A.row != A.col] = 0.
+        self.assertEqual(get_pattern_fingerprint(A),fingerprint)
+        self.assertTrue(superlu.has_pattern(superlu.get_full_matrix(A)))
+
+        # Pattern change
+        A = coo_matrix(A.toarray()+np.diag(np.ones(n-1),1))
+        x = superlu.factorize_and_solve(A,b)
+        self.assertLess(norm(A*x-b),1e-10)
+        self.assertFalse(superlu.pattern is pattern)
+        self.assertFalse(superlu.q is q)
+
+        # Symmetric
+        B = np.random.randn(n,n)*(np.random.rand(n,n) < 0.05)
+        S = B+B.T+10*np.eye(n)
+        superlu = opt.lin_solver.new_linsolver('superlu','symmetric')
+        x = superlu.factorize_and_solve(tril(S),b)
+        self.assertTrue(superlu.is_analyzed())
+        self.assertLess(norm(np.dot(S,x)-b),1e-10)
+
+    def test_gmres(self):
+
+        from scipy.sparse import tril
+        from scipy.sparse.linalg import aslinearoperator
+
+        n = 200
+        A = coo_matrix(np.random.randn(n,n)*(np.random.rand(n,n) < 0.05)+10*np.eye(n))
+        b = np.random.randn(n)
+
+        for preconditioner in ['ilu','block_jacobi',None]:
+            gmres = opt.lin_solver.LinSolverGMRES('unsymmetric',
+                                                  preconditioner=preconditioner,
+                                                  tol=1e-10,
+                                                  block_size=20)
+            x = gmres.factorize_and_solve(A,b)
+            self.assertTrue(gmres.converged)
+            self.assertGreater(gmres.num_iterations,0)
+            self.assertLess(norm(A*x-b),1e-8*norm(b))
+
+        # New operator with same preconditioner
+        M = gmres.M
+        A.data += 0.1*np.random.randn(A.nnz)
+        gmres.set_operator(aslinearoperator(A))
+        self.assertTrue(gmres.M is M)
+        x = gmres.solve(b)
+        self.assertLess(norm(A*x-b),1e-8*norm(b))
+
+        # Inexact solve
+        gmres = opt.lin_solver.new_linsolver('gmres','unsymmetric')
+        gmres.tol = 0.5
+        gmres.factorize(A)
+        x = gmres.solve(b)
+        self.assertLessEqual(norm(A*x-b),0.5*norm(b))
+
+        # Multiple right-hand sides
+        gmres.tol = 1e-10
+        B = np.random.randn(n,3)
+        X = gmres.solve(B)
+        self.assertTupleEqual(X.shape,(n,3))
+        self.assertLess(norm(A*X-B),1e-8*norm(B))
+
+        # Symmetric
+        B = np.random.randn(n,n)*(np.random.rand(n,n) < 0.05)
+        S = B+B.T+10*np.eye(n)
+        gmres = opt.lin_solver.new_linsolver('gmres','symmetric')
+        gmres.tol = 1e-10
+        x = gmres.factorize_and_solve(tril(S),b)
+        self.assertLess(norm(np.dot(S,x)-b),1e-8*norm(b))
+
+        self.assertRaises(ValueError,opt.lin_solver.LinSolverGMRES,'unsymmetric','x')
@@ -7,6 +7,7 @@
 #*****************************************************#
 
 import unittest
+import itertools
 import numpy as np
 import optalg as opt
 from numpy.linalg import norm
@@ -35,6 +36,14 @@ class TestOptSolvers(unittest.TestCase):
         u = l+20*np.random.rand(n)
         
         prob = opt.opt_solver.QuadProblem(H,g,A,b,l,u)
+
+        # Count evaluations
+        points = []
+        eval = prob.eval
+        def counted_eval(x):
+            points.append(x.copy())
+            eval(x)
+        prob.eval = counted_eval
     
         try:
             Ipopt.solve(prob)
@@ -42,6 +51,20 @@ class TestOptSolvers(unittest.TestCase):
         except ImportError:
             raise unittest.SkipTest('no ipopt')
 
+        # One evaluation per point
+        self.assertEqual(len(points),Ipopt.num_evals)
+        for i in range(1,len(points)):
+            self.assertFalse(np.array_equal(points[i],points[i-1]))
+
+        # Callback exceptions reach the caller
+        prob = opt.opt_solver.QuadProblem(H,g,A,b,l,u)
+        eval = prob.eval
+        def changing_eval(x):
+            eval(x)
+            prob.Hphi = coo_matrix(([1.],([0],[0])),shape=(n,n))
+        prob.eval = changing_eval
+        self.assertRaises(ValueError,Ipopt.solve,prob)
+
     def test_clp(self):
 
         A = np.array([[6.,1.,1.,0.,0.],
@@ -82,6 +105,31 @@ class TestOptSolvers(unittest.TestCase):
         self.assertLess(100.*norm(pi-pi1,np.inf)/max([norm(mu,np.inf),norm(mu,np.inf),1e-8]),0.1)
         
         self.assertRaises(opt.opt_solver.OptSolverError,solver.solve,4)
+
+        # Persistent
+        solver.set_parameters({'persistent': True})
+        cold = opt.opt_solver.OptSolverClp()
+        cold.set_parameters({'quiet': True})
+        solver.solve(problem)
+        context = solver.clp_context
+        self.assertEqual(solver.method,'initial')
+        for u0,c1,method in [(1.5,160.,'dual'),(1.5,100.,'primal'),(1.2,120.,'initial')]:
+            problem.u[0] = u0
+            problem.c[1] = c1
+            solver.solve(problem)
+            self.assertTrue(solver.clp_context is context)
+            self.assertEqual(solver.method,method)
+            self.assertEqual(solver.get_status(),'solved')
+            cold.solve(problem)
+            self.assertLess(norm(solver.get_primal_variables()-cold.get_primal_variables(),np.inf),1e-8)
+            self.assertLessEqual(solver.get_iterations(),cold.get_iterations())
+            lam,nu,mu,pi = solver.get_dual_variables()
+            self.assertLess(norm(c-A.T.dot(lam)+mu-pi,np.inf),1e-8)
+
+        # New matrix
+        problem = opt.opt_solver.LinProblem(c,2.*A,b,l,u)
+        solver.solve(problem)
+        self.assertFalse(solver.clp_context is context)
         
     def test_cbc(self):
 
@@ -120,6 +168,120 @@ class TestOptSolvers(unittest.TestCase):
         self.assertAlmostEqual(x[0],4.)
         self.assertAlmostEqual(x[1],4.5)
 
+        # Persistent
+        problem.P[:] = [True,True,False,False]
+        solver.set_parameters({'persistent': True,
+                               'time_limit': 60.,
+                               'mip_gap': 1e-6})
+        solver.solve(problem)
+        context = solver.cbc_context
+        x = solver.get_primal_variables()
+        self.assertAlmostEqual(x[0],1.)
+        self.assertAlmostEqual(x[1],2.)
+        for u0,x0,x1 in [(0.,0.,1.),(1e8,1.,2.)]:
+            problem.u[0] = u0
+            solver.solve(problem)
+            self.assertTrue(solver.cbc_context is context)
+            y = solver.get_primal_variables()
+            self.assertFalse(x is y)
+            self.assertAlmostEqual(y[0],x0)
+            self.assertAlmostEqual(y[1],x1)
+
+        # New integer flags
+        problem.P[:] = False
+        solver.solve(problem)
+        self.assertFalse(solver.cbc_context is context)
+        x = solver.get_primal_variables()
+        self.assertAlmostEqual(x[0],4.)
+        self.assertAlmostEqual(x[1],4.5)
+
+    def test_bnb(self):
+
+        # MILP
+        A = np.array([[-2.,2. ,1.,0.],
+                      [-8.,10.,0.,1.]])
+        b = np.array([1.,13.])
+        l = np.array([-10.,-10.,-10.,0.])
+        u = np.array([10.,10.,0.,100.])
+        c = np.array([-1.,-1.,0.,0.])
+        P = np.array([True,True,False,False])
+        problem = opt.opt_solver.MixIntLinProblem(c,A,b,l,u,P)
+
+        solver = opt.opt_solver.OptSolverBnB()
+        solver.set_parameters({'quiet': True})
+        solver.solve(problem)
+        self.assertTrue(solver.is_status_solved())
+        x = solver.get_primal_variables()
+        self.assertEqual(x[0],1.)
+        self.assertEqual(x[1],2.)
+        results = solver.get_results()
+        self.assertEqual(results['k'],results['num_nodes'])
+        self.assertLessEqual(results['gap'],1e-6)
+        self.assertLess(abs(results['bound']+3.),1e-6)
+
+        # Unbounded continuous variables with IQP relaxations
+        problem = opt.opt_solver.MixIntLinProblem(c,A,b,np.array([-10.,-10.,-np.inf,0.]),
+                                                  np.array([10.,10.,0.,np.inf]),P)
+        solver.set_parameters({'relaxation': 'iqp'})
+        solver.solve(problem)
+        self.assertTrue(solver.is_status_solved())
+        x = solver.get_primal_variables()
+        self.assertTrue(np.all(np.isfinite(x)))
+        self.assertEqual(x[0],1.)
+        self.assertEqual(x[1],2.)
+        solver.set_parameters({'relaxation': 'default'})
+
+        # MIQP
+        n = 5
+        B = np.random.randn(n,n)
+        H = np.dot(B.T,B)
+        g = 3.*np.random.randn(n)
+        A = coo_matrix(np.hstack((np.ones((1,n-1)),np.ones((1,1)))))
+        b = np.array([4.])
+        l = np.zeros(n)
+        u = np.array([3.,3.,3.,3.,4.]) # last variable is slack
+        problem = opt.opt_solver.QuadProblem(coo_matrix(H),g,A,b,l,u)
+        problem.P = np.array([True,True,True,True,False])
+        phi_opt = np.inf
+        for z in itertools.product(range(4),repeat=n-1):
+            z = np.array(z+(4.-np.sum(z),),dtype=float)
+            if z[-1] >= 0.:
+                phi_opt = min(phi_opt,0.5*np.dot(z,np.dot(H,z))+np.dot(g,z))
+        for selection in ['hybrid','best_bound','depth_first']:
+            for num_workers,pool in [(1,'process'),(2,'thread'),(2,'process')]:
+                solver.set_parameters({'node_selection': selection,
+                                       'num_workers': num_workers,
+                                       'pool': pool})
+                solver.solve(problem)
+                x = solver.get_primal_variables()
+                self.assertTrue(np.all(x[:-1] == np.round(x[:-1])))
+                self.assertLess(abs(np.sum(x)-4.),1e-6)
+                problem.eval(x)
+                self.assertLess(abs(problem.phi-phi_opt),1e-6*max(1.,abs(phi_opt)))
+
+        # Infeasible
+        problem.u[:-1] = 0.5
+        problem.u[-1] = 1.
+        solver.set_parameters({'num_workers': 1})
+        self.assertRaises(opt.opt_solver.opt_solver_error.OptSolverError_Infeasibility,
+                          solver.solve,problem)
+        self.assertEqual(solver.get_status(),'error')
+
+        # Failed relaxations
+        problem.u[:] = 3.
+        solver.set_parameters({'relaxation_parameters': {'maxiter': 1}})
+        self.assertRaises(opt.opt_solver.opt_solver_error.OptSolverError_Relaxation,
+                          solver.solve,problem)
+        self.assertEqual(solver.get_status(),'error')
+        solver.set_parameters({'relaxation_parameters': None})
+
+        # Bad parameters
+        solver.set_parameters({'relaxation': 'clp'})
+        self.assertRaises(opt.opt_solver.opt_solver_error.OptSolverError_BadProblemType,
+                          solver.solve,problem)
+        solver.set_parameters({'relaxation': 'default','node_selection': 'x'})
+        self.assertRaises(ValueError,solver.solve,problem)
+
     def test_iqp_random(self):
         
         solver = opt.opt_solver.OptSolverIQP()
@@ -323,3 +485,926 @@ class TestOptSolvers(unittest.TestCase):
                     Hd_approx = (gphi1-gphi0)/h
 
                     self.assertLess(100*norm(Hd-Hd_approx)/np.maximum(norm(Hd),1e-3),tol)
+
+    def test_augl_lbfgs(self):
+
+        from optalg.opt_solver.augl import AugLLBFGS
+
+        # Compact form
+        n = 6
+        lbfgs = AugLLBFGS(n,memory=3)
+        delta,W,Minv = lbfgs.get_compact_form()
+        self.assertEqual(delta,1.)
+        self.assertTupleEqual(W.shape,(n,0))
+        self.assertFalse(lbfgs.update(np.ones(n),-np.ones(n))) # negative curvature
+        Q = np.random.randn(n,n)
+        Q = np.dot(Q.T,Q)+np.eye(n)
+        pairs = []
+        for i in range(5):
+            s = np.random.randn(n)
+            self.assertTrue(lbfgs.update(s,np.dot(Q,s)))
+            pairs.append((s,np.dot(Q,s)))
+        delta,W,Minv = lbfgs.get_compact_form()
+        self.assertTupleEqual(W.shape,(n,6))
+        B = delta*np.eye(n)
+        for s,y in pairs[-3:]:
+            Bs = np.dot(B,s)
+            B = B-np.outer(Bs,Bs)/np.dot(s,Bs)+np.outer(y,y)/np.dot(s,y)
+        self.assertLess(norm(delta*np.eye(n)-np.dot(W,np.linalg.solve(Minv,W.T))-B),1e-8*norm(B))
+
+        # Nonlinear problem
+        n = 5
+        S = 10.**np.random.uniform(-1,1,n)
+        t = np.random.randn(n)
+        counter = [0]
+
+        class Problem(opt.opt_solver.OptProblem):
+
+            def __init__(self):
+                opt.opt_solver.OptProblem.__init__(self)
+                self.A = coo_matrix(np.hstack((S[:2]*np.array([1.,-1.]),np.zeros(n-2)))[None,:])
+                self.b = 0.5*np.ones(1)
+                self.l = -10./S
+                self.u = 10./S
+                self.x = np.ones(n)/S
+                self.eval(self.x)
+                self.H_combined = coo_matrix((n,n))
+
+            def eval(self,x):
+                y = S*x
+                self.phi = 0.5*np.dot(y-t,y-t)+np.sum(np.cos(y))
+                self.gphi = S*(y-t)-S*np.sin(y)
+                self.Hphi = coo_matrix(np.diag(S*S*(1.-np.cos(y))))
+                self.f = 10.*np.array([np.sum(y)+0.1*np.dot(y,y)-1.])
+                self.J = coo_matrix(10.*S*(1.+0.2*y))
+
+            def combine_H(self,coeff,ensure_psd=False):
+                counter[0] += 1
+                self.H_combined = coo_matrix(np.diag(coeff[0]*2.*S*S))
+
+        solver = opt.opt_solver.OptSolverAugL()
+        solver.set_parameters({'quiet': True, 'feastol': 1e-6, 'optol': 1e-6})
+        solver.solve(Problem())
+        self.assertEqual(solver.get_status(),'solved')
+        self.assertGreater(counter[0],0)
+        xref = solver.get_primal_variables()
+
+        counter[0] = 0
+        solver.set_parameters({'hessian': 'lbfgs'})
+        solver.solve(Problem())
+        self.assertEqual(solver.get_status(),'solved')
+        self.assertEqual(counter[0],0)
+        self.assertLess(norm(S*(solver.get_primal_variables()-xref),np.inf),1e-4)
+
+        # Lazy fields use the multipliers of the evaluation
+        fdata = solver.func(solver.x)
+        lam = solver.lam.copy()
+        nu = solver.nu.copy()
+        solver.lam += 1.
+        solver.nu += 1.
+        self.assertLess(norm(fdata.ATlam-solver.problem.A.T*lam),1e-12)
+        self.assertLess(norm(fdata.JTnu-solver.problem.J.T*nu),1e-12)
+
+        solver.set_parameters({'hessian': 'x'})
+        self.assertRaises(ValueError,solver.solve,Problem())
+
+    def test_kkt_assembler(self):
+
+        from optalg.opt_solver.kkt import KKTAssembler
+        from scipy.sparse import eye, tril
+
+        n = 10
+        m = 4
+        H = coo_matrix(np.random.randn(n,n))
+        H = coo_matrix(H+H.T)
+        A = coo_matrix(np.random.randn(m,n))
+
+        kkt = KKTAssembler((n+m,n+m),
+                           [('H',tril(H),0,0),
+                            ('D',eye(n),0,0),
+                            ('A',-A,n,0)])
+        K = kkt.get_matrix()
+        row = K.row
+        col = K.col
+        data = K.data
+
+        for i in range(3):
+            d = np.random.rand(n)
+            kkt.set_values('D',d)
+            self.assertTrue(kkt.get_matrix() is K)
+            self.assertTrue(K.row is row and K.col is col and K.data is data)
+            Kd = K.toarray()
+            self.assertLess(norm(Kd[:n,:n]-np.tril(H.toarray())-np.diag(d)),1e-12)
+            self.assertLess(norm(Kd[n:,:n]+A.toarray()),1e-12)
+            self.assertLess(norm(Kd[:,n:]),1e-12)
+            self.assertLess(norm(kkt.get_values('D')-d),1e-12)
+
+    def test_merit_gradients(self):
+
+        n = 30
+        m = 8
+        p = 10
+        A = coo_matrix(np.random.randn(m,n))
+        b = np.random.randn(m)
+        g = np.random.randn(n)
+        B = np.random.randn(p,n)
+        H = coo_matrix(np.dot(B.T,B)+1e-3*np.eye(n))
+        l = np.random.randn(n)
+        u = l+5*np.random.rand(n)
+        prob = opt.opt_solver.QuadProblem(H,g,A,b,l,u)
+
+        for solver in [opt.opt_solver.OptSolverIQP(),opt.opt_solver.OptSolverINLP()]:
+            solver.set_parameters({'quiet': True, 'maxiter': 3})
+            self.assertRaises(opt.opt_solver.OptSolverError,solver.solve,prob)
+            y = solver.y+1e-2*np.random.rand(solver.y.size)
+            fdata = solver.func(y)
+            J = solver.jacobian(y)
+            self.assertLess(norm(J.T*fdata.f-fdata.GradF),1e-10*norm(fdata.GradF))
+
+    def test_func_data(self):
+
+        from optalg.opt_solver.opt_solver import OptFuncData
+
+        calls = []
+        def J():
+            calls.append(1)
+            return 3.
+
+        fdata = OptFuncData()
+        x = np.ones(3)
+        fdata.reset(x)
+        x[0] = 5.
+        self.assertEqual(fdata.x[0],1.)
+        fdata.F = 2.
+        fdata.set_lazy('J',J)
+        self.assertFalse(fdata.is_evaluated('J'))
+        self.assertEqual(fdata.F,2.)
+        self.assertEqual(fdata.J,3.)
+        self.assertEqual(fdata.J,3.)
+        self.assertEqual(len(calls),1)
+        self.assertTrue(fdata.is_evaluated('J'))
+        self.assertFalse(hasattr(fdata,'__dict__'))
+
+        fdata.reset(x)
+        self.assertEqual(fdata.x[0],5.)
+        self.assertRaises(AttributeError,getattr,fdata,'F')
+        self.assertRaises(AttributeError,getattr,fdata,'J')
+
+    def test_nr(self):
+
+        n = 20
+        m = 5
+        B = coo_matrix(np.eye(n-m,n)+0.1*np.random.randn(n-m,n))
+        c = np.random.randn(n-m)
+
+        class Problem(opt.opt_solver.OptProblem):
+
+            def __init__(self):
+                opt.opt_solver.OptProblem.__init__(self)
+                self.A = coo_matrix(np.hstack((np.zeros((m,n-m)),np.eye(m))))
+                self.b = np.ones(m)
+                self.x = np.zeros(n)
+                self.eval(self.x)
+
+            def eval(self,x):
+                self.f = x[:n-m]**3.+B*x-c
+                self.J = coo_matrix(np.hstack((np.diag(3.*x[:n-m]**2.),np.zeros((n-m,m))))+B.toarray())
+
+        problem = Problem()
+
+        solver = opt.opt_solver.OptSolverNR()
+        solver.set_parameters({'quiet': True, 'feastol': 1e-10})
+        solver.solve(problem)
+        self.assertEqual(solver.get_status(),'solved')
+
+        x = solver.get_primal_variables()
+        problem.eval(x)
+        self.assertLess(norm(problem.f,np.inf),1e-10)
+        self.assertLess(norm(problem.A*x-problem.b,np.inf),1e-10)
+        k = solver.get_results()['k']
+        self.assertEqual(solver.get_results()['num_factorizations'],k)
+
+        # Newton-Krylov
+        for preconditioner in ['ilu','block_jacobi',None]:
+            solver.set_parameters({'linsolver': 'gmres',
+                                   'preconditioner': preconditioner})
+            solver.solve(Problem())
+            self.assertEqual(solver.get_status(),'solved')
+            results = solver.get_results()
+            self.assertLess(results['num_factorizations'],results['k'])
+            self.assertGreater(results['num_linear_iterations'],0)
+            x = solver.get_primal_variables()
+            problem.eval(x)
+            self.assertLess(norm(problem.f,np.inf),1e-10)
+            self.assertLess(norm(problem.A*x-problem.b,np.inf),1e-10)
+
+        # Jacobian reuse
+        solver.set_parameters({'linsolver': 'superlu'})
+        for update in ['chord','broyden']:
+            solver.set_parameters({'jacobian_update': update})
+            solver.solve(Problem())
+            self.assertEqual(solver.get_status(),'solved')
+            results = solver.get_results()
+            self.assertLess(results['num_factorizations'],k)
+            x = solver.get_primal_variables()
+            problem.eval(x)
+            self.assertLess(norm(problem.f,np.inf),1e-10)
+            self.assertLess(norm(problem.A*x-problem.b,np.inf),1e-10)
+
+        # Broyden updates
+        solver.linsolver.factorize(solver.M)
+        solver.broyden = ([],[],[])
+        K = solver.M.toarray()
+        for i in range(3):
+            s = np.random.randn(n)
+            y = np.random.randn(n)
+            solver.update_broyden(s,y)
+            K = K+np.outer(y-np.dot(K,s),s)/np.dot(s,s)
+            self.assertLess(norm(np.dot(K,s)-y),1e-8*norm(y))
+            r = np.random.randn(n)
+            self.assertLess(norm(np.dot(K,solver.solve_jacobian(r))-r),1e-8*norm(r))
+
+        solver.set_parameters({'linsolver': 'gmres'})
+        self.assertRaises(ValueError,solver.solve,Problem())
+        solver.set_parameters({'jacobian_update': 'x'})
+        self.assertRaises(ValueError,solver.solve,Problem())
+
+        # Forcing terms
+        eta = solver.forcing_term(1.,None,None)
+        self.assertEqual(eta,0.5)
+        self.assertLess(solver.forcing_term(1e-2,1.,eta),eta)
+        self.assertEqual(solver.forcing_term(1.,1e-2,eta),0.9)
+        self.assertGreaterEqual(solver.forcing_term(1e-9,1.,1e-3),0.5*1e-10/1e-9)
+
+    def test_get_fdata(self):
+
+        solver = opt.opt_solver.OptSolverNR()
+        calls = []
+        def func(x):
+            calls.append(1)
+            solver.fdata.reset(x)
+            solver.fdata.F = np.sum(x)
+            return solver.fdata
+        solver.func = func
+
+        x = np.ones(4)
+        self.assertEqual(solver.get_fdata(x).F,4.)
+        self.assertEqual(solver.get_fdata(x.copy()).F,4.)
+        self.assertEqual(len(calls),1)
+        x[0] = 2.
+        self.assertEqual(solver.get_fdata(x).F,5.)
+        self.assertEqual(len(calls),2)
+        solver.reset()
+        self.assertEqual(solver.get_fdata(x).F,5.)
+        self.assertEqual(len(calls),3)
+
+    def test_iqp_predictor_corrector(self):
+
+        solver = opt.opt_solver.OptSolverIQP()
+        solver.set_parameters({'tol': 1e-8,
+                               'quiet': True,
+                               'predictor_corrector': True})
+        ref_solver = opt.opt_solver.OptSolverIQP()
+        ref_solver.set_parameters({'tol': 1e-8,
+                                   'quiet': True})
+
+        for i in range(10):
+
+            n = 50
+            m = 10
+            p = 20
+            A = coo_matrix(np.random.randn(m,n))
+            b = np.random.randn(m)
+            g = np.random.randn(n)
+            B = np.random.randn(p,n)
+            H = coo_matrix(np.dot(B.T,B))
+            l = np.random.randn(n)
+            u = l+10.
+            
+            prob = opt.opt_solver.QuadProblem(H,g,A,b,l,u)
+
+            solver.solve(prob)
+            self.assertEqual(solver.get_status(),'solved')
+            self.assertEqual(len(solver.get_results()['line_search_evals']),0)
+
+            x = solver.get_primal_variables()
+            lam,nu,mu,pi = solver.get_dual_variables()
+
+            eps = 1e-6
+            self.assertLess(norm(g+H*x-A.T*lam+mu-pi),eps)
+            self.assertLess(norm(A*x-b),eps)
+            self.assertTrue(np.all(x < u))
+            self.assertTrue(np.all(x > l))
+            self.assertLess(norm(mu*(u-x),np.inf),eps)
+            self.assertLess(norm(pi*(x-l),np.inf),eps)
+
+            ref_solver.solve(prob)
+            xref = ref_solver.get_primal_variables()
+            phi = 0.5*np.dot(x,H*x)+np.dot(g,x)
+            phiref = 0.5*np.dot(xref,H*xref)+np.dot(g,xref)
+            self.assertLess(np.abs(phi-phiref)/np.maximum(np.abs(phiref),1.),1e-6)
+            self.assertLessEqual(solver.get_iterations(),ref_solver.get_iterations())
+
+    def test_admm(self):
+
+        solver = opt.opt_solver.OptSolverADMM()
+        solver.set_parameters({'tol': 1e-6,
+                               'tol_rel': 1e-6,
+                               'quiet': True})
+        ref_solver = opt.opt_solver.OptSolverIQP()
+        ref_solver.set_parameters({'tol': 1e-8,
+                                   'quiet': True})
+
+        for i in range(5):
+
+            n = 50
+            m = 10
+            p = 20
+            A = coo_matrix(np.random.randn(m,n))
+            b = np.random.randn(m)
+            g = np.random.randn(n)
+            B = np.random.randn(p,n)
+            H = coo_matrix(np.dot(B.T,B)+1e-2*np.eye(n))
+            l = np.random.randn(n)
+            u = l+10.
+
+            prob = opt.opt_solver.QuadProblem(H,g,A,b,l,u)
+
+            solver.solve(prob)
+            self.assertEqual(solver.get_status(),'solved')
+            results = solver.get_results()
+            self.assertGreaterEqual(results['num_factorizations'],1)
+            self.assertLess(results['num_factorizations'],solver.get_iterations())
+
+            x = solver.get_primal_variables()
+            lam,nu,mu,pi = solver.get_dual_variables()
+
+            eps = 1e-3
+            self.assertLess(norm(g+H*x-A.T*lam+mu-pi,np.inf),eps)
+            self.assertLess(norm(A*x-b,np.inf),eps)
+            self.assertTrue(np.all(x <= u+eps))
+            self.assertTrue(np.all(x >= l-eps))
+            self.assertTrue(np.all(mu >= 0))
+            self.assertTrue(np.all(pi >= 0))
+
+            ref_solver.solve(prob)
+            xref = ref_solver.get_primal_variables()
+            self.assertLess(norm(x-xref,np.inf),eps)
+
+            # Warm start
+            iters = solver.get_iterations()
+            prob.x = xref
+            prob.lam,nu,prob.mu,prob.pi = ref_solver.get_dual_variables()
+            solver.solve(prob)
+            self.assertEqual(solver.get_status(),'solved')
+            self.assertLess(solver.get_iterations(),iters)
+
+        # Primal infeasible (sum of x in [0,1]^n cannot be n+1)
+        n = 10
+        H = coo_matrix(np.eye(n))
+        A = coo_matrix(np.ones((1,n)))
+        prob = opt.opt_solver.QuadProblem(H,np.zeros(n),A,np.array([n+1.]),np.zeros(n),np.ones(n))
+        self.assertRaises(opt.opt_solver.opt_solver_error.OptSolverError_Infeasibility,solver.solve,prob)
+        self.assertEqual(solver.get_error_msg(),'infeasible problem')
+        self.assertLess(solver.get_iterations(),solver.parameters['maxiter'])
+
+        # Dual infeasible (linear objective decreasing along free direction)
+        H = coo_matrix((n,n))
+        A = coo_matrix(np.hstack((np.ones((1,n-1)),np.zeros((1,1)))))
+        u = np.ones(n)
+        u[-1] = np.inf
+        prob = opt.opt_solver.QuadProblem(H,-np.ones(n),A,np.array([1.]),np.zeros(n),u)
+        self.assertRaises(opt.opt_solver.opt_solver_error.OptSolverError_Unbounded,solver.solve,prob)
+        self.assertLess(solver.get_iterations(),solver.parameters['maxiter'])
+
+    def test_scaling(self):
+
+        # Scaling factors
+        for method in ['ruiz','geometric']:
+            A = coo_matrix(np.random.randn(10,30)*10.**np.random.uniform(-4,4,30))
+            D,E = opt.opt_solver.compute_scaling(A,None,method)
+            self.assertTrue(np.all(D > 0))
+            self.assertTrue(np.all(E > 0))
+            As = opt.opt_solver.scaling.scale_matrix(A,E,D).toarray()
+            self.assertLess(np.max(np.abs(As)),np.max(np.abs(A.toarray())))
+            self.assertGreater(np.min(np.max(np.abs(As),axis=0)),1e-2)
+        self.assertRaises(ValueError,opt.opt_solver.compute_scaling,A,None,'foo')
+
+        # Badly scaled QP
+        n = 50
+        m = 10
+        p = 20
+        S = 10.**np.random.uniform(-3,3,n)
+        R = 10.**np.random.uniform(-3,3,m)
+        A = np.random.randn(m,n)
+        B = np.random.randn(p,n)
+        H = np.dot(B.T,B)+1e-2*np.eye(n)
+        g = np.random.randn(n)
+        b = np.random.randn(m)
+        l = np.random.randn(n)
+        u = l+10.
+        ref_solver = opt.opt_solver.OptSolverIQP()
+        ref_solver.set_parameters({'tol': 1e-10, 'quiet': True})
+        ref_solver.solve(opt.opt_solver.QuadProblem(coo_matrix(H),g,coo_matrix(A),b,l,u))
+        xref = ref_solver.get_primal_variables()
+        lamref,nuref,muref,piref = ref_solver.get_dual_variables()
+        H = coo_matrix(S[:,None]*H*S[None,:])
+        g = S*g
+        A = coo_matrix(R[:,None]*A*S[None,:])
+        b = R*b
+        prob = opt.opt_solver.QuadProblem(H,g,A,b,l/S,u/S)
+
+        solver = opt.opt_solver.OptSolverIQP()
+        solver.set_parameters({'tol': 1e-8, 'quiet': True})
+        solver.solve(prob)
+        error = norm(S*solver.get_primal_variables()-xref,np.inf)
+
+        for method in ['ruiz','geometric']:
+
+            sprob = opt.opt_solver.scale_problem(prob,method)
+            self.assertTrue(isinstance(sprob,opt.opt_solver.QuadProblem))
+            self.assertTrue(sprob.wrapped_problem is prob)
+
+            solver = opt.opt_solver.OptSolverIQP()
+            solver.set_parameters({'tol': 1e-8, 'quiet': True, 'scaling': method})
+            solver.solve(prob)
+            self.assertEqual(solver.get_status(),'solved')
+            x = solver.get_primal_variables()
+            lam,nu,mu,pi = solver.get_dual_variables()
+            self.assertEqual(x.size,n)
+            self.assertLess(norm(S*x-xref,np.inf),error)
+            self.assertLess(norm(A*x-b,np.inf),1e-6)
+            self.assertLess(norm(R*lam-lamref)/np.maximum(norm(lamref),1.),1e-3)
+            self.assertLess(norm(mu/S-muref)/np.maximum(norm(muref),1.),1e-3)
+            self.assertLess(norm(pi/S-piref)/np.maximum(norm(piref),1.),1e-3)
+
+            # Results have recovered variables
+            results = solver.get_results()
+            for key,v in zip(['x','lam','mu','pi'],[x,lam,mu,pi]):
+                self.assertTrue(np.array_equal(results[key],v))
+
+            # Fewer iterations for first-order method
+            admm = opt.opt_solver.OptSolverADMM()
+            admm.set_parameters({'quiet': True})
+            admm.solve(prob)
+            k = admm.get_iterations()
+            admm.set_parameters({'scaling': method})
+            admm.solve(prob)
+            self.assertEqual(admm.get_status(),'solved')
+            self.assertLess(admm.get_iterations(),k)
+
+        # Nonlinear problem
+        n = 5
+        S = 10.**np.random.uniform(-2,2,n)
+        r = 1e3
+        t = np.random.randn(n)
+
+        class Problem(opt.opt_solver.OptProblem):
+
+            def __init__(self):
+                opt.opt_solver.OptProblem.__init__(self)
+                self.A = coo_matrix(np.hstack((S[:2]*np.array([1.,-1.]),np.zeros(n-2)))[None,:])
+                self.b = 0.5*np.ones(1)
+                self.l = -10./S
+                self.u = 10./S
+                self.x = np.ones(n)/S
+                self.eval(self.x)
+                self.combine_H(np.zeros(1))
+
+            def eval(self,x):
+                y = S*x
+                self.phi = 0.5*np.dot(y-t,y-t)
+                self.gphi = S*(y-t)
+                self.Hphi = coo_matrix(np.diag(S*S))
+                self.f = r*np.array([np.sum(y)+0.1*np.dot(y,y)-1.])
+                self.J = coo_matrix(r*S*(1.+0.2*y))
+
+            def combine_H(self,coeff,ensure_psd=False):
+                self.H_combined = coo_matrix(np.diag(coeff[0]*r*0.2*S*S))
+
+        solver = opt.opt_solver.OptSolverINLP()
+        solver.set_parameters({'tol': 1e-8, 'quiet': True})
+        solver.solve(Problem())
+        self.assertEqual(solver.get_status(),'solved')
+        xref = solver.get_primal_variables()
+        lamref,nuref,muref,piref = solver.get_dual_variables()
+
+        for method in ['ruiz','geometric']:
+            problem = Problem()
+            sprob = opt.opt_solver.scale_problem(problem,method)
+            self.assertTrue(sprob.wrapped_problem is problem)
+            self.assertEqual(sprob.F.size,1)
+            solver.set_parameters({'scaling': method})
+            solver.solve(problem)
+            self.assertEqual(solver.get_status(),'solved')
+            x = solver.get_primal_variables()
+            lam,nu,mu,pi = solver.get_dual_variables()
+            self.assertLess(norm(S*(x-xref),np.inf),1e-6)
+            self.assertLess(np.abs(lam[0]-lamref[0])/np.maximum(np.abs(lamref[0]),1.),1e-5)
+            self.assertLess(np.abs(nu[0]-nuref[0])/np.maximum(np.abs(nuref[0]),1e-3),1e-5)
+
+    def test_presolve(self):
+
+        n = 40
+        m = 12
+        p = 15
+        A = np.random.randn(m,n)
+        A[0,:] = 0.
+        A[0,3] = 2.           # singleton row
+        A[1,:] = 0.           # empty row
+        A[2,:] = 3.*A[4,:]    # duplicate row
+        A[:,n-3:] = 0.        # empty columns
+        B = np.random.randn(p,n-8)
+        H = np.zeros((n,n))
+        H[:n-8,:n-8] = np.dot(B.T,B)+1e-2*np.eye(n-8)
+        H[n-2,n-2] = 2.
+        g = np.random.randn(n)
+        l = np.random.randn(n)
+        u = l+5.
+        u[5] = l[5]           # fixed columns
+        u[6] = l[6]
+        for k,j in enumerate(range(n-6,n-3)):
+            A[:,j] = 0.       # free column singletons
+            A[5+k,j] = 1.5
+            l[j] = -np.inf
+            u[j] = np.inf
+        x0 = np.maximum(np.minimum(np.random.randn(n),u),l)
+        b = np.dot(A,x0)
+        H = coo_matrix(H)
+        A = coo_matrix(A)
+
+        prob = opt.opt_solver.QuadProblem(H,g,A,b,l,u)
+        red = opt.opt_solver.presolve_problem(prob)
+        self.assertTrue(isinstance(red,opt.opt_solver.QuadProblem))
+        self.assertTrue(red.wrapped_problem is prob)
+        self.assertEqual(red.A.shape[0],m-6)
+        self.assertEqual(red.A.shape[1],n-9)
+        self.assertTrue(np.all(red.l < red.u))
+
+        # IQP cannot handle fixed variables without presolve
+        solver = opt.opt_solver.OptSolverIQP()
+        solver.set_parameters({'tol': 1e-9, 'quiet': True})
+        self.assertRaises(opt.opt_solver.OptSolverError,solver.solve,prob)
+
+        solver.set_parameters({'presolve': True})
+        solver.solve(prob)
+        self.assertEqual(solver.get_status(),'solved')
+        x = solver.get_primal_variables()
+        lam,nu,mu,pi = solver.get_dual_variables()
+        self.assertEqual(x.size,n)
+        self.assertEqual(lam.size,m)
+        self.assertEqual(mu.size,n)
+        self.assertEqual(pi.size,n)
+        eps = 1e-7
+        self.assertLess(norm(H*x+g-A.T*lam+mu-pi,np.inf),eps)
+        self.assertLess(norm(A*x-b,np.inf),eps)
+        self.assertTrue(np.all(x >= l-eps))
+        self.assertTrue(np.all(x <= u+eps))
+        self.assertTrue(np.all(mu >= 0))
+        self.assertTrue(np.all(pi >= 0))
+        finite = np.isfinite(u)
+        self.assertLess(norm(mu[finite]*(u-x)[finite],np.inf),eps)
+        finite = np.isfinite(l)
+        self.assertLess(norm(pi[finite]*(x-l)[finite],np.inf),eps)
+
+        # Same solution with scaling
+        xref = x
+        solver.set_parameters({'scaling': 'ruiz'})
+        solver.solve(prob)
+        self.assertEqual(solver.get_status(),'solved')
+        self.assertLess(norm(solver.get_primal_variables()-xref,np.inf),1e-6)
+        lam,nu,mu,pi = solver.get_dual_variables()
+        self.assertLess(norm(H*xref+g-A.T*lam+mu-pi,np.inf),1e-6)
+
+        # Linear problem
+        c = np.random.rand(n)
+        lp = opt.opt_solver.LinProblem(c,A,b,np.maximum(l,-10.),np.minimum(u,10.),x=np.zeros(n))
+        red = opt.opt_solver.presolve_problem(lp)
+        self.assertTrue(isinstance(red,opt.opt_solver.LinProblem))
+        self.assertLess(red.A.shape[1],n)
+        solver.set_parameters({'scaling': None})
+        solver.solve(lp)
+        self.assertEqual(solver.get_status(),'solved')
+        lam,nu,mu,pi = solver.get_dual_variables() # before primal recovery
+        x = solver.get_primal_variables()
+        self.assertLess(norm(c-A.T*lam+mu-pi,np.inf),1e-6)
+        self.assertLess(norm(A*x-b,np.inf),1e-6)
+
+        # Infeasible
+        b[1] = 1.
+        prob = opt.opt_solver.QuadProblem(H,g,A,b,l,u)
+        self.assertRaises(opt.opt_solver.OptSolverError,solver.solve,prob)
+        self.assertEqual(solver.get_error_msg(),'infeasible problem')
+
+        # Concave empty column
+        b = np.dot(A.toarray(),x0)
+        Hc = H.toarray()
+        Hc[n-1,n-1] = -2.
+        j = n-1
+        prob = opt.opt_solver.QuadProblem(coo_matrix(Hc),g,A,b,l,u)
+        red = opt.opt_solver.presolve_problem(prob)
+        x = red.recover_primal_variables(np.zeros(red.get_num_primal_variables()))
+        f = lambda v: -v**2+g[j]*v
+        self.assertEqual(x[j],l[j] if f(l[j]) <= f(u[j]) else u[j])
+        u[j] = np.inf
+        prob = opt.opt_solver.QuadProblem(coo_matrix(Hc),g,A,b,l,u)
+        self.assertRaises(opt.opt_solver.problem_error.OptProblemError_Unbounded,opt.opt_solver.presolve_problem,prob)
+
+        # Dual recovery of problems with original signature
+        class QuadProblemDual(opt.opt_solver.QuadProblem):
+            def recover_dual_variables(self,lam,nu,mu,pi):
+                return lam,nu,mu,pi
+        prob = QuadProblemDual(H,g,A,b,x0-2.5,x0+2.5)
+        solver.set_parameters({'presolve': False})
+        solver.solve(prob)
+        lam,nu,mu,pi = solver.get_dual_variables()
+        self.assertEqual(lam.size,m)
+
+    def test_factorize_kkt(self):
+
+        from scipy.sparse import bmat,eye,tril
+
+        class LinSolverInertia(opt.lin_solver.LinSolverSUPERLU):
+            def factorize(self,A):
+                opt.lin_solver.LinSolverSUPERLU.factorize(self,A)
+                K = self.get_full_matrix(A).toarray()
+                self.neg = int(np.sum(np.linalg.eigvalsh(K) < -1e-12))
+                if np.min(np.abs(np.linalg.eigvalsh(K))) < 1e-12:
+                    raise RuntimeError('singular matrix')
+            def get_num_negative_eigenvalues(self):
+                return self.neg
+
+        n = 10
+        m = 3
+        B = np.random.randn(n,n)
+        W = coo_matrix(B+B.T)
+        A = coo_matrix(np.random.randn(m,n))
+        def get_matrix(dw,dc):
+            return bmat([[tril(W+dw*eye(n)),None],
+                         [A,-dc*eye(m)]],format='coo')
+
+        # Nonconvex
+        solver = opt.opt_solver.OptSolver()
+        linsolver = LinSolverInertia('symmetric')
+        solver.factorize_kkt(linsolver,get_matrix,m)
+        self.assertGreater(solver.reg_dw,0.)
+        self.assertEqual(solver.reg_dc,0.)
+        self.assertEqual(linsolver.get_num_negative_eigenvalues(),m)
+        dw = solver.reg_dw
+        solver.factorize_kkt(linsolver,get_matrix,m)
+        self.assertEqual(linsolver.get_num_negative_eigenvalues(),m)
+        self.assertLessEqual(solver.reg_dw,dw)
+
+        # Convex
+        W = coo_matrix(np.dot(B,B.T)+np.eye(n))
+        solver.factorize_kkt(linsolver,get_matrix,m)
+        self.assertEqual(solver.reg_dw,0.)
+        self.assertEqual(solver.reg_dc,0.)
+
+        # Rank deficient constraints
+        A = coo_matrix(np.vstack((A.toarray(),A.toarray()[:1,:])))
+        m = 4
+        solver.factorize_kkt(linsolver,get_matrix,m)
+        self.assertGreater(solver.reg_dc,0.)
+        self.assertEqual(linsolver.get_num_negative_eigenvalues(),m)
+        b = np.random.randn(n+m)
+        x = linsolver.solve(b)
+        K = linsolver.get_full_matrix(get_matrix(solver.reg_dw,solver.reg_dc))
+        self.assertLess(norm(K*x-b),1e-6)
+
+        # No inertia information (warned once per solve unless quiet)
+        import sys
+        from io import StringIO
+        linsolver = opt.lin_solver.LinSolverSUPERLU('symmetric')
+        self.assertTrue(linsolver.get_num_negative_eigenvalues() is None)
+        stdout = sys.stdout
+        for quiet,num in [(False,1),(True,0)]:
+            solver = opt.opt_solver.OptSolver()
+            solver.parameters = {'quiet': quiet}
+            sys.stdout = StringIO()
+            try:
+                for i in range(3):
+                    solver.factorize_kkt(linsolver,get_matrix,m)
+                output = sys.stdout.getvalue()
+            finally:
+                sys.stdout = stdout
+            self.assertEqual(output.count('does not report inertia'),num)
+            self.assertTrue(solver.inertia_warned)
+
+    def test_linsolver_cache(self):
+
+        n = 20
+        m = 5
+        A = coo_matrix(np.random.randn(m,n))
+        B = np.random.randn(10,n)
+        H = coo_matrix(np.dot(B.T,B))
+        l = -10.*np.ones(n)
+        u = 10.*np.ones(n)
+
+        cache = opt.lin_solver.LinSolverCache()
+        solver = opt.opt_solver.OptSolverIQP()
+        solver.set_parameters({'quiet': True, 'tol': 1e-8})
+        solver.set_linsolver_cache(cache)
+        ref_solver = opt.opt_solver.OptSolverIQP()
+        ref_solver.set_parameters({'quiet': True, 'tol': 1e-8})
+        
+        linsolvers = []
+        for i in range(4):
+            prob = opt.opt_solver.QuadProblem(H,
+                                              np.random.randn(n),
+                                              A,
+                                              np.random.randn(m),
+                                              l-np.random.rand(n),
+                                              u+np.random.rand(n))
+            solver.solve(prob)
+            ref_solver.solve(prob)
+            linsolvers.append(solver.linsolver)
+            self.assertEqual(solver.get_status(),'solved')
+            self.assertEqual(solver.get_results()['k'],ref_solver.get_results()['k'])
+            self.assertLess(norm(solver.get_primal_variables()-ref_solver.get_primal_variables()),1e-10)
+        self.assertEqual(len(cache.linsolvers),1)
+        for linsolver in linsolvers:
+            self.assertTrue(linsolver is linsolvers[0])
+
+        # Different structure
+        A = coo_matrix(np.random.randn(m+1,n))
+        solver.solve(opt.opt_solver.QuadProblem(H,np.random.randn(n),A,np.random.randn(m+1),l,u))
+        self.assertEqual(len(cache.linsolvers),2)
+        self.assertFalse(solver.linsolver is linsolvers[0])
+
+        # Size limit
+        cache.maxsize = 1
+        solver.solve(opt.opt_solver.QuadProblem(H,np.random.randn(n),coo_matrix(A.toarray()[:2,:]),np.random.randn(2),l,u))
+        self.assertEqual(len(cache.linsolvers),1)
+        cache.clear()
+        self.assertEqual(len(cache.linsolvers),0)
+
+    def test_solve_batch(self):
+
+        n = 20
+        m = 5
+        problems = []
+        for i in range(6):
+            A = coo_matrix(np.random.randn(m,n))
+            b = np.random.randn(m)
+            g = np.random.randn(n)
+            B = np.random.randn(10,n)
+            H = coo_matrix(np.dot(B.T,B))
+            l = -10.*np.ones(n)
+            u = 10.*np.ones(n)
+            problems.append(opt.opt_solver.QuadProblem(H,g,A,b,l,u))
+        problems[3] = opt.opt_solver.QuadProblem(H,g,A,b,u,l) # no interior
+
+        # Fixed column removed by presolve
+        fixed = [opt.opt_solver.QuadProblem(p.H,p.g,p.A,p.b,np.hstack((0.,p.l[1:])),np.hstack((0.,p.u[1:])))
+                 for p in problems]
+
+        for params,probs in [({'quiet': True, 'tol': 1e-8},problems),
+                             ({'quiet': True, 'tol': 1e-8, 'scaling': 'ruiz', 'presolve': True},fixed)]:
+            for pool in ['thread','process']:
+                for num_workers in [1,3]:
+                    results = opt.opt_solver.solve_batch(probs,
+                                                         opt.opt_solver.OptSolverIQP,
+                                                         params,
+                                                         num_workers=num_workers,
+                                                         pool=pool)
+                    self.assertEqual(len(results),len(probs))
+                    self.assertTrue(opt.opt_solver.batch.worker_data.linsolver_cache is None) # cache of call released
+                    for i,problem in enumerate(probs):
+                        if i == 3:
+                            self.assertEqual(results[i]['status'],'error')
+                            self.assertTrue(len(results[i]['error_msg']) > 0)
+                            continue
+                        solver = opt.opt_solver.OptSolverIQP()
+                        solver.set_parameters(params)
+                        solver.solve(problem)
+                        self.assertEqual(results[i]['status'],'solved')
+                        self.assertEqual(results[i]['k'],solver.get_results()['k'])
+                        self.assertEqual(results[i]['x'].size,n)
+                        self.assertLess(norm(results[i]['x']-solver.get_primal_variables()),1e-10)
+                        lam,nu,mu,pi = solver.get_dual_variables()
+                        self.assertLess(norm(results[i]['lam']-lam),1e-10)
+                        self.assertLess(norm(results[i]['mu']-mu),1e-10)
+                        self.assertLess(norm(results[i]['pi']-pi),1e-10)
+
+        self.assertRaises(ValueError,opt.opt_solver.solve_batch,problems,opt.opt_solver.OptSolverIQP,pool='x')
+
+    def test_profiler(self):
+
+        profiler = opt.opt_solver.OptProfiler()
+        with profiler.phase('a'):
+            pass
+        self.assertDictEqual(profiler.get_results(),{})
+        
+        profiler.enable()
+        for i in range(3):
+            with profiler.phase('a'):
+                with profiler.phase('b'):
+                    pass
+        results = profiler.get_results()
+        self.assertEqual(results['a']['calls'],3)
+        self.assertEqual(results['b']['calls'],3)
+        self.assertGreaterEqual(results['a']['time'],results['b']['time'])
+        profiler.reset()
+        self.assertDictEqual(profiler.get_results(),{})
+
+        n = 30
+        m = 5
+        A = coo_matrix(np.random.randn(m,n))
+        b = np.random.randn(m)
+        g = np.random.randn(n)
+        B = np.random.randn(10,n)
+        H = coo_matrix(np.dot(B.T,B))
+        l = -10.*np.ones(n)
+        u = 10.*np.ones(n)
+        prob = opt.opt_solver.QuadProblem(H,g,A,b,l,u)
+
+        solver = opt.opt_solver.OptSolverIQP()
+        solver.set_parameters({'quiet': True})
+        solver.solve(prob)
+        self.assertDictEqual(solver.get_results()['profile'],{})
+
+        solver.set_parameters({'profile': True})
+        solver.solve(prob)
+        self.assertTrue(solver.profiler.enabled)
+        profile = solver.get_results()['profile']
+        k = solver.get_results()['k']
+        self.assertEqual(profile['analyze']['calls'],1)
+        self.assertEqual(profile['factorize']['calls'],k)
+        self.assertEqual(profile['solve']['calls'],k)
+        self.assertEqual(profile['assembly']['calls'],k)
+        self.assertEqual(profile['line_search']['calls'],k)
+        for name in profile:
+            self.assertGreaterEqual(profile[name]['time'],0.)
+
+        solver.set_parameters({'profile': False})
+        solver.solve(prob)
+        self.assertFalse(solver.profiler.enabled)
+        self.assertDictEqual(solver.get_results()['profile'],{})
+        for cls in [opt.opt_solver.OptSolverIQP,opt.opt_solver.OptSolverADMM,opt.opt_solver.OptSolverINLP,
+                    opt.opt_solver.OptSolverAugL,opt.opt_solver.OptSolverNR,opt.opt_solver.OptSolverBnB,
+                    opt.opt_solver.OptSolverClp,opt.opt_solver.OptSolverCbc,opt.opt_solver.OptSolverIpopt]:
+            self.assertFalse(cls.parameters['profile'])
+
+    def test_line_search(self):
+
+        # Rosenbrock
+        class FuncData:
+            pass
+        def func(x):
+            fdata = FuncData()
+            fdata.F = 100.*(x[1]-x[0]**2.)**2.+(1.-x[0])**2.
+            fdata.GradF = np.array([-400.*x[0]*(x[1]-x[0]**2.)-2.*(1.-x[0]),
+                                    200.*(x[1]-x[0]**2.)])
+            return fdata
+
+        c1 = 1e-4
+        c2 = 5e-1
+        for method in ['bisection','cubic']:
+            solver = opt.opt_solver.OptSolver()
+            solver.parameters['line_search'] = method
+            for i in range(20):
+                x = np.random.randn(2)
+                fdata = func(x)
+                p = -fdata.GradF*np.random.rand()*1e-2
+                dphi = np.dot(fdata.GradF,p)
+                s,fdatas = solver.line_search(x,p,fdata.F,fdata.GradF,func)
+                self.assertLessEqual(fdatas.F,fdata.F+c1*s*dphi)
+                self.assertLessEqual(np.abs(np.dot(fdatas.GradF,p)),-c2*dphi)
+                self.assertEqual(len(solver.line_search_evals),i+1)
+                self.assertGreaterEqual(solver.line_search_evals[-1],1)
+
+                # Step bound
+                s,fdatas = solver.line_search(x,p,fdata.F,fdata.GradF,func,smax=1e-3)
+                self.assertLessEqual(s,1e-3)
+                self.assertLessEqual(fdatas.F,fdata.F+c1*s*dphi)
+                solver.line_search_evals.pop()
+
+            self.assertRaises(opt.opt_solver.OptSolverError,
+                              solver.line_search,x,-p,fdata.F,fdata.GradF,func)
+
+            solver.reset()
+            self.assertEqual(solver.line_search_evals,[])
+
+        # Solvers
+        n = 50
+        m = 10
+        A = coo_matrix(np.random.randn(m,n))
+        b = np.random.randn(m)
+        g = np.random.randn(n)
+        B = np.random.randn(20,n)
+        H = coo_matrix(np.dot(B.T,B))
+        l = np.random.randn(n)
+        u = l+10.
+        prob = opt.opt_solver.QuadProblem(H,g,A,b,l,u)
+        for method in ['bisection','cubic']:
+            solver = opt.opt_solver.OptSolverIQP()
+            solver.set_parameters({'tol': 1e-8,'quiet': True,'line_search': method})
+            solver.solve(prob)
+            self.assertEqual(solver.get_status(),'solved')
+            results = solver.get_results()
+            self.assertEqual(len(results['line_search_evals']),results['k'])
+            x = solver.get_primal_variables()
+            lam,nu,mu,pi = solver.get_dual_variables()
+            self.assertLess(norm(g+H*x-A.T*lam+mu-pi),1e-6)
+            self.assertLess(norm(A*x-b),1e-6)